@@ -33,6 +33,12 @@ ALLOWED_HOSTS = ["*"]
 # END SITE CONFIGURATION
 
 
+# DATABASE CONFIGURATION
+# ------------------------------------------------------------------------------
+# Keep the database connections open between the requests
+DB_POOL_SIZE = env.int('DJANGO_DB_POOL_SIZE', default=10)
+
+
 # TEMPLATE CONFIGURATION
 # ------------------------------------------------------------------------------
 # See: https://docs.djangoproject.com/en/dev/ref/templates/api/#django.template.loaders.cached.Loader
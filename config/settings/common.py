@@ -84,7 +84,8 @@ MIDDLEWARE = [
     'django.middleware.http.ConditionalGetMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
-    'django.middleware.clickjacking.XFrameOptionsMiddleware'
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'osmchadjango.changeset.replicas.ReplicaStickinessMiddleware',
 ]
 
 # MIGRATIONS CONFIGURATION
@@ -124,7 +125,7 @@ MANAGERS = ADMINS
 # See: https://docs.djangoproject.com/en/dev/ref/settings/#databases
 DATABASES = {
     'default': {
-        'ENGINE': 'django.contrib.gis.db.backends.postgis',
+        'ENGINE': 'osmchadjango.contrib.postgis_pool',
         'HOST': env('PGHOST', default='localhost'),
         'PORT': env('PGPORT', default='5432'),
         'USER': env('PGUSER', default='postgres'),
@@ -133,6 +134,34 @@ DATABASES = {
      }
 }
 DATABASES['default']['ATOMIC_REQUESTS'] = True
+# The connections closed at the end of the requests are kept open in a pool of
+# each process, up to DB_POOL_SIZE connections by database, and reused by the
+# next requests during DB_POOL_MAX_AGE seconds. It works with the gevent
+# workers, unlike CONN_MAX_AGE. See osmchadjango/contrib/postgis_pool.
+DB_POOL_SIZE = env.int('DJANGO_DB_POOL_SIZE', default=0)
+DB_POOL_MAX_AGE = env.int('DJANGO_DB_POOL_MAX_AGE', default=300)
+
+# Read replicas of the default database, as a comma separated list of host or
+# host:port. The changesets list, stats and feed views read from them; see
+# osmchadjango/changeset/replicas.py. A replica is not used while its lag is
+# greater than REPLICA_MAX_LAG seconds and the users that changed something
+# read from the default database during REPLICA_STICKY_TIME seconds.
+DATABASE_REPLICAS = []
+for i, replica in enumerate(env.list('DJANGO_DATABASE_REPLICAS', default=[])):
+    host, _, port = replica.partition(':')
+    alias = 'replica_{}'.format(i)
+    DATABASES[alias] = dict(
+        DATABASES['default'],
+        HOST=host,
+        PORT=port or DATABASES['default']['PORT'],
+        ATOMIC_REQUESTS=False,
+        OPTIONS={'connect_timeout': 2},
+        TEST={'MIRROR': 'default'},
+        )
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ['osmchadjango.changeset.replicas.ReplicaRouter']
+REPLICA_MAX_LAG = env.int('DJANGO_REPLICA_MAX_LAG', default=30)
+REPLICA_STICKY_TIME = env.int('DJANGO_REPLICA_STICKY_TIME', default=60)
 
 
 # GENERAL CONFIGURATION
@@ -299,6 +328,10 @@ LOGGING = {
             'handlers': ['console', ],
             'level': "DEBUG",
         },
+        'osmchadjango.changeset.metrics': {
+            'handlers': ['console', ],
+            'level': "INFO",
+        },
     },
 }
 
@@ -308,6 +341,24 @@ LOGGING = {
 # define CHANGESETS_FILTER as a path to a GeoJSON file.
 CHANGESETS_FILTER = env('DJANGO_CHANGESETS_FILTER', default=None)
 
+# Local disk cache of the replication files and of the OSM API responses used
+# to analyse the changesets. It's disabled if OSM_CACHE_DIR is not defined. The
+# max size is in bytes. In offline mode, only the cached content is used.
+OSM_CACHE_DIR = env('DJANGO_OSM_CACHE_DIR', default=None)
+OSM_CACHE_MAX_SIZE = env.int('DJANGO_OSM_CACHE_MAX_SIZE', default=5 * 1024 ** 3)
+OSM_CACHE_OFFLINE = env.bool('DJANGO_OSM_CACHE_OFFLINE', default=False)
+
+# Limits of the concurrent requests made to each OSM server when the changesets
+# are imported with concurrency. The interval is the minimum number of seconds
+# between the start of two requests to the same server.
+OSM_MAX_CONNECTIONS_PER_HOST = env.int('DJANGO_OSM_MAX_CONNECTIONS_PER_HOST', default=8)
+OSM_HOST_REQUEST_INTERVAL = env.float('DJANGO_OSM_HOST_REQUEST_INTERVAL', default=0)
+
+# File where the timers and counters of the changesets ingestion are written in
+# the Prometheus text format after each import, to be read by the textfile
+# collector of the node_exporter. They are not written if it's not defined.
+INGESTION_METRICS_FILE = env('DJANGO_INGESTION_METRICS_FILE', default=None)
+
 # Enable/disable the functionality to post comments to changesets when they
 # are reviewed
 ENABLE_POST_CHANGESET_COMMENTS = env('DJANGO_ENABLE_CHANGESET_COMMENTS', default=False)
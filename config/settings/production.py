@@ -58,6 +58,11 @@ TEMPLATES[0]['OPTIONS']['loaders'] = [
     ]),
 ]
 
+# DATABASE CONFIGURATION
+# ------------------------------------------------------------------------------
+# Keep the database connections open between the requests
+DB_POOL_SIZE = env.int('DJANGO_DB_POOL_SIZE', default=10)
+
 # CACHING
 # ------------------------------------------------------------------------------
 # Configured to use Redis, if you prefer another method, comment the REDIS and
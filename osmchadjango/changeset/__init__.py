@@ -0,0 +1 @@
+default_app_config = 'osmchadjango.changeset.apps.ChangesetConfig'
@@ -1,6 +1,9 @@
 from django.contrib.gis import admin
 
-from .models import Changeset, SuspicionReasons, Tag
+from .models import (
+    Changeset, FailedImport, OpenChangeset, ReplicationSequence,
+    SuspicionReasons, Tag, UserStats
+    )
 
 
 class ChangesetAdmin(admin.OSMGeoAdmin):
@@ -17,6 +20,35 @@ class ReasonsAdmin(admin.ModelAdmin):
     list_filter = ['is_visible', 'for_changeset', 'for_feature']
 
 
+class ReplicationSequenceAdmin(admin.ModelAdmin):
+    search_fields = ['sequence']
+    list_display = ['sequence', 'status', 'attempts', 'changesets', 'worker',
+        'started_at', 'finished_at']
+    list_filter = ['status']
+
+
+class FailedImportAdmin(admin.ModelAdmin):
+    search_fields = ['changeset_id']
+    list_display = ['changeset_id', 'error_class', 'attempts', 'failed_at',
+        'retry_at']
+    list_filter = ['error_class']
+
+
+class OpenChangesetAdmin(admin.ModelAdmin):
+    search_fields = ['changeset_id']
+    list_display = ['changeset_id', 'num_changes', 'created_at', 'check_at']
+
+
+class UserStatsAdmin(admin.ModelAdmin):
+    search_fields = ['uid']
+    list_display = ['uid', 'changesets', 'checked_changesets',
+        'harmful_changesets', 'last_seen']
+
+
 admin.site.register(Changeset, ChangesetAdmin)
 admin.site.register(SuspicionReasons, ReasonsAdmin)
 admin.site.register(Tag, ReasonsAdmin)
+admin.site.register(ReplicationSequence, ReplicationSequenceAdmin)
+admin.site.register(FailedImport, FailedImportAdmin)
+admin.site.register(OpenChangeset, OpenChangesetAdmin)
+admin.site.register(UserStats, UserStatsAdmin)
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, unicode_literals
+import xml.etree.ElementTree as ET
+
+import requests
+from osmcha.changeset import OSM_API, Analyse, changeset_info
+
+from .osm_cache import fetch
+
+
+def changeset_url(changeset_id):
+    """Return the URL of the osmChange document of a changeset."""
+    return '{}/changeset/{}/download'.format(OSM_API, changeset_id)
+
+
+def metadata_url(changeset_id):
+    """Return the URL of the metadata of a changeset."""
+    return '{}/changeset/{}'.format(OSM_API, changeset_id)
+
+
+def user_url(user_id):
+    """Return the URL of the details of a user."""
+    return '{}/user/{}'.format(OSM_API, requests.compat.quote(user_id))
+
+
+def get_metadata(changeset_id):
+    """Return the metadata of a changeset as a XML ElementTree."""
+    return ET.fromstring(fetch(metadata_url(changeset_id)))[0]
+
+
+def get_user_details(user_id, fetch_url=fetch):
+    """Return the suspicion reasons related to the number of changesets and
+    blocks of a user. The same as osmcha.changeset.get_user_details.
+    """
+    reasons = []
+    try:
+        xml_data = ET.fromstring(fetch_url(user_url(user_id)))[0]
+        changesets = [i for i in xml_data if i.tag == 'changesets'][0]
+        blocks = [i for i in xml_data if i.tag == 'blocks'][0]
+        if int(changesets.get('count')) <= 50:
+            reasons.append('New mapper')
+        if int(blocks[0].get('count')) > 1:
+            reasons.append('User has multiple blocks')
+    except Exception as e:
+        message = 'Could not verify user of the changeset: {}, {}'
+        print(message.format(user_id, str(e)))
+    return reasons
+
+
+class ChangesetAnalysis(Analyse):
+    """osmcha Analyse class that makes the requests to the OSM API using the
+    DiskCache, if it's enabled by the OSM_CACHE_DIR setting. It receives a
+    changeset id or a dict returned by osmcha.changeset.changeset_info. The
+    prefetched argument is a dict with URLs and their content, that were
+    already requested and don't need to be requested again.
+    """
+
+    def __init__(self, changeset, prefetched=None, **kwargs):
+        if type(changeset) in [int, str]:
+            changeset = changeset_info(get_metadata(changeset))
+        super(ChangesetAnalysis, self).__init__(changeset, **kwargs)
+        self.prefetched = prefetched or {}
+
+    def fetch(self, url):
+        if url in self.prefetched:
+            return self.prefetched[url]
+        return fetch(url)
+
+    def get_dict(self):
+        ch_dict = super(ChangesetAnalysis, self).get_dict()
+        ch_dict.pop('prefetched', None)
+        return ch_dict
+
+    def count(self):
+        """Count the number of elements created, modified and deleted by the
+        changeset and analyses if it is a possible import, mass modification or
+        a mass deletion. The same as Analyse.count, but using the DiskCache.
+        """
+        xml = ET.fromstring(self.fetch(changeset_url(self.id)))
+        actions = [action.tag for action in xml]
+        self.create = actions.count('create')
+        self.modify = actions.count('modify')
+        self.delete = actions.count('delete')
+        self.verify_editor()
+
+        try:
+            if (self.create / len(actions) > self.percentage
+                    and self.create > self.create_threshold
+                    and (self.powerfull_editor or self.create > self.top_threshold)):
+                self.label_suspicious('possible import')
+            elif (self.modify / len(actions) > self.percentage
+                    and self.modify > self.modify_threshold):
+                self.label_suspicious('mass modification')
+            elif ((self.delete / len(actions) > self.percentage
+                    and self.delete > self.delete_threshold) or
+                    self.delete > self.top_threshold):
+                self.label_suspicious('mass deletion')
+        except ZeroDivisionError:
+            print('It seems this changeset was redacted')
+
+    def verify_user(self):
+        """Verify if the changeset was created by a inexperienced mapper or by
+        a user that was blocked more than once.
+        """
+        for reason in get_user_details(self.uid, self.fetch):
+            self.label_suspicious(reason)
@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class ChangesetConfig(AppConfig):
+    name = 'osmchadjango.changeset'
+
+    def ready(self):
+        # connect the signal receivers
+        from . import id_arrays, lookups, reasons, user_stats  # noqa
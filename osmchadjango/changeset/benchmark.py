@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, unicode_literals
+import asyncio
+import gzip
+import json
+import os
+import random
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import get_context
+from unittest.mock import patch
+from urllib.parse import urlsplit
+import xml.etree.ElementTree as ET
+
+from django.db import connection, connections
+from django.test.utils import override_settings
+
+from ..contrib.postgis_pool.base import pool
+from . import analysis
+from .analysis import changeset_url, metadata_url, user_url
+from .fetcher import AsyncFetcher
+from .osm_cache import fetch
+from .replication import iter_changesets
+
+# A workload is a directory with replication files and OSM API responses,
+# saved in the paths of their URLs, and a workload.json file with the range of
+# replication files and the ids of their changesets.
+WORKLOAD_FILE = 'workload.json'
+
+EDITORS = [
+    'JOSM/1.5 (18822 en)', 'iD 2.27.3', 'StreetComplete 56.1', 'Every Door 4.0',
+    'Potlatch 2', 'Go Map!! 4.1.1', 'Vespucci 19.0.3.0'
+    ]
+COMMENTS = [
+    'Added buildings', 'Fixed road names', 'Added shops from Google Maps',
+    'Deleted duplicated nodes', 'Import of addresses', 'Survey', ''
+    ]
+
+# The changesets of generate_changesets are generated with SQL, combining
+# these values with the id, so the comments are diverse like the real ones.
+GENERATED_EDITORS = [
+    'iD 2.20.2', 'JOSM/1.5 (18303 en)', 'StreetComplete 42.0', 'Potlatch 2',
+    'Every Door Android 4.0', 'Vespucci 16.1.3.0', 'OsmAnd+ 4.3.5',
+    'Go Map!! 4.0.0'
+    ]
+GENERATED_COMMENTS = [
+    '#hotosm-project-{} #missingmaps buildings', 'Added buildings and roads',
+    'Fixed crossing ways', '#MapLesotho residential area', 'Update opening hours',
+    'Missing Maps: roads and buildings #hotosm-project-{}', 'survey', 'Add address',
+    ]
+GENERATED_SOURCES = ['Bing', 'survey', 'Esri World Imagery', 'local knowledge', 'Mapbox', '']
+GENERATED_IMAGERY = [
+    'Bing aerial imagery', 'Esri World Imagery', 'Mapbox Satellite', 'Maxar Premium Imagery',
+    ''
+    ]
+
+
+def sql_choice(values, factor):
+    """Return an SQL expression that picks one of the values for each id."""
+    return "(ARRAY[{}])[1 + mod(i * {}, {})]".format(
+        ', '.join("'{}'".format(v.replace("'", "''")) for v in values),
+        factor, len(values)
+        )
+
+
+def generate_changesets(rows):
+    """Insert rows generated changesets in the database, with ids from 1 to
+    rows.
+    """
+    comment = "replace({}, '{{}}', mod(i, 5000)::text) || ' ' || md5(i::text)".format(
+        sql_choice(GENERATED_COMMENTS, 7)
+        )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """INSERT INTO changeset_changeset (
+                id, "user", uid, editor, powerfull_editor, comment, comments_count,
+                source, imagery_used, date, new_features, reviewed_features,
+                tag_changes, "create", modify, "delete", is_suspect, checked,
+                metadata, reason_ids, tag_ids, reasons_count
+                )
+            SELECT i, 'user ' || mod(i, 50000), mod(i, 50000)::text, {editor}, false,
+                {comment}, 0, {source}, {imagery},
+                now() - mod(i, 525600) * interval '1 minute', '[]', '[]', '{{}}',
+                mod(i, 100), mod(i, 30), mod(i, 7), mod(i, 10) = 0, false, '{{}}',
+                '{{}}', '{{}}', 0
+            FROM generate_series(1, %s) AS i
+            """.format(
+                editor=sql_choice(GENERATED_EDITORS, 3), comment=comment,
+                source=sql_choice(GENERATED_SOURCES, 11),
+                imagery=sql_choice(GENERATED_IMAGERY, 13)
+                ),
+            [rows]
+            )
+        cursor.execute('ANALYZE changeset_changeset')
+
+
+def replication_path(sequence):
+    """Return the path of a replication file, relative to the planet URL."""
+    n = '{:09}'.format(sequence)
+    return os.path.join('replication', n[0:3], n[3:6], '{}.osm.gz'.format(n[6:]))
+
+
+def api_path(url):
+    """Return the path of the response of an OSM API URL. The .xml suffix
+    allows to save a changeset metadata and its download in the same
+    directory.
+    """
+    return urlsplit(url).path.lstrip('/') + '.xml'
+
+
+def write_file(directory, path, content):
+    path = os.path.join(directory, path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(content)
+
+
+def load_workload(directory):
+    with open(os.path.join(directory, WORKLOAD_FILE)) as f:
+        return json.load(f)
+
+
+def save_workload(directory, start, end, changesets):
+    with open(os.path.join(directory, WORKLOAD_FILE), 'w') as f:
+        json.dump({'start': start, 'end': end, 'changesets': changesets}, f)
+
+
+def generate_workload(directory, files=5, changesets=200, seed=0):
+    """Generate a synthetic workload with files replication files of
+    changesets changesets each. The same seed generates the same workload.
+    """
+    rng = random.Random(seed)
+    users = [(rng.randint(1, 20000000), rng.choice([5, 40, 300, 5000])) for i in range(500)]
+    date = datetime(2023, 1, 1)
+    changeset_id = 130000000
+    changeset_ids = []
+    for sequence in range(1, files + 1):
+        root = ET.Element('osm', version='0.6', generator='osmcha benchmark')
+        for i in range(changesets):
+            changeset_id += 1
+            date += timedelta(seconds=rng.randint(1, 5))
+            uid, user_changesets = rng.choice(users)
+            actions = {
+                action: int(rng.expovariate(1 / mean))
+                for action, mean in [('create', 30), ('modify', 20), ('delete', 5)]
+                }
+            lon = rng.uniform(-180, 179)
+            lat = rng.uniform(-60, 70)
+            size = rng.expovariate(100)
+            element = ET.SubElement(
+                root, 'changeset', id=str(changeset_id),
+                created_at=date.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                closed_at=(date + timedelta(seconds=30)).strftime('%Y-%m-%dT%H:%M:%SZ'),
+                open='false', num_changes=str(sum(actions.values())),
+                user='user{}'.format(uid), uid=str(uid),
+                min_lat=str(lat), max_lat=str(lat + size),
+                min_lon=str(lon), max_lon=str(lon + size),
+                comments_count='0'
+                )
+            for key, value in [
+                    ('created_by', rng.choice(EDITORS)),
+                    ('comment', rng.choice(COMMENTS)),
+                    ('source', rng.choice(['survey', 'Bing', 'Esri', '']))]:
+                if value:
+                    ET.SubElement(element, 'tag', k=key, v=value)
+            changeset_ids.append(changeset_id)
+            metadata = ET.Element('osm', version='0.6')
+            metadata.append(element)
+            write_file(
+                directory, api_path(metadata_url(changeset_id)), ET.tostring(metadata)
+                )
+            change = ET.Element('osmChange', version='0.6')
+            node_id = changeset_id * 1000
+            for action, count in actions.items():
+                for j in range(count):
+                    node_id += 1
+                    ET.SubElement(
+                        ET.SubElement(change, action), 'node', id=str(node_id),
+                        version='1', changeset=str(changeset_id),
+                        lat=str(lat), lon=str(lon)
+                        )
+            write_file(
+                directory, api_path(changeset_url(changeset_id)), ET.tostring(change)
+                )
+            write_file(
+                directory, api_path(user_url(str(uid))),
+                '<osm version="0.6"><user id="{}" display_name="user{}">'
+                '<changesets count="{}"/><blocks><received count="0" active="0"/>'
+                '</blocks></user></osm>'.format(uid, uid, user_changesets).encode()
+                )
+        write_file(
+            directory, replication_path(sequence), gzip.compress(ET.tostring(root))
+            )
+    save_workload(directory, 1, files, changeset_ids)
+
+
+def record_workload(directory, planet_url, start, end, concurrency=8):
+    """Download the replication files from start to end from planet_url and
+    the OSM API responses needed to import and to create their changesets.
+    """
+    changeset_ids = []
+    for sequence in range(start, end + 1):
+        path = replication_path(sequence)
+        url = '{}/{}'.format(
+            planet_url.rstrip('/'), path[len('replication/'):]
+            )
+        print('Recording {}'.format(url))
+        write_file(directory, path, fetch(url, immutable=True))
+        changesets = list(iter_changesets(os.path.join(directory, path)))
+        urls = [metadata_url(c['id']) for c in changesets]
+        urls += [changeset_url(c['id']) for c in changesets]
+        urls += list(set(user_url(c['uid']) for c in changesets))
+        responses = asyncio.run(get_many(urls, concurrency))
+        for url, content in responses.items():
+            write_file(directory, api_path(url), content)
+        print('{} of {} responses recorded'.format(len(responses), len(urls)))
+        changeset_ids.extend(int(c['id']) for c in changesets)
+    save_workload(directory, start, end, changeset_ids)
+
+
+async def get_many(urls, concurrency):
+    fetcher = AsyncFetcher(max_in_flight=concurrency, per_host=concurrency)
+    try:
+        return await fetcher.get_many(urls)
+    finally:
+        fetcher.close()
+
+
+class WorkloadHandler(SimpleHTTPRequestHandler):
+    """Serve the files of a workload, waiting latency seconds before each
+    response to simulate the network.
+    """
+
+    def __init__(self, *args, latency=0, **kwargs):
+        self.latency = latency
+        super(WorkloadHandler, self).__init__(*args, **kwargs)
+
+    def translate_path(self, path):
+        path = super(WorkloadHandler, self).translate_path(path)
+        if not path.endswith('.osm.gz'):
+            path += '.xml'
+        return path
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        super(WorkloadHandler, self).do_GET()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ReplayServer(object):
+    """Local HTTP server that replays a workload. It runs in a forked process,
+    so the importing process doesn't start any thread before its worker
+    processes. Use replay() to send the OSM requests to it.
+    """
+
+    def __init__(self, directory, latency=0):
+        self.directory = directory
+        self.latency = latency
+        self.process = None
+
+    def start(self):
+        server = ThreadingHTTPServer(
+            ('127.0.0.1', 0),
+            partial(WorkloadHandler, directory=self.directory, latency=self.latency)
+            )
+        self.url = 'http://127.0.0.1:{}'.format(server.server_address[1])
+        self.process = get_context('fork').Process(target=server.serve_forever, daemon=True)
+        self.process.start()
+        server.server_close()
+
+    def stop(self):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.join()
+            self.process = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    @contextmanager
+    def replay(self):
+        """Send the requests of the replication files and of the OSM API to
+        this server, without using the DiskCache.
+        """
+        with override_settings(
+                OSM_PLANET_BASE_URL='{}/replication/'.format(self.url),
+                OSM_CACHE_DIR=None):
+            with patch.object(analysis, 'OSM_API', '{}/api/0.6'.format(self.url)):
+                yield
+
+
+@contextmanager
+def benchmark_database(keepdb=False):
+    """Create a test database, that is used inside the block, and destroy it
+    at the end, unless keepdb is True.
+    """
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, serialize=False, keepdb=keepdb
+        )
+    try:
+        yield
+    finally:
+        close_connections()
+        connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=keepdb)
+
+
+def close_connections():
+    """Close the connections of this process, including the pooled ones, that
+    would not allow to drop the test database.
+    """
+    with override_settings(DB_POOL_SIZE=0):
+        connections.close_all()
+    pool.close_all()
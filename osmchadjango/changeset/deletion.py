@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, unicode_literals
+import time
+
+from django.db import connection, transaction
+
+from .models import Changeset
+from .user_stats import STATS_FIELDS, UserStatsDelta
+
+
+def delete_changesets_batch(ids):
+    """Delete the changesets and their relations with the SuspicionReasons and
+    Tags using raw DELETE statements, so the changesets are not loaded in
+    memory, and update the statistics of their users.
+    """
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        for field in Changeset._meta.many_to_many:
+            cursor.execute(
+                'DELETE FROM {} WHERE {} = ANY(%s)'.format(
+                    qn(field.remote_field.through._meta.db_table),
+                    qn(field.m2m_column_name())
+                    ),
+                [ids]
+                )
+        cursor.execute(
+            'DELETE FROM {} WHERE id = ANY(%s) RETURNING {}'.format(
+                qn(Changeset._meta.db_table), ', '.join(qn(f) for f in STATS_FIELDS)
+                ),
+            [ids]
+            )
+        delta = UserStatsDelta()
+        for values in cursor.fetchall():
+            delta.change(values, None)
+        delta.save()
+
+
+def delete_unchecked_changesets(before, batch_size=1000, pause=1):
+    """Delete the unchecked changesets created before a date in batches of
+    batch_size, ordered by id, waiting pause seconds between the batches.
+    Each batch is deleted in a short transaction and the changesets are locked
+    with FOR UPDATE SKIP LOCKED, so the changesets that are being reviewed or
+    updated are skipped and the ones that are checked before they are locked
+    are not deleted. If it stops, the next execution continues with the
+    changesets that were not deleted. Return the number of changesets deleted.
+    """
+    deleted = 0
+    last_id = 0
+    started = time.monotonic()
+    while True:
+        with transaction.atomic():
+            ids = list(
+                Changeset.objects.select_for_update(skip_locked=True).filter(
+                    date__lt=before, checked=False, id__gt=last_id
+                    ).order_by('id').values_list('id', flat=True)[:batch_size]
+                )
+            if ids:
+                delete_changesets_batch(ids)
+        if not ids:
+            break
+        deleted += len(ids)
+        last_id = ids[-1]
+        elapsed = time.monotonic() - started
+        print(
+            '{} changesets deleted ({:.2f} changesets/s), last id {}'.format(
+                deleted, deleted / elapsed if elapsed else 0, last_id
+                )
+            )
+        if len(ids) < batch_size:
+            break
+        time.sleep(pause)
+    return deleted
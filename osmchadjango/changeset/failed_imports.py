@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import FailedImport
+
+
+# A failed changeset is imported again after RETRY_DELAY, doubling the delay
+# after each failure up to MAX_RETRY_DELAY, until it fails MAX_ATTEMPTS times.
+# A claimed changeset is not claimed again during RUNNING_TIMEOUT.
+MAX_ATTEMPTS = 8
+RETRY_DELAY = timedelta(minutes=5)
+MAX_RETRY_DELAY = timedelta(days=1)
+RUNNING_TIMEOUT = timedelta(hours=1)
+
+
+def get_retry_delay(attempts):
+    return min(RETRY_DELAY * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+
+
+def record_failure(changeset_id, error):
+    """Register that a changeset could not be imported and schedule its next
+    import. Return the FailedImport.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        failed, created = FailedImport.objects.select_for_update().get_or_create(
+            changeset_id=changeset_id,
+            defaults={'failed_at': now, 'retry_at': now}
+            )
+        if not created:
+            failed.attempts += 1
+        failed.error_class = type(error).__name__
+        failed.error = str(error)
+        failed.failed_at = now
+        failed.retry_at = now + get_retry_delay(failed.attempts)
+        failed.save()
+    return failed
+
+
+def clear_failures(changeset_ids):
+    """Remove the changesets from the failed imports."""
+    FailedImport.objects.filter(changeset_id__in=changeset_ids).delete()
+
+
+def claim_failures(limit=100):
+    """Return up to limit failed changesets whose retry time has come and
+    postpone their retry by RUNNING_TIMEOUT, so concurrent processes don't
+    claim the same changesets. They are rescheduled by record_failure or
+    removed by clear_failures when they are imported.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        changeset_ids = list(
+            FailedImport.objects.select_for_update(skip_locked=True).filter(
+                attempts__lt=MAX_ATTEMPTS, retry_at__lte=now
+                ).order_by('retry_at').values_list('changeset_id', flat=True)[:limit]
+            )
+        FailedImport.objects.filter(changeset_id__in=changeset_ids).update(
+            retry_at=now + RUNNING_TIMEOUT
+            )
+    return changeset_ids
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from .osm_cache import fetch
+
+
+class AsyncFetcher(object):
+    """Make requests concurrently from an asyncio event loop. The requests are
+    made by a pool of threads, using the DiskCache if it's enabled.
+
+    At most max_in_flight requests are made at the same time and at most
+    per_host of them to the same host. If host_interval is defined, two
+    requests to the same host are started with at least host_interval seconds
+    between them. It must be created and used inside the event loop.
+    """
+
+    def __init__(self, max_in_flight=16, per_host=4, host_interval=0):
+        self.max_in_flight = max_in_flight
+        self.per_host = min(per_host, max_in_flight)
+        self.host_interval = host_interval
+        self.semaphore = asyncio.Semaphore(max_in_flight)
+        self.host_semaphores = {}
+        self.next_request = {}
+        self.executor = ThreadPoolExecutor(max_workers=max_in_flight)
+
+    def host_semaphore(self, host):
+        if host not in self.host_semaphores:
+            self.host_semaphores[host] = asyncio.Semaphore(self.per_host)
+        return self.host_semaphores[host]
+
+    async def wait_turn(self, host):
+        if not self.host_interval:
+            return
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        start = max(self.next_request.get(host, now), now)
+        self.next_request[host] = start + self.host_interval
+        await asyncio.sleep(start - now)
+
+    async def get(self, url):
+        """Return the content of the URL."""
+        host = urlsplit(url).netloc
+        async with self.host_semaphore(host):
+            async with self.semaphore:
+                await self.wait_turn(host)
+                return await asyncio.get_running_loop().run_in_executor(
+                    self.executor, fetch, url
+                    )
+
+    async def get_many(self, urls):
+        """Return a dict with the URLs and their content. The URLs that could
+        not be requested are not included.
+        """
+        results = await asyncio.gather(
+            *[self.get(url) for url in urls], return_exceptions=True
+            )
+        return {
+            url: content for url, content in zip(urls, results)
+            if not isinstance(content, Exception)
+            }
+
+    def close(self):
+        self.executor.shutdown(wait=True)
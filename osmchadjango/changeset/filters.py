@@ -1,8 +1,7 @@
-import json
 from datetime import date, timedelta
 
 from django.contrib.gis.geos import Polygon
-from django.db.models import Count, Q
+from django.db.models import Q
 
 from rest_framework_gis.filterset import GeoFilterSet
 from rest_framework_gis.filters import GeometryFilter
@@ -11,7 +10,8 @@ from rest_framework_gis.fields import GeometryField
 from django_filters.widgets import BooleanWidget
 
 from .models import Changeset
-from ..users.models import MappingTeam
+from ..users.models import MappingTeamMember
+from ..users.teams import get_trusted_users
 
 
 class ChangesetFilter(GeoFilterSet):
@@ -203,55 +203,56 @@ class ChangesetFilter(GeoFilterSet):
         )
     editor = filters.CharFilter(
         field_name='editor',
-        lookup_expr='icontains',
+        lookup_expr='ilike',
         help_text="""Filter changesets created with a software editor. It uses
-            the icontains lookup expression, so a query for 'josm' will return
-            changesets created or last modified with all JOSM versions."""
+            a case insensitive contains lookup expression, so a query for 'josm'
+            will return changesets created or last modified with all JOSM
+            versions."""
         )
     comment = filters.CharFilter(
         field_name='comment',
-        lookup_expr='icontains',
-        help_text="""Filter changesets by its comment field using the icontains
-            lookup expression."""
+        lookup_expr='ilike',
+        help_text="""Filter changesets by its comment field using a case
+            insensitive contains lookup expression."""
         )
     source = filters.CharFilter(
         field_name='source',
-        lookup_expr='icontains',
-        help_text="""Filter changesets by its source field using the icontains
-            lookup expression."""
+        lookup_expr='ilike',
+        help_text="""Filter changesets by its source field using a case
+            insensitive contains lookup expression."""
         )
     imagery_used = filters.CharFilter(
         field_name='imagery_used',
-        lookup_expr='icontains',
-        help_text="""Filter changesets by its imagery_used field using the
-            icontains lookup expression."""
+        lookup_expr='ilike',
+        help_text="""Filter changesets by its imagery_used field using a case
+            insensitive contains lookup expression."""
         )
     reasons = filters.CharFilter(
-        field_name='reasons',
+        field_name='reason_ids',
         method='filter_any_reasons',
         help_text="""Filter changesets that have one or more of the Suspicion
             Reasons. Inform the Suspicion Reasons ids separated by commas."""
         )
     all_reasons = filters.CharFilter(
-        field_name='reasons',
+        field_name='reason_ids',
         method='filter_all_reasons',
         help_text="""Filter changesets that have ALL the Suspicion Reasons of a
             list. Inform the Suspicion Reasons ids separated by commas."""
         )
     number_reasons__gte = filters.NumberFilter(
-        field_name='number_reasons',
+        field_name='reasons_count',
         method='filter_number_reasons',
         help_text="""Filter changesets whose number of Suspicion Reasons is
             equal or greater than a value."""
         )
     tags = filters.CharFilter(
-        field_name='tags',
+        field_name='tag_ids',
         method='filter_any_reasons',
         help_text="""Filter changesets that have one or more of the Tags. Inform
             the Tags ids separated by commas."""
         )
     all_tags = filters.CharFilter(
-        field_name='tags',
+        field_name='tag_ids',
         method='filter_all_reasons',
         help_text="""Filter changesets that have ALL the Tags of a list. Inform
             the Tags ids separated by commas."""
@@ -356,42 +357,24 @@ class ChangesetFilter(GeoFilterSet):
         else:
             return queryset
 
-    def get_username_from_teams(self, teams):
-        users = []
-        for i in teams.values_list('users', flat=True):
-            values = i
-            if type(values) in [str, bytes, bytearray]:
-                values = json.loads(values)
-            for e in values:
-                users.append(e.get('username'))
-        return users
+    def get_team_members(self, value):
+        return MappingTeamMember.objects.filter(
+            team__name__in=[team.strip() for team in value.split(',') if team]
+            ).values('username')
 
     def filter_mapping_team(self, queryset, name, value):
-        try:
-            # added `if team` to avoid empty strings
-            teams = MappingTeam.objects.filter(
-                name__in=[team.strip() for team in value.split(',') if team]
-                )
-            users = self.get_username_from_teams(teams)
-            return queryset.filter(user__in=users)
-        except MappingTeam.DoesNotExist:
-            return queryset
+        return queryset.filter(user__in=self.get_team_members(value))
 
     def exclude_mapping_team(self, queryset, name, value):
-        try:
-            teams = MappingTeam.objects.filter(
-                name__in=[team.strip() for team in value.split(',') if team]
-                )
-            users = self.get_username_from_teams(teams)
-            return queryset.exclude(user__in=users)
-        except MappingTeam.DoesNotExist:
-            return queryset
+        return queryset.exclude(user__in=self.get_team_members(value))
 
     def filter_hide_trusted_teams(self, queryset, name, value):
-        teams = MappingTeam.objects.filter(trusted=True)
-        users = self.get_username_from_teams(teams)
-        if users:
-            return queryset.exclude(user__in=users)
+        # the cached set only skips the filter when there aren't trusted users,
+        # the usernames are excluded with a subquery
+        if get_trusted_users():
+            return queryset.exclude(
+                user__in=MappingTeamMember.objects.filter(team__trusted=True).values('username')
+                )
         else:
             return queryset
 
@@ -425,20 +408,17 @@ class ChangesetFilter(GeoFilterSet):
             return queryset
 
     def filter_any_reasons(self, queryset, name, value):
-        lookup = '__'.join([name, 'id', 'in'])
+        lookup = '__'.join([name, 'overlap'])
         values = [int(t) for t in value.split(',')]
-        return queryset.filter(**{lookup: values}).distinct()
+        return queryset.filter(**{lookup: values})
 
     def filter_all_reasons(self, queryset, name, value):
-        lookup = '__'.join([name, 'id'])
+        lookup = '__'.join([name, 'contains'])
         values = [int(t) for t in value.split(',')]
-        for term in values:
-            queryset = queryset.filter(**{lookup: term})
-        return queryset
+        return queryset.filter(**{lookup: values})
 
     def filter_number_reasons(self, queryset, name, value):
         lookup = '__'.join([name, 'gte'])
-        queryset = queryset.annotate(number_reasons=Count('reasons'))
         return queryset.filter(**{lookup: value})
 
     def order_queryset(self, queryset, name, value):
@@ -449,9 +429,7 @@ class ChangesetFilter(GeoFilterSet):
             '-comments_count'
             ]
         if value in allowed_fields:
-            if value in ['number_reasons', '-number_reasons']:
-                queryset = queryset.annotate(number_reasons=Count('reasons'))
-            return queryset.order_by(value)
+            return queryset.order_by(value.replace('number_reasons', 'reasons_count'))
         else:
             return queryset
 
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import connection, transaction
+from django.db.models.signals import m2m_changed, post_delete
+from django.dispatch import receiver
+
+from .models import Changeset, SuspicionReasons, Tag
+
+
+# The ids of the SuspicionReasons and Tags of each changeset are copied to the
+# reason_ids and tag_ids array columns, that are used by the reasons and tags
+# filters without joins. The arrays are updated when the relations change
+# through the ORM (m2m_changed) and by the code that writes the relation
+# tables with raw SQL or bulk_create, which must call update_id_arrays. The
+# number of reasons is stored in reasons_count, that is used to filter and
+# order the changesets.
+ID_ARRAYS = {'reasons': 'reason_ids', 'tags': 'tag_ids'}
+COUNTS = {'reasons': 'reasons_count'}
+
+
+def update_id_arrays(changeset_ids, relations=('reasons', 'tags')):
+    """Set the id arrays and counts of the changesets from the content of the
+    relation tables.
+    """
+    if not changeset_ids:
+        return
+    qn = connection.ops.quote_name
+    table = qn(Changeset._meta.db_table)
+    with connection.cursor() as cursor:
+        for relation in relations:
+            field = Changeset._meta.get_field(relation)
+            columns = {
+                'table': table,
+                'through': qn(field.remote_field.through._meta.db_table),
+                'source': qn(field.m2m_column_name()),
+                'target': qn(field.m2m_reverse_name()),
+                }
+            values = [
+                """{} = ARRAY(
+                    SELECT {target} FROM {through}
+                    WHERE {through}.{source} = {table}.id ORDER BY {target}
+                    )""".format(qn(ID_ARRAYS[relation]), **columns)
+                ]
+            if relation in COUNTS:
+                values.append(
+                    """{} = (
+                        SELECT count(*) FROM {through}
+                        WHERE {through}.{source} = {table}.id
+                        )""".format(qn(COUNTS[relation]), **columns)
+                    )
+            cursor.execute(
+                'UPDATE {} SET {} WHERE id = ANY(%s)'.format(table, ', '.join(values)),
+                [list(changeset_ids)]
+                )
+
+
+def rebuild_id_arrays(batch_size=10000):
+    """Set the id arrays and counts of all the changesets from the relation
+    tables, in batches of batch_size changesets saved in their own
+    transactions. Return the number of changesets.
+    """
+    total = 0
+    last_id = None
+    while True:
+        queryset = Changeset.objects.order_by('id').values_list('id', flat=True)
+        if last_id is not None:
+            queryset = queryset.filter(id__gt=last_id)
+        ids = list(queryset[:batch_size])
+        if not ids:
+            return total
+        with transaction.atomic():
+            update_id_arrays(ids)
+        total += len(ids)
+        last_id = ids[-1]
+
+
+def remove_id(relation, value):
+    """Remove a SuspicionReasons or Tag id from the arrays and counts of all
+    the changesets.
+    """
+    qn = connection.ops.quote_name
+    array = qn(ID_ARRAYS[relation])
+    values = ['{0} = array_remove({0}, %s)'.format(array)]
+    if relation in COUNTS:
+        values.append('{0} = {0} - 1'.format(qn(COUNTS[relation])))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'UPDATE {} SET {} WHERE {} @> ARRAY[%s]'.format(
+                qn(Changeset._meta.db_table), ', '.join(values), array
+                ),
+            [value, value]
+            )
+
+
+def relation_changed(relation, instance, action, reverse, pk_set):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if action != 'post_clear' and not pk_set:
+        return
+    if not reverse:
+        update_id_arrays([instance.pk], [relation])
+        # keep the instance in sync, so a later save() doesn't overwrite it
+        fields = [ID_ARRAYS[relation]] + ([COUNTS[relation]] if relation in COUNTS else [])
+        for field, value in zip(
+                fields, Changeset.objects.values_list(*fields).get(pk=instance.pk)):
+            setattr(instance, field, value)
+    elif action == 'post_clear':
+        remove_id(relation, instance.pk)
+    else:
+        update_id_arrays(pk_set, [relation])
+
+
+@receiver(m2m_changed, sender=Changeset.reasons.through)
+def reasons_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    relation_changed('reasons', instance, action, reverse, pk_set)
+
+
+@receiver(m2m_changed, sender=Changeset.tags.through)
+def tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    relation_changed('tags', instance, action, reverse, pk_set)
+
+
+@receiver(post_delete, sender=SuspicionReasons)
+def reason_deleted(sender, instance, **kwargs):
+    remove_id('reasons', instance.pk)
+
+
+@receiver(post_delete, sender=Tag)
+def tag_deleted(sender, instance, **kwargs):
+    remove_id('tags', instance.pk)
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import os
+import socket
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import ReplicationSequence
+
+
+# A failed replication file is imported again after RETRY_DELAY, until it
+# fails MAX_ATTEMPTS times. A file that is running for more than
+# RUNNING_TIMEOUT is considered abandoned by a process that stopped.
+MAX_ATTEMPTS = 5
+RETRY_DELAY = timedelta(minutes=5)
+RUNNING_TIMEOUT = timedelta(hours=1)
+
+
+def get_worker_name():
+    return '{}:{}'.format(socket.gethostname(), os.getpid())
+
+
+def enqueue_sequences(start, end):
+    """Register the replication files from start to end as pending. The ones
+    that are already registered are not modified.
+    """
+    ReplicationSequence.objects.bulk_create(
+        [ReplicationSequence(sequence=n) for n in range(start, end + 1)],
+        ignore_conflicts=True
+        )
+
+
+def get_last_sequence():
+    """Return the number of the last registered replication file or None."""
+    last = ReplicationSequence.objects.order_by('-sequence').first()
+    return last.sequence if last else None
+
+
+def claim_sequences(limit=1, worker=None):
+    """Mark as running and return up to limit replication files that need to
+    be imported, in ascending order. The rows are selected with FOR UPDATE SKIP
+    LOCKED, so concurrent processes, in the same server or not, never claim
+    the same replication file.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        sequences = list(
+            ReplicationSequence.objects.select_for_update(skip_locked=True).filter(
+                Q(status=ReplicationSequence.PENDING) |
+                Q(
+                    status=ReplicationSequence.FAILED,
+                    attempts__lt=MAX_ATTEMPTS,
+                    finished_at__lt=now - RETRY_DELAY
+                    ) |
+                Q(
+                    status=ReplicationSequence.RUNNING,
+                    started_at__lt=now - RUNNING_TIMEOUT
+                    )
+                ).order_by('sequence').values_list('sequence', flat=True)[:limit]
+            )
+        ReplicationSequence.objects.filter(sequence__in=sequences).update(
+            status=ReplicationSequence.RUNNING,
+            attempts=F('attempts') + 1,
+            worker=worker or get_worker_name(),
+            started_at=now,
+            finished_at=None
+            )
+    return sequences
+
+
+def iter_claimed_sequences(worker=None):
+    """Claim and yield the replication files that need to be imported, one at
+    a time, until there is none left.
+    """
+    while True:
+        sequences = claim_sequences(worker=worker)
+        if not sequences:
+            return
+        yield sequences[0]
+
+
+def finish_sequence(sequence, changesets):
+    ReplicationSequence.objects.filter(sequence=sequence).update(
+        status=ReplicationSequence.DONE,
+        changesets=changesets,
+        error='',
+        finished_at=timezone.now()
+        )
+
+
+def fail_sequence(sequence, error):
+    ReplicationSequence.objects.filter(sequence=sequence).update(
+        status=ReplicationSequence.FAILED,
+        error=str(error),
+        finished_at=timezone.now()
+        )
+
+
+def get_gaps():
+    """Return a list of (first, last) tuples with the ranges of replication
+    files that are not registered, between the first and the last registered
+    ones.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """SELECT sequence + 1, next_sequence - 1 FROM (
+                SELECT sequence, LEAD(sequence) OVER (ORDER BY sequence) AS next_sequence
+                FROM {}
+            ) AS s WHERE next_sequence > sequence + 1
+            ORDER BY sequence
+            """.format(ReplicationSequence._meta.db_table)
+            )
+        return cursor.fetchall()
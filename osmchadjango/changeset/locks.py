@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import zlib
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+# Name of the lock held by the process that imports the replication files.
+IMPORT_LOCK = 'osmcha_import_replications'
+
+
+class AdvisoryLock(object):
+    """PostgreSQL session level advisory lock, that is held until it's released
+    or until the connection is closed. PostgreSQL releases it automatically if
+    the process holding it dies, so another process can acquire it.
+
+    The lock uses its own database connection, which is not managed by Django,
+    so it's not closed by connections.close_all() or close_old_connections().
+    """
+
+    def __init__(self, name, using=DEFAULT_DB_ALIAS):
+        self.name = name
+        self.key = zlib.crc32(name.encode('utf-8'))
+        self.using = using
+        self.connection = None
+        self.held = False
+
+    def connect(self):
+        wrapper = connections[self.using]
+        self.connection = wrapper.get_new_connection(wrapper.get_connection_params())
+        self.connection.autocommit = True
+
+    def execute(self, sql):
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql, [self.key])
+            return cursor.fetchone()[0]
+
+    def is_alive(self):
+        try:
+            return self.connection is not None and self.execute('SELECT %s') is not None
+        except Exception:
+            return False
+
+    def acquire(self):
+        """Try to acquire the lock without waiting. Return True if the lock is
+        held by this object.
+        """
+        if self.held and self.is_alive():
+            return True
+        self.close()
+        try:
+            self.connect()
+            self.held = self.execute('SELECT pg_try_advisory_lock(%s)')
+        except Exception as e:
+            print('Could not acquire the lock {}: {}'.format(self.name, e))
+            self.close()
+        return self.held
+
+    def release(self):
+        if self.held and self.is_alive():
+            self.execute('SELECT pg_advisory_unlock(%s)')
+        self.close()
+
+    def close(self):
+        self.held = False
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except Exception:
+                pass
+            self.connection = None
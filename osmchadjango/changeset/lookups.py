@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db.models import CharField
+from django.db.models.lookups import IContains
+
+
+@CharField.register_lookup
+class ILike(IContains):
+    """Case insensitive contains lookup that uses the ILIKE operator on the
+    column itself. The icontains lookup compares UPPER(column::text), which
+    can't use the pg_trgm indexes of the column, so it always scans the
+    whole table.
+    """
+    lookup_name = 'ilike'
+
+    def as_sql(self, compiler, connection):
+        lhs_sql, params = self.process_lhs(compiler, connection)
+        rhs_sql, rhs_params = self.process_rhs(compiler, connection)
+        params.extend(rhs_params)
+        return '{} ILIKE {}'.format(lhs_sql, rhs_sql), params
@@ -2,17 +2,31 @@ from datetime import date, datetime, timedelta
 
 from django.core.management.base import BaseCommand
 
-from ...models import Changeset
-from ...tasks import create_changeset
+from ...tasks import backfill_changesets
 
 
 class Command(BaseCommand):
     help = """Backfill missing changesets in a date range.
-        Start and end dates should be in YYYY-MM-DD format."""
+        Start and end dates should be in YYYY-MM-DD format. Use --workers and
+        --concurrency to analyse the changesets in a pool of worker processes
+        and to make concurrent requests to the OSM API. If it's interrupted,
+        run it again to import the changesets that are still missing."""
 
     def add_arguments(self, parser):
         parser.add_argument("--start_date", type=str)
         parser.add_argument("--end_date", type=str)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of worker processes used to analyse the changesets."
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=1,
+            help="Maximum number of concurrent requests to the OSM API."
+        )
 
     def handle(self, *args, **options):
         # if start_date is not defined, set it as yesterday
@@ -26,17 +40,10 @@ class Command(BaseCommand):
         except (ValueError, TypeError):
             end_date = datetime.now()
 
-        cl = Changeset.objects.filter(
-            date__gte=start_date, date__lte=end_date
-        ).values_list("id")
-        cl = [c[0] for c in cl]
-
-        id = cl[len(cl) - 1]
-        final = cl[0]
-        while id < final:
-            if id not in cl:
-                try:
-                    create_changeset(id)
-                except Exception as e:
-                    self.stdout.write("Failed to import changeset {}: {}".format(id, e))
-            id = id + 1
+        imported = backfill_changesets(
+            start_date,
+            end_date,
+            workers=max(options["workers"], 1),
+            concurrency=max(options["concurrency"], 1)
+        )
+        self.stdout.write("{} changesets imported.".format(imported))
@@ -0,0 +1,88 @@
+import json
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from shapely import get_num_coordinates, total_bounds
+from shapely.geometry import box, shape
+
+from ...replication import ChangesetsFilter
+
+
+class Command(BaseCommand):
+    help = """Compare the time needed to filter changesets bboxes by reading the
+        GeoJSON file for each replication file and testing the raw geometry, as
+        it was done before, with the prepared and indexed ChangesetsFilter.
+        Use a country-scale GeoJSON file to get meaningful numbers."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--geojson", type=str, default=settings.CHANGESETS_FILTER,
+            help="GeoJSON file to use. Default: CHANGESETS_FILTER setting."
+        )
+        parser.add_argument(
+            "--files", type=int, default=10,
+            help="Number of replication files to simulate. Default: 10."
+        )
+        parser.add_argument(
+            "--changesets", type=int, default=2000,
+            help="Number of changesets per replication file. Default: 2000."
+        )
+
+    def get_bboxes(self, bounds, number):
+        """Return random bboxes around the bounds of the filter area."""
+        random.seed(0)
+        minx, miny, maxx, maxy = bounds
+        width = maxx - minx
+        height = maxy - miny
+        bboxes = []
+        for i in range(number):
+            x = random.uniform(minx - width * 0.2, maxx + width * 0.2)
+            y = random.uniform(miny - height * 0.2, maxy + height * 0.2)
+            size = random.expovariate(1 / (width * 0.002))
+            bboxes.append(box(x, y, x + size, y + size))
+        return bboxes
+
+    def raw_geometry(self, geojson, bboxes):
+        matches = 0
+        for i in range(self.files):
+            with open(geojson, 'r') as f:
+                data = json.load(f)
+            area = shape(data['features'][0]['geometry'])
+            matches += sum(1 for bbox in bboxes if bbox.intersects(area))
+        return matches
+
+    def prepared(self, geojson, bboxes):
+        area = ChangesetsFilter(geojson)
+        matches = 0
+        for i in range(self.files):
+            matches += sum(1 for bbox in bboxes if area.intersects(bbox))
+        return matches
+
+    def handle(self, *args, **options):
+        geojson = options["geojson"]
+        if not geojson:
+            raise CommandError("Define the --geojson option or the CHANGESETS_FILTER setting.")
+        self.files = options["files"]
+
+        area = ChangesetsFilter(geojson)
+        vertices = get_num_coordinates(area.tree.geometries).sum()
+        bboxes = self.get_bboxes(
+            total_bounds(area.tree.geometries), options["changesets"]
+        )
+        total = self.files * len(bboxes)
+        self.stdout.write(
+            "{} polygons with {} vertices, {} bboxes".format(len(area.parts), vertices, total)
+        )
+
+        for name, method in [("raw geometry", self.raw_geometry), ("prepared", self.prepared)]:
+            started = time.perf_counter()
+            matches = method(geojson, bboxes)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                "{}: {:.3f} seconds, {:.2f} microseconds per bbox, {} matches".format(
+                    name, elapsed, elapsed / total * 1000000, matches
+                )
+            )
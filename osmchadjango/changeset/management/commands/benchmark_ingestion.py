@@ -0,0 +1,158 @@
+from contextlib import redirect_stdout
+import io
+import resource
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from ...benchmark import (
+    ReplayServer, benchmark_database, generate_workload, load_workload, record_workload
+)
+from ...metrics import metrics, STAGES
+from ...models import (
+    Changeset, FailedImport, Import, OpenChangeset, ReplicationSequence
+    )
+from ...tasks import create_changeset, import_replications
+
+
+class QueryCounter(object):
+    def __init__(self):
+        self.queries = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = """Measure the changesets ingestion throughput. A workload of
+        replication files and OSM API responses is replayed by a local HTTP
+        server and imported with import_replications and create_changeset in
+        a test database, that is created and destroyed by the command. Use
+        --record to save a workload from the OSM servers in --workload and run
+        the benchmark with it later, so the optimisations can be compared with
+        the same workload. Without --workload, a synthetic one is generated."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workload", type=str,
+            help="Directory of a recorded workload. Default: a synthetic workload."
+        )
+        parser.add_argument(
+            "--record", type=int, nargs=2, metavar=("START", "END"),
+            help="Record the replication files from START to END in --workload and exit."
+        )
+        parser.add_argument(
+            "--files", type=int, default=5,
+            help="Number of replication files of the synthetic workload. Default: 5."
+        )
+        parser.add_argument(
+            "--changesets", type=int, default=200,
+            help="Number of changesets per synthetic replication file. Default: 200."
+        )
+        parser.add_argument(
+            "--create", type=int, default=100,
+            help="Number of changesets imported with create_changeset. Default: 100."
+        )
+        parser.add_argument(
+            "--workers", type=int, default=1,
+            help="Number of worker processes used to analyse the changesets."
+        )
+        parser.add_argument(
+            "--concurrency", type=int, default=1,
+            help="Maximum number of concurrent requests to the OSM API."
+        )
+        parser.add_argument(
+            "--latency", type=float, default=0,
+            help="Milliseconds the server waits before each response. Default: 0."
+        )
+        parser.add_argument(
+            "--geojson", type=str, default=None,
+            help="GeoJSON file used to filter the changesets. Default: no filter."
+        )
+        parser.add_argument(
+            "--keepdb", action="store_true",
+            help="Keep the test database between runs."
+        )
+
+    def run(self, name, func):
+        """Run func, that returns the number of changesets imported, and
+        report its throughput, database queries and memory usage.
+        """
+        Changeset.objects.all().delete()
+        ReplicationSequence.objects.all().delete()
+        Import.objects.all().delete()
+        FailedImport.objects.all().delete()
+        OpenChangeset.objects.all().delete()
+        counter = QueryCounter()
+        since = metrics.snapshot()
+        started = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            if self.verbosity > 1:
+                imported = func()
+            else:
+                with redirect_stdout(io.StringIO()):
+                    imported = func()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            "{}: {} changesets in {:.2f} seconds ({:.2f} changesets/s), "
+            "{:.2f} queries per changeset, peak RSS {:.1f} MB, workers {:.1f} MB".format(
+                name, imported, elapsed, imported / elapsed if elapsed else 0,
+                counter.queries / imported if imported else 0,
+                resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+                resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+            )
+        )
+        stages = metrics.summary(since).get("stage_seconds", {})
+        self.stdout.write("  " + ", ".join(
+            "{} {:.2f}s".format(stage, stages[stage]) for stage in STAGES if stage in stages
+        ))
+
+    def create_changesets(self, changeset_ids):
+        created = 0
+        for changeset_id in changeset_ids:
+            try:
+                create_changeset(changeset_id)
+                created += 1
+            except Exception as e:
+                print("Failed to create changeset {}: {}".format(changeset_id, e))
+        return created
+
+    def handle(self, *args, **options):
+        self.verbosity = options["verbosity"]
+        directory = options["workload"]
+        if options["record"]:
+            if not directory:
+                raise CommandError("Define the --workload directory to record.")
+            record_workload(
+                directory, settings.OSM_PLANET_BASE_URL, *options["record"],
+                concurrency=max(options["concurrency"], 1)
+            )
+            return
+
+        with tempfile.TemporaryDirectory() as tmp:
+            if not directory:
+                directory = tmp
+                generate_workload(directory, options["files"], options["changesets"])
+            workload = load_workload(directory)
+            self.stdout.write(
+                "Workload: replication files {} to {}, {} changesets".format(
+                    workload["start"], workload["end"], len(workload["changesets"])
+                )
+            )
+
+            with ReplayServer(directory, latency=options["latency"] / 1000) as server:
+                with benchmark_database(options["keepdb"]), server.replay(), \
+                        override_settings(CHANGESETS_FILTER=options["geojson"]):
+                    self.run("import_replications", lambda: import_replications(
+                        workload["start"], workload["end"],
+                        workers=max(options["workers"], 1),
+                        concurrency=max(options["concurrency"], 1)
+                    ))
+                    self.run("create_changeset", lambda: self.create_changesets(
+                        workload["changesets"][:options["create"]]
+                    ))
@@ -0,0 +1,130 @@
+import time
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+from django.urls import resolve
+
+from rest_framework.authtoken.models import Token
+
+from ....contrib.postgis_pool.base import pool
+from ....users.models import User
+from ...benchmark import benchmark_database, close_connections, generate_changesets
+from ...models import Changeset
+from ...user_stats import rebuild_user_stats
+
+URLS = [
+    '/api/v1/changesets/', '/api/v1/changesets/?editor=josm', '/api/v1/stats/',
+    '/api/v1/changesets/1/', '/api/v1/user-stats/?uids=1,2,3,4,5',
+    ]
+
+# name, atomic requests, DB_POOL_SIZE
+SETUPS = [
+    ('atomic, no pool', True, 0),
+    ('non-atomic, no pool', False, 0),
+    ('non-atomic, pool', False, 10),
+    ]
+
+CACHES = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+def start_response(status, headers, exc_info=None):
+    pass
+
+
+class Command(BaseCommand):
+    help = """Measure the latency of the read-only endpoints and the number of
+        database connections opened by request, running them in a transaction
+        (ATOMIC_REQUESTS) without the connection pool, outside a transaction
+        without the pool and outside a transaction with the pool. The requests
+        are handled by the WSGI handler, one after the other, in a test
+        database filled with --changesets generated changesets."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--changesets", type=int, default=100000,
+            help="Number of changesets generated. Default: 100000."
+        )
+        parser.add_argument(
+            "--requests", type=int, default=200,
+            help="Number of requests to each url in each setup. Default: 200."
+        )
+        parser.add_argument(
+            "--url", action="append", dest="urls",
+            help="Url to request, like '/api/v1/changesets/'. Can be repeated."
+        )
+        parser.add_argument(
+            "--keepdb", action="store_true",
+            help="Keep the test database and its changesets between runs."
+        )
+
+    def request(self, handler, factory, url, token):
+        started = time.perf_counter()
+        response = handler(
+            factory.get(url, HTTP_AUTHORIZATION='Token {}'.format(token)).environ,
+            start_response
+        )
+        b''.join(response)
+        # closing the response sends request_finished, that closes the connections
+        response.close()
+        return time.perf_counter() - started, response.status_code
+
+    def measure(self, url, token, atomic, pool_size, requests):
+        """Return the latencies of the requests and the number of connections
+        opened.
+        """
+        view = resolve(url.split('?')[0]).func
+        non_atomic = view.__dict__.get('_non_atomic_requests')
+        if atomic:
+            view._non_atomic_requests = set()
+        close_connections()
+        handler = WSGIHandler()
+        factory = RequestFactory()
+        latencies = []
+        try:
+            with override_settings(DB_POOL_SIZE=pool_size):
+                # the first request loads the code and fills the pool
+                self.request(handler, factory, url, token)
+                opened = pool.opened
+                for i in range(requests):
+                    latency, status = self.request(handler, factory, url, token)
+                    if status != 200:
+                        self.stderr.write("{} returned {}".format(url, status))
+                    latencies.append(latency)
+                opened = pool.opened - opened
+                close_connections()
+        finally:
+            if non_atomic is None:
+                view.__dict__.pop('_non_atomic_requests', None)
+            else:
+                view._non_atomic_requests = non_atomic
+        return sorted(latencies), opened
+
+    def handle(self, *args, **options):
+        with benchmark_database(options["keepdb"]):
+            if not Changeset.objects.exists():
+                generate_changesets(options["changesets"])
+                rebuild_user_stats()
+            user, created = User.objects.get_or_create(
+                username='benchmark', defaults={'is_staff': True}
+            )
+            token, created = Token.objects.get_or_create(user=user)
+            requests = max(options["requests"], 1)
+            # the replicas don't have the test database and the dummy cache
+            # disables the throttling
+            with override_settings(ALLOWED_HOSTS=['*'], DATABASE_REPLICAS=[], CACHES=CACHES):
+                for url in options["urls"] or URLS:
+                    for name, atomic, pool_size in SETUPS:
+                        latencies, opened = self.measure(
+                            url, token.key, atomic, pool_size, requests
+                        )
+                        self.stdout.write(
+                            "{} ({}): mean {:.2f}ms, p50 {:.2f}ms, p95 {:.2f}ms, "
+                            "{:.2f} connections by request".format(
+                                url, name,
+                                sum(latencies) / len(latencies) * 1000,
+                                latencies[len(latencies) // 2] * 1000,
+                                latencies[int(len(latencies) * 0.95)] * 1000,
+                                opened / len(latencies)
+                            )
+                        )
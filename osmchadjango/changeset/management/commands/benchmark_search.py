@@ -0,0 +1,92 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...benchmark import benchmark_database, generate_changesets
+from ...models import Changeset
+
+SEARCHES = [
+    'comment=#hotosm', 'comment=missing maps', 'editor=josm', 'source=bing',
+    'imagery_used=esri'
+    ]
+FIELDS = ['comment', 'source', 'imagery_used', 'editor']
+
+
+class Command(BaseCommand):
+    help = """Measure the latency of the comment, source, imagery_used and
+        editor filters of the changesets. A test database is filled with
+        --rows generated changesets and each search is executed with the
+        icontains lookup, that scans the whole table, and with the ilike lookup
+        used by the filters, that uses the pg_trgm indexes. The searches are
+        defined as field=value, like 'comment=#hotosm'."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows", type=int, default=2000000,
+            help="Number of changesets generated. Default: 2000000."
+        )
+        parser.add_argument(
+            "--search", action="append", dest="searches",
+            help="Search to measure, like 'editor=josm'. Can be repeated."
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=3,
+            help="Number of executions of each query. The fastest is reported."
+        )
+        parser.add_argument(
+            "--explain", action="store_true",
+            help="Print the query plan of the ilike queries."
+        )
+        parser.add_argument(
+            "--keepdb", action="store_true",
+            help="Keep the test database and its changesets between runs."
+        )
+
+    def measure(self, queryset, repeat):
+        """Return the number of changesets of the queryset and the fastest of
+        the executions of its count and first page.
+        """
+        timings = []
+        for i in range(repeat):
+            started = time.perf_counter()
+            count = queryset.count()
+            list(queryset.order_by('-date').values_list('id', flat=True)[:50])
+            timings.append(time.perf_counter() - started)
+        return count, min(timings)
+
+    def handle(self, *args, **options):
+        searches = []
+        for search in options["searches"] or SEARCHES:
+            field, sep, value = search.partition('=')
+            if field not in FIELDS or not value:
+                raise CommandError(
+                    "Invalid search '{}'. Use one of the fields {} and a value.".format(
+                        search, ', '.join(FIELDS)
+                        )
+                    )
+            searches.append((field, value))
+
+        with benchmark_database(options["keepdb"]):
+            if not Changeset.objects.exists():
+                started = time.perf_counter()
+                generate_changesets(options["rows"])
+                self.stdout.write(
+                    "{} changesets generated in {:.2f} seconds.".format(
+                        options["rows"], time.perf_counter() - started
+                    )
+                )
+            for field, value in searches:
+                count, icontains = self.measure(
+                    Changeset.objects.filter(**{'{}__icontains'.format(field): value}),
+                    max(options["repeat"], 1)
+                )
+                queryset = Changeset.objects.filter(**{'{}__ilike'.format(field): value})
+                count, ilike = self.measure(queryset, max(options["repeat"], 1))
+                self.stdout.write(
+                    "{}={}: {} changesets, icontains {:.3f}s, ilike {:.3f}s ({:.1f}x)".format(
+                        field, value, count, icontains, ilike,
+                        icontains / ilike if ilike else 0
+                    )
+                )
+                if options["explain"]:
+                    self.stdout.write(queryset.explain(analyze=True))
@@ -1,7 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 
-from ...models import Changeset
+from ...deletion import delete_unchecked_changesets
 
 
 def get_six_months_ago():
@@ -10,8 +10,29 @@ def get_six_months_ago():
 
 class Command(BaseCommand):
     help = """Command that deletes all the unchecked changesets older than 180 days.
+    The changesets are deleted in small batches, with a pause between them, so
+    it can run while the changesets are imported and reviewed. If it stops,
+    run it again to continue.
     """
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of changesets deleted in each transaction."
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=1,
+            help="Seconds to wait between the batches."
+        )
+
     def handle(self, *args, **options):
-        date = get_six_months_ago
-        Changeset.objects.filter(date__lt=date(), checked=False).delete()
+        deleted = delete_unchecked_changesets(
+            get_six_months_ago(),
+            batch_size=max(options["batch_size"], 1),
+            pause=max(options["pause"], 0)
+        )
+        self.stdout.write("{} changesets deleted.".format(deleted))
@@ -1,11 +1,75 @@
 from django.core.management.base import BaseCommand
 
-from ...tasks import fetch_latest
+from ...locks import IMPORT_LOCK, AdvisoryLock
+from ...tasks import fetch_latest, follow_replications, import_pending_replications
 
 
 class Command(BaseCommand):
     help = """Command to import all the replication files since the last import
-    or the last 1000."""
+    or the last 1000. Use --workers to import the replication files and analyse
+    the changesets using a pool of worker processes and --concurrency to make
+    concurrent requests to the OSM API. Use --follow to keep importing the new
+    replication files. Only one process imports the files at a time, the
+    others wait until it stops. Use --pending to only import the replication
+    files registered as pending, which can be done by many processes at the
+    same time."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of worker processes used to import the changesets."
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=1,
+            help="Maximum number of concurrent requests to the OSM API."
+        )
+        parser.add_argument(
+            "--pending",
+            action="store_true",
+            help="Only import the pending replication files."
+        )
+        parser.add_argument(
+            "--follow",
+            action="store_true",
+            help="Keep running and importing the new replication files."
+        )
+        parser.add_argument(
+            "--min-interval",
+            type=int,
+            default=30,
+            help="Minimum number of seconds between the checks for new replication files."
+        )
+        parser.add_argument(
+            "--max-interval",
+            type=int,
+            default=600,
+            help="Maximum number of seconds between the checks for new replication files."
+        )
 
     def handle(self, *args, **options):
-        fetch_latest()
+        workers = max(options["workers"], 1)
+        concurrency = max(options["concurrency"], 1)
+        if options["pending"]:
+            import_pending_replications(workers=workers, concurrency=concurrency)
+            return
+        if options["follow"]:
+            follow_replications(
+                workers=workers,
+                min_interval=options["min_interval"],
+                max_interval=max(options["max_interval"], options["min_interval"]),
+                concurrency=concurrency
+            )
+            return
+
+        lock = AdvisoryLock(IMPORT_LOCK)
+        if not lock.acquire():
+            self.stdout.write("Another process is importing the replication files.")
+            return
+        try:
+            fetch_latest(workers=workers, concurrency=concurrency)
+        finally:
+            lock.release()
@@ -1,29 +1,72 @@
-from django.core.management.base import BaseCommand
-from django.conf import settings
+from glob import glob
+import time
 
-from osmcha.changeset import ChangesetList
+from django.core.management.base import BaseCommand
 
-from ...tasks import create_changeset
+from ...metrics import metrics, report_metrics
+from ...tasks import import_replication_files
 
 
 class Command(BaseCommand):
-    help = """Read a local file and import all changesets."""
+    help = """Read local replication files and import all their changesets. It
+    accepts many files and glob patterns, like "archive/*/*.osm.gz". Use
+    --workers to analyse the changesets in a pool of worker processes and
+    --concurrency to make concurrent requests to the OSM API."""
 
     def add_arguments(self, parser):
-        parser.add_argument('filename', nargs=1, type=str)
+        parser.add_argument('filename', nargs='+', type=str)
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Number of worker processes used to analyse the changesets.'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=1,
+            help='Maximum number of concurrent requests to the OSM API.'
+        )
 
     def handle(self, *args, **options):
-        filename = options['filename'][0]
-        cl = ChangesetList(filename, geojson=settings.CHANGESETS_FILTER)
-        imported = []
-
-        for c in cl.changesets:
-            try:
-                create_changeset(c['id'])
-                imported.append(c['id'])
-            except Exception as e:
-                self.stdout.write("Failed to import changeset {}: {}".format(c["id"], e))
-
-        self.stdout.write(
-            '{} changesets created from {}.'.format(len(imported), filename)
+        filenames = []
+        for pattern in options['filename']:
+            matches = sorted(glob(pattern))
+            if not matches:
+                self.stdout.write('No files found in {}.'.format(pattern))
+            filenames.extend(matches)
+
+        failed_files = []
+
+        def on_finish(filename, imported, failed, elapsed):
+            self.stdout.write(
+                '{} changesets created from {}. {} failed. {:.1f} seconds '
+                '({:.2f} changesets/s).'.format(
+                    imported, filename, failed, elapsed,
+                    imported / elapsed if elapsed else 0
+                )
+            )
+
+        def on_error(filename, error):
+            failed_files.append(filename)
+            self.stdout.write('Failed to read {}: {}'.format(filename, error))
+
+        started = time.monotonic()
+        since = metrics.snapshot()
+        imported = import_replication_files(
+            [(filename, filename) for filename in filenames],
+            on_finish=on_finish,
+            on_error=on_error,
+            workers=max(options['workers'], 1),
+            concurrency=max(options['concurrency'], 1)
+        )
+        elapsed = time.monotonic() - started
+        report_metrics("import_file", since, imported=imported, elapsed=elapsed)
+        if len(filenames) > 1:
+            self.stdout.write(
+                '{} changesets created from {} files in {:.1f} seconds '
+                '({:.2f} changesets/s). {} files failed.'.format(
+                    imported, len(filenames), elapsed,
+                    imported / elapsed if elapsed else 0, len(failed_files)
+                )
             )
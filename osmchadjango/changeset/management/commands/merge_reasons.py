@@ -2,7 +2,8 @@ from django.core.management.base import BaseCommand
 from django.conf import settings
 from django.db import connection
 
-from ...models import SuspicionReasons
+from ...id_arrays import update_id_arrays
+from ...models import Changeset, SuspicionReasons
 
 
 class Command(BaseCommand):
@@ -29,6 +30,11 @@ class Command(BaseCommand):
                 )
             changeset_number = changesets.count()
             origin_reason_name = origin_reason.name
+            changeset_ids = list(
+                Changeset.objects.filter(
+                    reason_ids__contains=[origin_reason.id]
+                    ).values_list('id', flat=True)
+                )
             with connection.cursor() as cursor:
                 cursor.execute(
                     """UPDATE changeset_changeset_reasons
@@ -41,6 +47,7 @@ class Command(BaseCommand):
                         tuple([c.id for c in excluded_changesets])
                     ]
                     )
+            update_id_arrays(changeset_ids, ['reasons'])
             origin_reason.delete()
             self.stdout.write(
                 """{} changesets were moved from '{}' to '{}' SuspicionReasons.
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from ...models import OpenChangeset
+from ...tasks import reanalyse_open_changesets
+
+
+class Command(BaseCommand):
+    help = """Check the changesets that were open when they were imported and
+        analyse again the ones that were closed with more changes. The ones
+        that are still open are checked again one hour later. Run it
+        periodically, like fetchchangesets. Use --status to only show the
+        number of open changesets."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Number of changesets claimed and checked at a time."
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of worker processes used to analyse the changesets."
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=1,
+            help="Maximum number of concurrent requests to the OSM API."
+        )
+        parser.add_argument("--status", action="store_true")
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            "{} open changesets, {} to be checked.".format(
+                OpenChangeset.objects.count(),
+                OpenChangeset.objects.filter(check_at__lte=timezone.now()).count()
+            )
+        )
+        if options["status"]:
+            return
+
+        analysed = reanalyse_open_changesets(
+            batch_size=max(options["batch_size"], 1),
+            workers=max(options["workers"], 1),
+            concurrency=max(options["concurrency"], 1)
+        )
+        self.stdout.write("{} changesets analysed again.".format(analysed))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from ...id_arrays import rebuild_id_arrays
+
+
+class Command(BaseCommand):
+    help = """Calculate again the reason_ids, tag_ids and reasons_count of all
+        the changesets from their reasons and tags. They are updated when the
+        reasons and tags of the changesets change, so it only needs to run to
+        fix them if the relations were changed by other means, like SQL
+        queries or code running while the migrations were applied."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=10000,
+            help="Number of changesets updated in each transaction. Default: 10000."
+        )
+
+    def handle(self, *args, **options):
+        changesets = rebuild_id_arrays(max(options["batch_size"], 1))
+        self.stdout.write("Reasons and tags of {} changesets updated.".format(changesets))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from ...user_stats import rebuild_user_stats
+
+
+class Command(BaseCommand):
+    help = """Calculate again the statistics of all the users from the
+        changesets. The statistics are updated when the changesets are
+        imported, reviewed and deleted, so it only needs to run to fix them
+        if they were changed by other means, like SQL queries."""
+
+    def handle(self, *args, **options):
+        users = rebuild_user_stats()
+        self.stdout.write("Statistics of {} users calculated.".format(users))
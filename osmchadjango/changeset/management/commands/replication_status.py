@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from ...ledger import enqueue_sequences, get_gaps
+from ...models import ReplicationSequence
+
+
+class Command(BaseCommand):
+    help = """Show the number of replication files by import status, the ones
+        that failed and the gaps in the ledger of imported replication files.
+        Use --retry-failed to import again the replication files that failed
+        and --enqueue-gaps to register the missing replication files as
+        pending."""
+
+    def add_arguments(self, parser):
+        parser.add_argument("--retry-failed", action="store_true")
+        parser.add_argument("--enqueue-gaps", action="store_true")
+
+    def handle(self, *args, **options):
+        counts = ReplicationSequence.objects.values("status").annotate(
+            total=Count("sequence")
+        ).order_by("status")
+        for item in counts:
+            self.stdout.write("{}: {}".format(item["status"], item["total"]))
+
+        failed = ReplicationSequence.objects.filter(status=ReplicationSequence.FAILED)
+        for item in failed:
+            self.stdout.write(
+                "Replication file {} failed {} times: {}".format(
+                    item.sequence, item.attempts, item.error
+                )
+            )
+
+        gaps = get_gaps()
+        for first, last in gaps:
+            self.stdout.write("Missing replication files: {} to {}".format(first, last))
+
+        if options["retry_failed"]:
+            retried = failed.update(status=ReplicationSequence.PENDING, attempts=0)
+            self.stdout.write("{} failed replication files set as pending.".format(retried))
+        if options["enqueue_gaps"]:
+            for first, last in gaps:
+                enqueue_sequences(first, last)
+            self.stdout.write(
+                "{} missing replication files set as pending.".format(
+                    sum(last - first + 1 for first, last in gaps)
+                )
+            )
@@ -0,0 +1,70 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.utils import timezone
+
+from ...failed_imports import MAX_ATTEMPTS
+from ...models import FailedImport
+from ...tasks import retry_failed_imports
+
+
+class Command(BaseCommand):
+    help = """Import again the changesets that failed to be imported and whose
+        retry time has come. Each time a changeset fails, its next retry is
+        delayed twice as long, until it fails {} times. Run it periodically,
+        like fetchchangesets. Use --status to only show the failed imports and
+        --reset to retry the ones that reached the maximum attempts.""".format(
+            MAX_ATTEMPTS
+        )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Number of changesets claimed and imported at a time."
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of worker processes used to analyse the changesets."
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=1,
+            help="Maximum number of concurrent requests to the OSM API."
+        )
+        parser.add_argument("--status", action="store_true")
+        parser.add_argument("--reset", action="store_true")
+
+    def handle(self, *args, **options):
+        failed = FailedImport.objects.all()
+        given_up = failed.filter(attempts__gte=MAX_ATTEMPTS)
+        self.stdout.write(
+            "{} failed imports: {} waiting for retry, {} gave up.".format(
+                failed.count(),
+                failed.filter(
+                    attempts__lt=MAX_ATTEMPTS, retry_at__gt=timezone.now()
+                ).count(),
+                given_up.count()
+            )
+        )
+        errors = failed.values("error_class").annotate(
+            total=Count("changeset_id")
+        ).order_by("-total")
+        for item in errors:
+            self.stdout.write("{}: {}".format(item["error_class"], item["total"]))
+        if options["status"]:
+            return
+
+        if options["reset"]:
+            reset = given_up.update(attempts=0, retry_at=timezone.now())
+            self.stdout.write("{} failed imports set to retry.".format(reset))
+
+        imported = retry_failed_imports(
+            batch_size=max(options["batch_size"], 1),
+            workers=max(options["workers"], 1),
+            concurrency=max(options["concurrency"], 1)
+        )
+        self.stdout.write("{} changesets imported.".format(imported))
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+# Stages of the changesets ingestion:
+# download: reading the compressed replication files, from the network or disk
+# decompress: gzip decoding of the replication files
+# parse: XML parsing of the replication files
+# filter: testing if the changesets intersect with the CHANGESETS_FILTER area
+# api_request: requests of changesets and users data to the OSM API
+# analysis: Analyse.full_analysis of the changesets
+# db_write: saving the batches of analysed changesets
+STAGES = [
+    'download', 'decompress', 'parse', 'filter', 'api_request', 'analysis',
+    'db_write'
+    ]
+
+# Name, type, label and description of the metrics, in the Prometheus format.
+METRICS = {
+    'stage_seconds': (
+        'counter', 'stage',
+        'Time spent in each stage of the ingestion, excluding the nested stages.'
+        ),
+    'stage_calls': ('counter', 'stage', 'Number of times each stage was run.'),
+    'bytes': ('counter', 'stage', 'Bytes read or received by each stage.'),
+    'changesets': (
+        'counter', 'result',
+        'Changesets filtered out, analysed, failed or saved in the database.'
+        ),
+    'reasons': (
+        'counter', None, 'Suspicion reasons added to the saved changesets.'
+        ),
+    'files': ('counter', 'result', 'Replication files imported or failed.'),
+    'failures': ('counter', 'stage', 'Errors in each stage of the ingestion.'),
+    }
+
+PREFIX = 'osmcha_ingestion_'
+
+
+class Timer(object):
+    def __init__(self, stage):
+        self.stage = stage
+        self.started = time.perf_counter()
+        self.nested = 0
+        self.running = True
+
+
+class Metrics(object):
+    """Timers and counters of the changesets ingestion of this process. The
+    time of a stage is measured without the time of the stages started inside
+    it in the same thread, so the time spent decompressing a file doesn't
+    include the time spent downloading it. The counters only grow, like
+    Prometheus counters; use snapshot and summary to get the values of a
+    period.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = defaultdict(float)
+        self.local = threading.local()
+
+    def inc(self, name, value=1, label=None):
+        with self.lock:
+            self.values[(name, label)] += value
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            self.values[('stage_seconds', stage)] += seconds
+            self.values[('stage_calls', stage)] += 1
+
+    def stack(self):
+        if not hasattr(self.local, 'stack'):
+            self.local.stack = []
+        return self.local.stack
+
+    def start(self, stage):
+        """Start and return a Timer of a stage. It must be stopped in the same
+        thread.
+        """
+        timer = Timer(stage)
+        self.stack().append(timer)
+        return timer
+
+    def stop(self, timer):
+        """Stop a Timer and record its time. Stopping it again does nothing."""
+        if not timer.running:
+            return
+        timer.running = False
+        elapsed = time.perf_counter() - timer.started
+        stack = self.stack()
+        while stack:
+            if stack.pop() is timer:
+                break
+        if stack:
+            stack[-1].nested += elapsed
+        self.observe(timer.stage, elapsed - timer.nested)
+
+    @contextmanager
+    def timer(self, stage):
+        timer = self.start(stage)
+        try:
+            yield timer
+        finally:
+            self.stop(timer)
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.values)
+
+    def summary(self, since=None):
+        """Return a dict with the values of the metrics, minus the values of
+        the since snapshot.
+        """
+        since = since or {}
+        summary = {}
+        for (name, label), value in self.snapshot().items():
+            value -= since.get((name, label), 0)
+            if label is None:
+                summary[name] = value
+            else:
+                summary.setdefault(name, {})[label] = value
+        return summary
+
+    def render(self):
+        """Return the metrics in the Prometheus text exposition format."""
+        values = self.snapshot()
+        lines = []
+        for name in sorted(METRICS):
+            metric_type, label_name, description = METRICS[name]
+            full_name = '{}{}_total'.format(PREFIX, name)
+            lines.append('# HELP {} {}'.format(full_name, description))
+            lines.append('# TYPE {} {}'.format(full_name, metric_type))
+            samples = sorted(
+                (label, value) for (key, label), value in values.items()
+                if key == name
+                )
+            for label, value in samples:
+                if label is None:
+                    lines.append('{} {!r}'.format(full_name, value))
+                else:
+                    lines.append('{}{{{}="{}"}} {!r}'.format(
+                        full_name, label_name, label, value
+                        ))
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+
+
+class MeasuredReader(object):
+    """File object wrapper that records the time spent reading it and the
+    number of bytes read in a stage of the metrics.
+    """
+
+    def __init__(self, source, stage):
+        self.source = source
+        self.stage = stage
+
+    def read(self, size=-1):
+        with metrics.timer(self.stage):
+            data = self.source.read(size)
+        metrics.inc('bytes', len(data), self.stage)
+        return data
+
+    def readable(self):
+        return True
+
+
+def write_metrics_file(path):
+    """Write the metrics to a file in the Prometheus text format. The file is
+    replaced atomically, so it can be read by the textfile collector of the
+    node_exporter at any time.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.metrics-')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(metrics.render())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def report_metrics(event, since=None, **extra):
+    """Log a JSON summary of the metrics since the since snapshot and write
+    the metrics to the INGESTION_METRICS_FILE, if it's defined.
+    """
+    summary = dict(event=event, **extra)
+    summary.update(metrics.summary(since))
+    logger.info(json.dumps(summary, sort_keys=True))
+    path = getattr(settings, 'INGESTION_METRICS_FILE', None)
+    if path:
+        try:
+            write_metrics_file(path)
+        except OSError as e:
+            logger.warning('Could not write the metrics to {}: {}'.format(path, e))
@@ -0,0 +1,28 @@
+# Generated by Django 2.2.28 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('changeset', '0058_replicationsequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FailedImport',
+            fields=[
+                ('changeset_id', models.IntegerField(primary_key=True, serialize=False)),
+                ('error_class', models.CharField(max_length=255)),
+                ('error', models.TextField(blank=True)),
+                ('attempts', models.IntegerField(default=1)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('failed_at', models.DateTimeField()),
+                ('retry_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'ordering': ['retry_at'],
+            },
+        ),
+    ]
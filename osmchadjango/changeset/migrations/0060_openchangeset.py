@@ -0,0 +1,25 @@
+# Generated by Django 2.2.28 on 2026-10-18 14:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('changeset', '0059_failedimport'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OpenChangeset',
+            fields=[
+                ('changeset_id', models.IntegerField(primary_key=True, serialize=False)),
+                ('num_changes', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('check_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'ordering': ['check_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 2.2.28 on 2026-10-18 15:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # The indexes of this and the next changeset migrations are created
+    # concurrently to not lock the table, which can't be done in a transaction.
+    atomic = False
+
+    dependencies = [
+        ('changeset', '0060_openchangeset'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    sql="""CREATE INDEX CONCURRENTLY IF NOT EXISTS changeset_unchecked_date_idx
+                        ON changeset_changeset (date DESC) WHERE checked = false""",
+                    reverse_sql="DROP INDEX CONCURRENTLY IF EXISTS changeset_unchecked_date_idx",
+                ),
+            ],
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='changeset',
+                    index=models.Index(condition=models.Q(checked=False), fields=['-date'], name='changeset_unchecked_date_idx'),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,93 @@
+# Generated by Django 2.2.28 on 2026-10-18 16:00
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models, transaction
+
+BATCH_SIZE = 50000
+
+
+def fill_id_arrays(apps, schema_editor):
+    """Set the id arrays and the number of reasons of the changesets that have
+    reasons or tags, by ranges of BATCH_SIZE ids updated in their own
+    transactions.
+    """
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT min(id), max(id) FROM changeset_changeset')
+        min_id, max_id = cursor.fetchone()
+    if min_id is None:
+        return
+    for start in range(min_id, max_id + 1, BATCH_SIZE):
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(
+                """UPDATE changeset_changeset SET
+                    reason_ids = ARRAY(
+                        SELECT suspicionreasons_id FROM changeset_changeset_reasons
+                        WHERE changeset_id = changeset_changeset.id ORDER BY suspicionreasons_id
+                    ),
+                    tag_ids = ARRAY(
+                        SELECT tag_id FROM changeset_changeset_tags
+                        WHERE changeset_id = changeset_changeset.id ORDER BY tag_id
+                    ),
+                    reasons_count = (
+                        SELECT count(*) FROM changeset_changeset_reasons
+                        WHERE changeset_id = changeset_changeset.id
+                    )
+                WHERE id >= %s AND id < %s AND (
+                    EXISTS (SELECT 1 FROM changeset_changeset_reasons WHERE changeset_id = changeset_changeset.id)
+                    OR EXISTS (SELECT 1 FROM changeset_changeset_tags WHERE changeset_id = changeset_changeset.id)
+                )""",
+                [start, start + BATCH_SIZE]
+            )
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('changeset', '0061_changeset_unchecked_date_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='changeset',
+            name='reason_ids',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), blank=True, default=list, editable=False, size=None),
+        ),
+        migrations.AddField(
+            model_name='changeset',
+            name='tag_ids',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), blank=True, default=list, editable=False, size=None),
+        ),
+        migrations.AddField(
+            model_name='changeset',
+            name='reasons_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_id_arrays, reverse_code=migrations.RunPython.noop),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    sql="""CREATE INDEX CONCURRENTLY IF NOT EXISTS changeset_reason_ids_idx
+                        ON changeset_changeset USING gin (reason_ids)""",
+                    reverse_sql="DROP INDEX CONCURRENTLY IF EXISTS changeset_reason_ids_idx",
+                ),
+                migrations.RunSQL(
+                    sql="""CREATE INDEX CONCURRENTLY IF NOT EXISTS changeset_tag_ids_idx
+                        ON changeset_changeset USING gin (tag_ids)""",
+                    reverse_sql="DROP INDEX CONCURRENTLY IF EXISTS changeset_tag_ids_idx",
+                ),
+            ],
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='changeset',
+                    index=django.contrib.postgres.indexes.GinIndex(fields=['reason_ids'], name='changeset_reason_ids_idx'),
+                ),
+                migrations.AddIndex(
+                    model_name='changeset',
+                    index=django.contrib.postgres.indexes.GinIndex(fields=['tag_ids'], name='changeset_tag_ids_idx'),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 2.2.28 on 2026-10-18 17:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('changeset', '0062_changeset_reason_ids_tag_ids'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    sql="""CREATE INDEX CONCURRENTLY IF NOT EXISTS changeset_reasons_count_idx
+                        ON changeset_changeset (reasons_count)""",
+                    reverse_sql="DROP INDEX CONCURRENTLY IF EXISTS changeset_reasons_count_idx",
+                ),
+            ],
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='changeset',
+                    index=models.Index(fields=['reasons_count'], name='changeset_reasons_count_idx'),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 2.2.28 on 2026-10-18 18:00
+
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+TRGM_INDEXES = [
+    ('comment', 'changeset_comment_trgm_idx'),
+    ('source', 'changeset_source_trgm_idx'),
+    ('imagery_used', 'changeset_imagery_trgm_idx'),
+    ('editor', 'changeset_editor_trgm_idx'),
+]
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('changeset', '0063_changeset_reasons_count'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    sql="""CREATE INDEX CONCURRENTLY IF NOT EXISTS {}
+                        ON changeset_changeset USING gin ({} gin_trgm_ops)""".format(name, field),
+                    reverse_sql="DROP INDEX CONCURRENTLY IF EXISTS {}".format(name),
+                )
+                for field, name in TRGM_INDEXES
+            ],
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='changeset',
+                    index=GinIndex(fields=[field], name=name, opclasses=['gin_trgm_ops']),
+                )
+                for field, name in TRGM_INDEXES
+            ],
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 2.2.28 on 2026-10-18 20:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('changeset', '0064_changeset_trgm_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('uid', models.CharField(max_length=255, primary_key=True, serialize=False, verbose_name='User ID')),
+                ('changesets', models.IntegerField(default=0)),
+                ('checked_changesets', models.IntegerField(default=0)),
+                ('harmful_changesets', models.IntegerField(default=0)),
+                ('last_seen', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'User statistics',
+                'verbose_name_plural': 'User statistics',
+                'ordering': ['uid'],
+            },
+        ),
+        migrations.RunSQL(
+            sql="""INSERT INTO changeset_userstats
+                    (uid, changesets, checked_changesets, harmful_changesets, last_seen)
+                SELECT uid, count(*), count(*) FILTER (WHERE checked),
+                    count(*) FILTER (WHERE harmful), max(date)
+                FROM changeset_changeset WHERE uid IS NOT NULL AND uid <> '' GROUP BY uid""",
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -1,6 +1,6 @@
 from django.contrib.gis.db import models
 from django.contrib.postgres.indexes import GinIndex
-from django.contrib.postgres.fields import JSONField
+from django.contrib.postgres.fields import ArrayField, JSONField
 from django.utils.translation import ugettext, ugettext_lazy as _
 from django.conf import settings
 
@@ -87,6 +87,11 @@ class Changeset(models.Model):
         )
     check_date = models.DateTimeField(null=True, blank=True)
     metadata = JSONField(default=dict)
+    # copies of the reasons and tags ids and the number of reasons, kept in
+    # sync by the id_arrays module
+    reason_ids = ArrayField(models.IntegerField(), default=list, blank=True, editable=False)
+    tag_ids = ArrayField(models.IntegerField(), default=list, blank=True, editable=False)
+    reasons_count = models.IntegerField(default=0, editable=False)
 
     def __str__(self):
         return '%s' % self.id
@@ -121,7 +126,32 @@ class Changeset(models.Model):
     class Meta:
         ordering = ['-date']
         indexes = [
-            GinIndex(fields=['tag_changes'])
+            GinIndex(fields=['tag_changes']),
+            GinIndex(fields=['reason_ids'], name='changeset_reason_ids_idx'),
+            GinIndex(fields=['tag_ids'], name='changeset_tag_ids_idx'),
+            models.Index(fields=['reasons_count'], name='changeset_reasons_count_idx'),
+            # pg_trgm indexes used by the ilike lookup of the filters
+            GinIndex(
+                fields=['comment'], name='changeset_comment_trgm_idx',
+                opclasses=['gin_trgm_ops']
+                ),
+            GinIndex(
+                fields=['source'], name='changeset_source_trgm_idx',
+                opclasses=['gin_trgm_ops']
+                ),
+            GinIndex(
+                fields=['imagery_used'], name='changeset_imagery_trgm_idx',
+                opclasses=['gin_trgm_ops']
+                ),
+            GinIndex(
+                fields=['editor'], name='changeset_editor_trgm_idx',
+                opclasses=['gin_trgm_ops']
+                ),
+            # used by the list of unchecked changesets and by delete_old_data
+            models.Index(
+                fields=['-date'], name='changeset_unchecked_date_idx',
+                condition=models.Q(checked=False)
+                ),
         ]
 
 
@@ -137,3 +167,89 @@ class Import(models.Model):
     def save(self, *args, **kwargs):
         self.full_clean()
         super(Import, self).save(*args, **kwargs)
+
+
+class ReplicationSequence(models.Model):
+    """Import status of each replication file."""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, _('Pending')),
+        (RUNNING, _('Running')),
+        (DONE, _('Done')),
+        (FAILED, _('Failed')),
+        )
+    sequence = models.IntegerField(primary_key=True)
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=PENDING, db_index=True
+        )
+    attempts = models.IntegerField(default=0)
+    changesets = models.IntegerField(null=True, blank=True)
+    worker = models.CharField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return '%s %i' % (_('Replication sequence'), self.sequence)
+
+    class Meta:
+        ordering = ['sequence']
+
+
+class FailedImport(models.Model):
+    """Changesets that could not be imported. They are imported again by the
+    retry_failed_imports command, with an exponential backoff.
+    """
+    changeset_id = models.IntegerField(primary_key=True)
+    error_class = models.CharField(max_length=255)
+    error = models.TextField(blank=True)
+    attempts = models.IntegerField(default=1)
+    created_at = models.DateTimeField(auto_now_add=True)
+    failed_at = models.DateTimeField()
+    retry_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return '%s %i' % (_('Failed import of changeset'), self.changeset_id)
+
+    class Meta:
+        ordering = ['retry_at']
+
+
+class OpenChangeset(models.Model):
+    """Changesets that were open when they were imported. They are analysed
+    again when they are closed, if their number of changes is different.
+    """
+    changeset_id = models.IntegerField(primary_key=True)
+    num_changes = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    check_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return '%s %i' % (_('Open changeset'), self.changeset_id)
+
+    class Meta:
+        ordering = ['check_at']
+
+
+class UserStats(models.Model):
+    """Number of changesets of each OSM user, updated when the changesets are
+    imported, checked, unchecked or deleted, by the user_stats module. Use the
+    rebuild_user_stats command to calculate them again from the changesets.
+    """
+    uid = models.CharField(_('User ID'), max_length=255, primary_key=True)
+    changesets = models.IntegerField(default=0)
+    checked_changesets = models.IntegerField(default=0)
+    harmful_changesets = models.IntegerField(default=0)
+    last_seen = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return '%s %s' % (_('Statistics of user'), self.uid)
+
+    class Meta:
+        ordering = ['uid']
+        verbose_name = 'User statistics'
+        verbose_name_plural = 'User statistics'
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .metrics import metrics
+from .models import Changeset, OpenChangeset
+
+
+# The open changesets are checked again CHECK_DELAY after they were last seen
+# open. The OSM API closes the changesets after one hour without changes or
+# 24 hours after they were created, so the ones that are registered for more
+# than MAX_AGE can't be checked, probably because they were redacted.
+CHECK_DELAY = timedelta(hours=1)
+MAX_AGE = timedelta(days=2)
+
+# Number of changesets of a replication file checked at a time.
+CHUNK_SIZE = 100
+
+
+def select_changesets(changesets):
+    """Receive a list of (changeset, state) tuples, as returned by
+    iter_changesets with_state, and return the changesets that need to be
+    analysed: the new ones and the ones whose number of changes is different
+    from the last analysis, because they were open. The open changesets are
+    registered to be checked again and the closed ones are removed from the
+    open changesets. The comments count of the skipped changesets is updated
+    without analysing them.
+    """
+    changeset_ids = [int(changeset['id']) for changeset, state in changesets]
+    tracked = dict(
+        OpenChangeset.objects.filter(changeset_id__in=changeset_ids).values_list(
+            'changeset_id', 'num_changes'
+            )
+        )
+    existing = dict(
+        Changeset.objects.filter(id__in=changeset_ids).values_list('id', 'comments_count')
+        )
+    check_at = timezone.now() + CHECK_DELAY
+    selected = []
+    opened = []
+    with transaction.atomic():
+        for changeset, state in changesets:
+            changeset_id = int(changeset['id'])
+            if changeset_id in existing and tracked.get(
+                    changeset_id, state['num_changes']) == state['num_changes']:
+                if existing[changeset_id] != state['comments_count']:
+                    Changeset.objects.filter(id=changeset_id).update(
+                        comments_count=state['comments_count']
+                        )
+            else:
+                selected.append(changeset)
+            if state['open']:
+                opened.append(OpenChangeset(
+                    changeset_id=changeset_id,
+                    num_changes=state['num_changes'],
+                    check_at=check_at
+                    ))
+        OpenChangeset.objects.filter(changeset_id__in=tracked.keys()).delete()
+        OpenChangeset.objects.bulk_create(opened, ignore_conflicts=True)
+    metrics.inc('changesets', len(changesets) - len(selected), 'unchanged')
+    return selected
+
+
+def claim_open_changesets(limit=100):
+    """Return up to limit open changesets that need to be checked again and
+    postpone their check by CHECK_DELAY, so concurrent processes don't claim
+    the same changesets. The ones registered for more than MAX_AGE are
+    removed.
+    """
+    now = timezone.now()
+    OpenChangeset.objects.filter(created_at__lt=now - MAX_AGE).delete()
+    with transaction.atomic():
+        changeset_ids = list(
+            OpenChangeset.objects.select_for_update(skip_locked=True).filter(
+                check_at__lte=now
+                ).order_by('check_at').values_list('changeset_id', flat=True)[:limit]
+            )
+        OpenChangeset.objects.filter(changeset_id__in=changeset_ids).update(
+            check_at=now + CHECK_DELAY
+            )
+    return changeset_ids
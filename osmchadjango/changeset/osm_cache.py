@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import hashlib
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
+
+import requests
+
+from .metrics import metrics
+
+
+class CacheMissError(Exception):
+    """Raised in offline mode when an URL is not in the cache."""
+    pass
+
+
+class DiskCache(object):
+    """Local disk cache of the replication files and of the OSM API responses.
+
+    The content is stored in the objects directory, named by its sha256 digest,
+    so equal responses are stored only once. For each URL, a small JSON file in
+    the urls directory keeps the digest of the content and the ETag and
+    Last-Modified headers, used to revalidate the content with a conditional
+    request. Immutable URLs, like the replication files, are never revalidated.
+    When the size of the objects exceeds max_size, the least recently used
+    ones are removed. In offline mode, no request is made and a CacheMissError
+    is raised if the URL is not in the cache.
+    """
+
+    def __init__(self, directory, max_size=5 * 1024 ** 3, offline=False):
+        self.directory = directory
+        self.max_size = max_size
+        self.offline = offline
+        self.size = None
+        self.hits = 0
+        self.misses = 0
+
+    def url_path(self, url):
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, 'urls', key[:2], '{}.json'.format(key))
+
+    def object_path(self, digest):
+        return os.path.join(self.directory, 'objects', digest[:2], digest)
+
+    def lookup(self, url):
+        """Return the cached entry of the URL or None. Touch the object file,
+        so it's kept by the LRU eviction.
+        """
+        try:
+            with open(self.url_path(url), 'r') as f:
+                entry = json.load(f)
+            os.utime(self.object_path(entry['digest']))
+        except (OSError, ValueError, KeyError):
+            return None
+        return entry
+
+    def write_atomic(self, path, write):
+        """Write a file in a temporary path and move it to the final path, so
+        other processes never read a partial file.
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def store_object(self, tmp_path, digest, size):
+        path = self.object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+            self.add_size(size)
+
+    def store_entry(self, url, response, digest, size):
+        entry = {
+            'url': url,
+            'digest': digest,
+            'size': size,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            }
+        self.write_atomic(
+            self.url_path(url),
+            lambda f: f.write(json.dumps(entry).encode('utf-8'))
+            )
+
+    def store(self, url, response, content):
+        digest = hashlib.sha256(content).hexdigest()
+        path = self.object_path(digest)
+        if not os.path.exists(path):
+            self.write_atomic(path, lambda f: f.write(content))
+            self.add_size(len(content))
+        self.store_entry(url, response, digest, len(content))
+
+    def conditional_headers(self, entry):
+        headers = dict(settings.OSM_API_USER_AGENT)
+        if entry is not None:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def cached(self, url, immutable):
+        """Return the cached entry if it can be used without a request."""
+        entry = self.lookup(url)
+        if entry is not None and (immutable or self.offline):
+            self.hits += 1
+            return entry, True
+        if entry is None and self.offline:
+            self.misses += 1
+            raise CacheMissError('{} is not in the cache'.format(url))
+        return entry, False
+
+    def get(self, url, immutable=False):
+        """Return the content of the URL, reading it from the cache when it's
+        possible. Raise requests.HTTPError if the response is not successful.
+        """
+        entry, fresh = self.cached(url, immutable)
+        if not fresh:
+            response = requests.get(url, headers=self.conditional_headers(entry))
+            if response.status_code == 304 and entry is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+                response.raise_for_status()
+                self.store(url, response, response.content)
+                return response.content
+        with open(self.object_path(entry['digest']), 'rb') as f:
+            return f.read()
+
+    @contextmanager
+    def open(self, url, immutable=False):
+        """Return a file object with the content of the URL. If it's not in
+        the cache, the response is streamed and saved in the cache while it's
+        read.
+        """
+        entry, fresh = self.cached(url, immutable)
+        if not fresh:
+            with requests.get(
+                url, headers=self.conditional_headers(entry), stream=True
+                    ) as response:
+                if response.status_code == 304 and entry is not None:
+                    self.hits += 1
+                else:
+                    self.misses += 1
+                    response.raise_for_status()
+                    with self.tee(url, response) as f:
+                        yield f
+                    return
+        with open(self.object_path(entry['digest']), 'rb') as f:
+            yield f
+
+    @contextmanager
+    def tee(self, url, response):
+        """Yield the raw response as a file object that writes the content to
+        a temporary file while it's read. The content is stored in the cache
+        only if the response is entirely read without errors.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                reader = TeeReader(response.raw, tmp_file)
+                yield reader
+                # read what was not consumed, like the gzip trailing data
+                while reader.read(65536):
+                    pass
+            self.store_object(tmp_path, reader.digest.hexdigest(), reader.size)
+            self.store_entry(url, response, reader.digest.hexdigest(), reader.size)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def add_size(self, size):
+        if self.size is None:
+            self.size = self.get_size()
+        else:
+            self.size += size
+        if self.size > self.max_size:
+            self.evict()
+
+    def list_objects(self):
+        objects = []
+        for root, dirs, files in os.walk(os.path.join(self.directory, 'objects')):
+            for name in files:
+                try:
+                    stat = os.stat(os.path.join(root, name))
+                except OSError:
+                    continue
+                objects.append((stat.st_mtime, stat.st_size, os.path.join(root, name)))
+        return objects
+
+    def get_size(self):
+        return sum(size for mtime, size, path in self.list_objects())
+
+    def evict(self):
+        """Remove the least recently used objects until the cache size is 90%
+        of the max_size. The entries of the removed objects are ignored by the
+        lookup method.
+        """
+        objects = sorted(self.list_objects())
+        self.size = sum(size for mtime, size, path in objects)
+        for mtime, size, path in objects:
+            if self.size <= self.max_size * 0.9:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self.size -= size
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': self.size if self.size is not None else self.get_size(),
+            }
+
+
+class TeeReader(object):
+    """File object that copies the content read from another file object to
+    a second one and computes its sha256 digest.
+    """
+
+    def __init__(self, source, copy):
+        self.source = source
+        self.copy = copy
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def read(self, size=-1):
+        data = self.source.read(size) if size >= 0 else self.source.read()
+        self.copy.write(data)
+        self.digest.update(data)
+        self.size += len(data)
+        return data
+
+    def readable(self):
+        return True
+
+
+_disk_cache = None
+
+
+def get_disk_cache():
+    """Return the DiskCache defined by the OSM_CACHE settings or None if the
+    OSM_CACHE_DIR is not defined. It's created once per process.
+    """
+    global _disk_cache
+    directory = getattr(settings, 'OSM_CACHE_DIR', None)
+    if not directory:
+        return None
+    if _disk_cache is None or _disk_cache.directory != directory:
+        _disk_cache = DiskCache(
+            directory,
+            max_size=settings.OSM_CACHE_MAX_SIZE,
+            offline=settings.OSM_CACHE_OFFLINE
+            )
+    return _disk_cache
+
+
+def fetch(url, immutable=False):
+    """Return the content of an URL, using the DiskCache if it's enabled. It's
+    measured as the api_request stage of the metrics.
+    """
+    disk_cache = get_disk_cache()
+    with metrics.timer('api_request'):
+        try:
+            if disk_cache is not None:
+                content = disk_cache.get(url, immutable=immutable)
+            else:
+                response = requests.get(url, headers=settings.OSM_API_USER_AGENT)
+                response.raise_for_status()
+                content = response.content
+        except Exception:
+            metrics.inc('failures', label='api_request')
+            raise
+    metrics.inc('bytes', len(content), 'api_request')
+    return content
+
+
+@contextmanager
+def open_url(url, immutable=False):
+    """Return a file object with the raw content of an URL, using the
+    DiskCache if it's enabled.
+    """
+    disk_cache = get_disk_cache()
+    if disk_cache is not None:
+        with disk_cache.open(url, immutable=immutable) as f:
+            yield f
+    else:
+        with requests.get(
+            url, headers=settings.OSM_API_USER_AGENT, stream=True
+                ) as response:
+            response.raise_for_status()
+            yield response.raw
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import time
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import SuspicionReasons
+
+
+class SuspicionReasonsRegistry(object):
+    """In-process cache of the SuspicionReasons, used to avoid querying the
+    database for each reason of each imported changeset or feature.
+
+    The registry is loaded once per process and the SuspicionReasons that don't
+    exist yet are created with one INSERT ... ON CONFLICT statement. Only
+    reasons read or created in committed transactions are kept in the
+    registry. When a SuspicionReason is changed or deleted (in the admin or by
+    the merge_reasons command), a new version is stored in the Django cache
+    (Redis in production), so the registries of the other processes are reset
+    on their next version check.
+    """
+    VERSION_KEY = 'suspicion_reasons_registry_version'
+    FIELDS = ['id', 'name', 'description', 'is_visible', 'for_changeset', 'for_feature']
+
+    def __init__(self, check_interval=10):
+        self.check_interval = check_interval
+        self.version = None
+        self.checked_at = None
+        self.hits = 0
+        self.misses = 0
+        self.clear()
+
+    def clear(self):
+        self.by_name = {}
+        self.by_id = {}
+        self.loaded = False
+
+    def invalidate(self):
+        """Reset the registry of this process and of all the other ones. A new
+        version is stored again when the transaction is committed, so the
+        registries loaded before the commit, with the old rows, are reset too.
+        """
+        def new_version():
+            self.clear()
+            self.version = uuid4().hex
+            cache.set(self.VERSION_KEY, self.version, None)
+        new_version()
+        transaction.on_commit(new_version)
+
+    def check_version(self):
+        now = time.monotonic()
+        if self.checked_at is not None and now - self.checked_at < self.check_interval:
+            return
+        self.checked_at = now
+        version = cache.get(self.VERSION_KEY)
+        if version is None:
+            cache.add(self.VERSION_KEY, uuid4().hex, None)
+            version = cache.get(self.VERSION_KEY)
+        if version != self.version:
+            self.clear()
+            self.version = version
+
+    def remember(self, reasons, loaded=False):
+        def update():
+            for reason in reasons:
+                self.by_name[reason.name] = reason
+                self.by_id[reason.id] = reason
+            if loaded:
+                self.loaded = True
+        transaction.on_commit(update)
+
+    def load(self):
+        reasons = list(SuspicionReasons.objects.all())
+        self.remember(reasons, loaded=True)
+        return reasons
+
+    def upsert(self, names):
+        """Create the SuspicionReasons that don't exist and return all the
+        SuspicionReasons of the names list.
+        """
+        defaults = [
+            SuspicionReasons._meta.get_field(field).get_default()
+            for field in self.FIELDS[2:]
+            ]
+        sql = """INSERT INTO {table} ({fields})
+            VALUES {values}
+            ON CONFLICT (name) DO UPDATE SET name = EXCLUDED.name
+            RETURNING {returning}
+            """.format(
+                table=SuspicionReasons._meta.db_table,
+                fields=', '.join(self.FIELDS[1:]),
+                values=', '.join(['(%s, %s, %s, %s, %s)'] * len(names)),
+                returning=', '.join(self.FIELDS)
+                )
+        params = [value for name in names for value in [name] + defaults]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            reasons = [
+                SuspicionReasons.from_db(connection.alias, self.FIELDS, row)
+                for row in cursor.fetchall()
+                ]
+        self.remember(reasons)
+        return reasons
+
+    def get_many(self, names):
+        """Return a dict with the names and the SuspicionReasons objects,
+        creating the ones that don't exist.
+        """
+        self.check_version()
+        names = set(str(name) for name in names)
+        if not self.loaded and names:
+            found = {
+                reason.name: reason for reason in self.load()
+                if reason.name in names
+                }
+        else:
+            found = {
+                name: self.by_name[name] for name in names
+                if name in self.by_name
+                }
+            self.hits += len(found)
+        missing = sorted(names.difference(found.keys()))
+        if missing:
+            self.misses += len(missing)
+            found.update({reason.name: reason for reason in self.upsert(missing)})
+        return found
+
+    def get(self, name):
+        """Return the SuspicionReasons with that name, creating it if it
+        doesn't exist.
+        """
+        return self.get_many([name])[str(name)]
+
+    def get_by_id(self, reason_id):
+        """Return the SuspicionReasons with that id or None if it doesn't
+        exist or if the reason_id is not an integer.
+        """
+        try:
+            reason_id = int(reason_id)
+        except (TypeError, ValueError):
+            return None
+        self.check_version()
+        if reason_id in self.by_id:
+            self.hits += 1
+            return self.by_id[reason_id]
+        self.misses += 1
+        if self.loaded:
+            return None
+        for reason in self.load():
+            if reason.id == reason_id:
+                return reason
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self.by_name),
+            }
+
+
+reasons_registry = SuspicionReasonsRegistry()
+
+
+@receiver(post_save, sender=SuspicionReasons)
+@receiver(post_delete, sender=SuspicionReasons)
+def invalidate_reasons_registry(sender, **kwargs):
+    reasons_registry.invalidate()
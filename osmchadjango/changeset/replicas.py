@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+from contextlib import contextmanager
+from contextvars import ContextVar
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connections
+from rest_framework.permissions import SAFE_METHODS
+
+
+# The reads are sent to the replicas (settings.DATABASE_REPLICAS) only inside
+# read_from_replicas, that is used by the views that only read data and can
+# show data some seconds old, like the changesets list and the stats. All the
+# other queries use the default database. After a user changes something, like
+# checking a changeset, the user reads from the default database during
+# REPLICA_STICKY_TIME seconds, so the change is visible in the next requests.
+reading_from_replicas = ContextVar('reading_from_replicas', default=False)
+
+STICKY_KEY = 'replica_sticky_user_{}'
+
+
+class ReplicaPool(object):
+    """Choose a replica whose lag is lower than REPLICA_MAX_LAG. The lag of
+    each replica is checked at most once every check_interval seconds by each
+    process. The replicas that can't be reached are not used until the next
+    check.
+    """
+    def __init__(self, check_interval=5):
+        self.check_interval = check_interval
+        self.lags = {}
+
+    def get_lag(self, alias):
+        """Return the replication lag of a database in seconds. It's zero if
+        the replica replayed all the WAL it received or if it's not a replica.
+        """
+        with connections[alias].cursor() as cursor:
+            cursor.execute(
+                """SELECT CASE
+                    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                    ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+                    END"""
+                )
+            lag = cursor.fetchone()[0]
+        return float(lag or 0)
+
+    def is_available(self, alias):
+        now = time.monotonic()
+        checked_at, lag = self.lags.get(alias, (None, None))
+        if checked_at is None or now - checked_at >= self.check_interval:
+            try:
+                lag = self.get_lag(alias)
+            except DatabaseError as e:
+                print('Replica {} is not available: {}'.format(alias, e))
+                lag = None
+            self.lags[alias] = (now, lag)
+        return lag is not None and lag <= settings.REPLICA_MAX_LAG
+
+    def choose(self):
+        """Return the alias of a replica or None if no replica is available."""
+        available = [
+            alias for alias in settings.DATABASE_REPLICAS if self.is_available(alias)
+            ]
+        if available:
+            return random.choice(available)
+
+
+replica_pool = ReplicaPool()
+
+
+class ReplicaRouter(object):
+    """Send the reads made inside read_from_replicas to a replica."""
+    def db_for_read(self, model, **hints):
+        if reading_from_replicas.get():
+            return replica_pool.choose()
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+def mark_recent_write(user):
+    """Make the user read from the default database for REPLICA_STICKY_TIME."""
+    if settings.DATABASE_REPLICAS and user.is_authenticated:
+        cache.set(STICKY_KEY.format(user.pk), True, settings.REPLICA_STICKY_TIME)
+
+
+def has_recent_write(user):
+    return user.is_authenticated and cache.get(STICKY_KEY.format(user.pk)) is not None
+
+
+@contextmanager
+def read_from_replicas(request):
+    """Read from the replicas if the request only reads data and the user
+    didn't change anything in the last REPLICA_STICKY_TIME seconds.
+    """
+    if (not settings.DATABASE_REPLICAS or request.method not in SAFE_METHODS or
+            has_recent_write(request.user)):
+        yield
+        return
+    token = reading_from_replicas.set(True)
+    try:
+        yield
+    finally:
+        reading_from_replicas.reset(token)
+
+
+class ReplicaReadMixin(object):
+    """Read the data of the view from the replicas. The user is authenticated
+    before, using the default database.
+    """
+    def initial(self, request, *args, **kwargs):
+        super(ReplicaReadMixin, self).initial(request, *args, **kwargs)
+        self.replica_reads = read_from_replicas(request)
+        self.replica_reads.__enter__()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        replica_reads = getattr(self, 'replica_reads', None)
+        if replica_reads is not None:
+            self.replica_reads = None
+            replica_reads.__exit__(None, None, None)
+        return super(ReplicaReadMixin, self).finalize_response(
+            request, response, *args, **kwargs
+            )
+
+
+class ReplicaStickinessMiddleware(object):
+    """Register the users that made a successful request that can change data,
+    so their next requests read from the default database.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            user = getattr(request, 'user', None)
+            if user is not None:
+                mark_recent_write(user)
+        return response
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import gzip
+import json
+from contextlib import contextmanager
+from functools import lru_cache
+from os.path import isfile
+import xml.etree.ElementTree as ET
+
+from osmcha.changeset import changeset_info, get_bounds
+from shapely import STRtree
+from shapely.geometry import shape
+from shapely.prepared import prep
+
+from .metrics import MeasuredReader, metrics
+from .osm_cache import open_url
+
+
+class ChangesetsFilter(object):
+    """Area used to filter the imported changesets. The geometries of all the
+    features of the GeoJSON file are split in single parts, prepared and
+    indexed in a STRtree, so testing if a changeset bbox intersects with the
+    area only evaluates the parts whose envelope intersects with the bbox. The
+    STRtree is not used if the area has only one part, as querying it costs
+    more than testing the prepared geometry.
+    """
+
+    def __init__(self, geojson):
+        with open(geojson, 'r') as f:
+            data = json.load(f)
+        parts = []
+        for feature in data['features']:
+            geometry = shape(feature['geometry'])
+            parts.extend(getattr(geometry, 'geoms', [geometry]))
+        self.parts = [prep(part) for part in parts]
+        self.tree = STRtree(parts)
+
+    def intersects(self, geometry):
+        if len(self.parts) == 1:
+            return self.parts[0].intersects(geometry)
+        return any(
+            self.parts[i].intersects(geometry) for i in self.tree.query(geometry)
+            )
+
+
+@lru_cache(maxsize=None)
+def get_changesets_filter(geojson):
+    """Return the ChangesetsFilter of a GeoJSON file. It's loaded only once per
+    process.
+    """
+    return ChangesetsFilter(geojson)
+
+
+@contextmanager
+def open_replication_file(changeset_file):
+    """Open a local replication file or stream it from a URL. Return a file
+    object with the decompressed content. The replication files never change,
+    so if the DiskCache is enabled, the cached ones are not requested again.
+    The reading and the decompression of the file are measured as the download
+    and decompress stages of the metrics.
+    """
+    if isfile(changeset_file):
+        with open(changeset_file, 'rb') as raw:
+            with gzip.GzipFile(fileobj=MeasuredReader(raw, 'download')) as f:
+                yield MeasuredReader(f, 'decompress')
+    else:
+        with open_url(changeset_file, immutable=True) as raw:
+            with gzip.GzipFile(fileobj=MeasuredReader(raw, 'download')) as f:
+                yield MeasuredReader(f, 'decompress')
+
+
+def changeset_state(element):
+    """Return a dict with the open status, the number of changes and the
+    number of comments of a changeset XML element.
+    """
+    return {
+        'open': element.get('open') == 'true',
+        'num_changes': int(element.get('num_changes') or 0),
+        'comments_count': int(element.get('comments_count') or 0),
+        }
+
+
+def iter_changesets(changeset_file, geojson_filter=None, with_state=False):
+    """Parse a replication file incrementally and yield the data of each
+    changeset, in the format returned by osmcha.changeset.changeset_info. If a
+    geojson_filter is defined, only the changesets that intersect with its area
+    are returned. The file is decompressed and parsed while it is downloaded
+    and the parsed elements are discarded, so the memory usage doesn't depend
+    on the size of the file.
+
+    Args:
+        changeset_file (str): the URL of a replication file or the path to a
+            local replication file.
+        geojson_filter (str): path to a local geojson file containing a polygon.
+        with_state (bool): yield (changeset, state) tuples, where state is the
+            dict returned by changeset_state.
+    """
+    area = get_changesets_filter(geojson_filter) if geojson_filter else None
+    with open_replication_file(changeset_file) as f:
+        context = ET.iterparse(f, events=('start', 'end'))
+        # the parse timer is stopped while the consumer uses the changeset
+        timer = metrics.start('parse')
+        try:
+            event, root = next(context)
+            for event, element in context:
+                if event == 'end' and element.tag == 'changeset':
+                    with metrics.timer('filter'):
+                        selected = (
+                            area is None or area.intersects(get_bounds(element))
+                            )
+                    if selected:
+                        changeset = changeset_info(element)
+                        if with_state:
+                            changeset = (changeset, changeset_state(element))
+                        metrics.stop(timer)
+                        yield changeset
+                        timer = metrics.start('parse')
+                    else:
+                        metrics.inc('changesets', label='filtered_out')
+                    root.clear()
+        finally:
+            metrics.stop(timer)
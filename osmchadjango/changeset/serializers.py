@@ -40,11 +40,24 @@ class ChangesetSerializerToStaff(GeoFeatureModelSerializer):
     reasons = BasicSuspicionReasonsSerializer(many=True, read_only=True)
     tags = BasicTagSerializer(many=True, read_only=True)
     features = ReadOnlyField(source='new_features', default=list)
+    user_stats = SerializerMethodField()
+
+    def __init__(self, *args, **kwargs):
+        super(ChangesetSerializerToStaff, self).__init__(*args, **kwargs)
+        # the stats are only included if the view adds them to the context
+        if 'user_stats' not in self.context:
+            self.fields.pop('user_stats')
+
+    def get_user_stats(self, obj):
+        return self.context['user_stats'].get(obj.uid)
 
     class Meta:
         model = Changeset
         geo_field = 'bbox'
-        exclude = ('powerfull_editor', 'new_features')
+        exclude = (
+            'powerfull_editor', 'new_features', 'reason_ids', 'tag_ids',
+            'reasons_count'
+            )
 
 
 class ChangesetSerializer(ChangesetSerializerToStaff):
@@ -1,7 +1,14 @@
 # -*- coding: utf-8 -*-
 from __future__ import print_function, unicode_literals
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
+from multiprocessing import get_context
+import asyncio
+import xml.etree.ElementTree as ET
 from os.path import join
 from urllib.parse import quote
+import time
 import yaml
 
 try:
@@ -10,37 +17,71 @@ except ImportError:
     from yaml import Loader
 
 from django.conf import settings
-from django.db.utils import IntegrityError
+from django.db import close_old_connections, connection, connections
+from django.db.models import Max, Min
 
 import requests
 from requests_oauthlib import OAuth2Session
-from osmcha.changeset import Analyse, ChangesetList
+from osmcha.changeset import changeset_info
 
-from .models import Changeset, SuspicionReasons, Import
+from .analysis import ChangesetAnalysis, changeset_url, metadata_url, user_url
+from .failed_imports import claim_failures, record_failure
+from .fetcher import AsyncFetcher
+from .ledger import (
+    enqueue_sequences, fail_sequence, finish_sequence, get_last_sequence,
+    iter_claimed_sequences
+)
+from .locks import IMPORT_LOCK, AdvisoryLock
+from .metrics import metrics, report_metrics
+from .models import Changeset, Import
+from .open_changesets import CHUNK_SIZE, claim_open_changesets, select_changesets
+from .reasons import reasons_registry
+from .replication import changeset_state, iter_changesets
+from .writer import ChangesetWriter
 
 
-def create_changeset(changeset_id):
-    """Analyse and create the changeset in the database."""
-    ch = Analyse(changeset_id)
+def analyse_changeset(changeset, prefetched=None):
+    """Analyse a changeset. It receives the changeset id or the dict returned
+    by osmcha.changeset.changeset_info, that avoids requesting the changeset
+    metadata to the OSM API, and optionally a dict with the content of the OSM
+    API URLs that were already requested. Return a dict with the fields of the
+    changeset and the list of its suspicion reasons.
+    """
+    ch = ChangesetAnalysis(changeset, prefetched)
     ch.full_analysis()
 
     # remove suspicion_reasons
     ch_dict = ch.get_dict()
-    ch_dict.pop("suspicion_reasons")
+    reasons = ch_dict.pop("suspicion_reasons")
 
     # remove bbox field if it is not a valid geometry
     if ch.bbox == "GEOMETRYCOLLECTION EMPTY":
         ch_dict.pop("bbox")
 
+    return ch_dict, reasons
+
+
+def analyse_changeset_timed(changeset, prefetched=None):
+    """Analyse a changeset like analyse_changeset and also return the seconds
+    spent in the analysis. It's used in the worker processes, whose metrics are
+    not shared with the importing process.
+    """
+    started = time.perf_counter()
+    ch_dict, reasons = analyse_changeset(changeset, prefetched)
+    return ch_dict, reasons, time.perf_counter() - started
+
+
+def create_changeset(changeset_id):
+    """Analyse and create the changeset in the database."""
+    ch_dict, reasons = analyse_changeset(changeset_id)
+
     # save changeset.
     changeset, created = Changeset.objects.update_or_create(
         id=ch_dict["id"], defaults=ch_dict
     )
 
-    if ch.suspicion_reasons:
-        for reason in ch.suspicion_reasons:
-            reason, created = SuspicionReasons.objects.get_or_create(name=reason)
-            reason.changesets.add(changeset)
+    if reasons:
+        changeset.reasons.add(*reasons_registry.get_many(reasons).values())
 
     print("{c[id]} created".format(c=ch_dict))
     return changeset
@@ -48,16 +89,30 @@ def create_changeset(changeset_id):
 
 def get_filter_changeset_file(url, geojson_filter=settings.CHANGESETS_FILTER):
     """Filter changesets from a replication file by the area defined in the
-    GeoJSON file.
+    GeoJSON file. The file is parsed while it is downloaded and the changesets
+    selected by select_changesets are analysed and saved in batches. The
+    changesets that can't be analysed are registered as failed imports. Return
+    the number of changesets imported.
     """
-    cl = ChangesetList(url, geojson_filter)
-    for c in cl.changesets:
-        print("Creating changeset {}".format(c["id"]))
-        try:
-            create_changeset(c["id"])
-        except IntegrityError as e:
-            print("IntegrityError when importing {}.".format(c["id"]))
-            print(e)
+    writer = ChangesetWriter()
+    changesets = iter_changesets(url, geojson_filter, with_state=True)
+    try:
+        for chunk in iter(lambda: list(islice(changesets, CHUNK_SIZE)), []):
+            for changeset in select_changesets(chunk):
+                print("Analysing changeset {}".format(changeset["id"]))
+                try:
+                    with metrics.timer("analysis"):
+                        ch_dict, reasons = analyse_changeset(changeset)
+                except Exception as e:
+                    print("Failed to import changeset {}: {}".format(changeset["id"], e))
+                    metrics.inc("changesets", label="failed")
+                    record_failure(int(changeset["id"]), e)
+                    continue
+                metrics.inc("changesets", label="analysed")
+                writer.add(ch_dict, reasons)
+    finally:
+        writer.flush()
+    return writer.written
 
 
 def format_url(n):
@@ -68,15 +123,212 @@ def format_url(n):
     )
 
 
-def import_replications(start, end):
-    """Recieves a start and an end number, and import each replication file in
-    this interval.
+def get_fetcher(concurrency):
+    """Return an AsyncFetcher with the per host limits of the settings."""
+    return AsyncFetcher(
+        max_in_flight=concurrency,
+        per_host=settings.OSM_MAX_CONNECTIONS_PER_HOST,
+        host_interval=settings.OSM_HOST_REQUEST_INTERVAL
+    )
+
+
+@contextmanager
+def analysis_executor(workers=1):
+    """Return the executor used to analyse the changesets: a pool of worker
+    processes if workers is greater than 1 or a single thread.
+    """
+    if workers > 1:
+        # The worker processes are forked from this one, so the database
+        # connections must be closed to avoid sharing them with the children.
+        connections.close_all()
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=get_context("fork"))
+        # start the worker processes before starting any thread
+        executor.submit(int).result()
+    else:
+        executor = ThreadPoolExecutor(max_workers=1)
+    with executor:
+        yield executor
+
+
+async def analyse_changeset_concurrently(changeset, fetcher, executor):
+    """Request the data of a changeset to the OSM API using the fetcher and
+    analyse it in the executor. It receives the changeset id or the dict
+    returned by osmcha.changeset.changeset_info. Return a dict with the fields
+    of the changeset and the list of its suspicion reasons.
+    """
+    if not isinstance(changeset, dict):
+        metadata = await fetcher.get(metadata_url(changeset))
+        changeset = changeset_info(ET.fromstring(metadata)[0])
+    prefetched = await fetcher.get_many(
+        [changeset_url(changeset["id"]), user_url(changeset["uid"])]
+    )
+    ch_dict, reasons, elapsed = await asyncio.get_running_loop().run_in_executor(
+        executor, analyse_changeset_timed, changeset, prefetched
+    )
+    metrics.observe("analysis", elapsed)
+    return ch_dict, reasons
+
+
+async def analyse_replication_files(files, writer, executor, concurrency, max_pending,
+                                    on_finish, on_error):
+    """Read the replication files and analyse their changesets. The files
+    argument is an iterable of (key, path) tuples, where path is the URL or the
+    path of a local replication file. The requests to the OSM API are made
+    concurrently by an AsyncFetcher and the analysis of the changesets is made
+    by the executor, if they are selected by select_changesets. At most
+    max_pending changesets are being requested or analysed at the same time.
+    The analysed changesets are added to the writer and the ones that fail are
+    registered as failed imports. When all the changesets of a file are saved,
+    on_finish(key, imported, failed, elapsed) is called. If a file can't be
+    read, on_error(key, error) is called.
+    """
+    loop = asyncio.get_running_loop()
+    fetcher = get_fetcher(concurrency)
+    pending = asyncio.Semaphore(max_pending)
+    tasks = set()
+    finishing = []
+
+    async def analyse(changeset):
+        try:
+            ch_dict, reasons = await analyse_changeset_concurrently(
+                changeset, fetcher, executor
+            )
+        except Exception as e:
+            print("Failed to import changeset {}: {}".format(changeset["id"], e))
+            metrics.inc("changesets", label="failed")
+            record_failure(int(changeset["id"]), e)
+            return False
+        else:
+            metrics.inc("changesets", label="analysed")
+            writer.add(ch_dict, reasons)
+            return True
+        finally:
+            pending.release()
+
+    async def finish(key, file_tasks, started):
+        if file_tasks:
+            await asyncio.wait(file_tasks)
+        writer.flush()
+        imported = sum(task.result() for task in file_tasks)
+        metrics.inc("files", label="done")
+        on_finish(
+            key, imported, len(file_tasks) - imported, time.monotonic() - started
+        )
+
+    try:
+        for key, path in files:
+            print("Importing {}".format(path))
+            started = time.monotonic()
+            file_tasks = []
+            changesets = iter_changesets(path, settings.CHANGESETS_FILTER, with_state=True)
+            try:
+                # the replication file is read in a thread to not block the loop
+                while True:
+                    chunk = await loop.run_in_executor(
+                        None, list, islice(changesets, CHUNK_SIZE)
+                    )
+                    if not chunk:
+                        break
+                    for changeset in select_changesets(chunk):
+                        await pending.acquire()
+                        task = loop.create_task(analyse(changeset))
+                        file_tasks.append(task)
+                        tasks.add(task)
+                        task.add_done_callback(tasks.discard)
+            except Exception as e:
+                print("Failed to read {}: {}".format(path, e))
+                metrics.inc("files", label="failed")
+                on_error(key, e)
+            else:
+                finishing.append(loop.create_task(finish(key, file_tasks, started)))
+        await asyncio.gather(*finishing)
+        if tasks:
+            await asyncio.wait(tasks)
+    finally:
+        fetcher.close()
+
+
+def import_replication_files(files, on_finish, on_error, workers=1, concurrency=1):
+    """Import the replication files, making concurrently up to concurrency
+    requests to the OSM API. If workers is greater than 1, the changesets are
+    analysed by a pool of worker processes. The analysed changesets are saved
+    in batches by this process. Check analyse_replication_files for the
+    description of the other arguments. Return the number of changesets
+    imported.
+    """
+    writer = ChangesetWriter()
+    with analysis_executor(workers) as executor:
+        asyncio.run(analyse_replication_files(
+            files, writer, executor, concurrency,
+            max_pending=concurrency + workers * 2,
+            on_finish=on_finish,
+            on_error=on_error
+        ))
+    writer.flush()
+    return writer.written
+
+
+def import_replications_concurrently(sequences, workers=1, concurrency=1):
+    """Import the replication files of the sequences and register them as done
+    or failed in the ledger. Return the number of changesets imported.
+    """
+    return import_replication_files(
+        ((sequence, format_url(sequence)) for sequence in sequences),
+        on_finish=lambda sequence, imported, failed, elapsed: finish_sequence(
+            sequence, imported
+        ),
+        on_error=fail_sequence,
+        workers=workers,
+        concurrency=concurrency
+    )
+
+
+def import_pending_replications(workers=1, concurrency=1):
+    """Claim and import the pending replication files of the ledger, until
+    there is none left. If workers is greater than 1, the changesets are
+    analysed by a pool of worker processes. If concurrency is greater than 1,
+    up to that number of requests to the OSM API are made at the same time.
+    Return the number of changesets imported.
+    """
+    sequences = iter_claimed_sequences()
+    started = time.monotonic()
+    since = metrics.snapshot()
+    if workers > 1 or concurrency > 1:
+        imported = import_replications_concurrently(
+            sequences, workers=workers, concurrency=max(concurrency, workers)
+        )
+    else:
+        imported = 0
+        for sequence in sequences:
+            url = format_url(sequence)
+            print("Importing {}".format(url))
+            try:
+                changesets = get_filter_changeset_file(url, settings.CHANGESETS_FILTER)
+            except Exception as e:
+                print("Failed to import {}: {}".format(url, e))
+                metrics.inc("files", label="failed")
+                fail_sequence(sequence, e)
+            else:
+                metrics.inc("files", label="done")
+                finish_sequence(sequence, changesets)
+                imported += changesets
+    elapsed = time.monotonic() - started
+    print(
+        "{} changesets imported in {:.1f} seconds ({:.2f} changesets/s)".format(
+            imported, elapsed, imported / elapsed if elapsed else 0
+        )
+    )
+    report_metrics("import_replications", since, imported=imported, elapsed=elapsed)
+    return imported
+
+
+def import_replications(start, end, workers=1, concurrency=1):
+    """Recieves a start and an end number, registers each replication file in
+    this interval in the ledger and imports all the pending replication files.
     """
     Import(start=start, end=end).save()
-    urls = [format_url(n) for n in range(start, end + 1)]
-    for url in urls:
-        print("Importing {}".format(url))
-        get_filter_changeset_file(url)
+    enqueue_sequences(start, end)
+    return import_pending_replications(workers=workers, concurrency=concurrency)
 
 
 def get_last_replication_id():
@@ -89,15 +341,18 @@ def get_last_replication_id():
     return state.get("sequence")
 
 
-def fetch_latest():
+def fetch_latest(workers=1, max_files=None, concurrency=1):
     """Function to import all the replication files since the last import or the
-    last 1000.
+    last 1000. If max_files is defined, import at most that number of files.
+    Return the number of replication files imported.
     FIXME: define error in except line
     """
-    try:
-        last_import = Import.objects.all().order_by("-end")[0].end
-    except:
-        last_import = None
+    last_import = get_last_sequence()
+    if last_import is None:
+        try:
+            last_import = Import.objects.all().order_by("-end")[0].end
+        except:
+            last_import = None
 
     sequence = get_last_replication_id()
 
@@ -105,6 +360,13 @@ def fetch_latest():
         start = last_import + 1
     else:
         start = sequence - 1000
+    if max_files:
+        sequence = min(sequence, start + max_files - 1)
+    if start > sequence:
+        print("There are no new replication files")
+        # import the failed or abandoned replication files
+        import_pending_replications(workers=workers, concurrency=concurrency)
+        return 0
     print(
         "Importing replications from %d to %d"
         % (
@@ -112,7 +374,233 @@ def fetch_latest():
             sequence,
         )
     )
-    import_replications(start, sequence)
+    import_replications(start, sequence, workers=workers, concurrency=concurrency)
+    return sequence - start + 1
+
+
+def follow_replications(workers=1, min_interval=30, max_interval=600, max_files=60,
+                        concurrency=1):
+    """Import the new replication files continuously. Only the process that
+    holds the IMPORT_LOCK imports the files, the other ones wait and acquire
+    the lock when the importing process stops. The state.yaml file is checked
+    again after min_interval seconds if there were new files, and the interval
+    doubles, up to max_interval, each time there are no new files or the
+    import fails. If the import is late, the files are imported in groups of
+    max_files without waiting.
+    """
+    lock = AdvisoryLock(IMPORT_LOCK)
+    interval = min_interval
+    try:
+        while True:
+            close_old_connections()
+            if not lock.acquire():
+                print("Another process is importing the replication files")
+                interval = min_interval
+            else:
+                try:
+                    files = fetch_latest(
+                        workers=workers, max_files=max_files, concurrency=concurrency
+                    )
+                except Exception as e:
+                    print("Failed to import the replication files: {}".format(e))
+                    files = 0
+                if files >= max_files:
+                    continue
+                if files:
+                    interval = min_interval
+                else:
+                    interval = min(interval * 2, max_interval)
+            time.sleep(interval)
+    finally:
+        lock.release()
+
+
+def get_missing_changesets(start_date, end_date):
+    """Return a list of (first, last) tuples with the ranges of changeset ids
+    that are not in the database, between the first and the last changesets
+    created in the date range. The gaps are found by the database, comparing
+    each id with the next one, so the ids are not loaded in memory.
+    """
+    bounds = Changeset.objects.filter(
+        date__gte=start_date, date__lte=end_date
+    ).aggregate(first=Min("id"), last=Max("id"))
+    if bounds["first"] is None:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """SELECT id + 1, next_id - 1 FROM (
+                SELECT id, LEAD(id) OVER (ORDER BY id) AS next_id
+                FROM {} WHERE id BETWEEN %s AND %s
+            ) AS s WHERE next_id > id + 1
+            ORDER BY id
+            """.format(Changeset._meta.db_table),
+            [bounds["first"], bounds["last"]]
+        )
+        return cursor.fetchall()
+
+
+async def analyse_changesets(changeset_ids, writer, executor, concurrency, total=None):
+    """Request and analyse the changesets of the changeset_ids iterable,
+    making up to concurrency requests to the OSM API at the same time and
+    analysing them in the executor. The analysed changesets are added to the
+    writer and the ones that fail are registered as failed imports. The
+    progress is reported every 10 seconds.
+    """
+    fetcher = get_fetcher(concurrency)
+    pending = asyncio.Semaphore(concurrency * 2)
+    tasks = set()
+    progress = {"analysed": 0, "failed": 0, "reported_at": time.monotonic()}
+    started = time.monotonic()
+
+    def report():
+        elapsed = time.monotonic() - started
+        print(
+            "{} of {} changesets analysed ({:.2f} changesets/s), {} failed".format(
+                progress["analysed"], total if total is not None else "?",
+                progress["analysed"] / elapsed if elapsed else 0, progress["failed"]
+            )
+        )
+        progress["reported_at"] = time.monotonic()
+
+    async def analyse(changeset_id):
+        try:
+            ch_dict, reasons = await analyse_changeset_concurrently(
+                changeset_id, fetcher, executor
+            )
+        except Exception as e:
+            print("Failed to import changeset {}: {}".format(changeset_id, e))
+            metrics.inc("changesets", label="failed")
+            record_failure(changeset_id, e)
+            progress["failed"] += 1
+        else:
+            metrics.inc("changesets", label="analysed")
+            writer.add(ch_dict, reasons)
+        finally:
+            progress["analysed"] += 1
+            if time.monotonic() - progress["reported_at"] >= 10:
+                report()
+            pending.release()
+
+    try:
+        for changeset_id in changeset_ids:
+            await pending.acquire()
+            task = asyncio.get_running_loop().create_task(analyse(changeset_id))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.wait(tasks)
+        report()
+    finally:
+        fetcher.close()
+
+
+def backfill_changesets(start_date, end_date, workers=1, concurrency=1):
+    """Import the changesets missing in the database between the first and
+    the last changesets created in the date range. If the backfill stops, the
+    next execution continues from the changesets that are still missing.
+    Return the number of changesets imported.
+    """
+    started = time.monotonic()
+    since = metrics.snapshot()
+    gaps = get_missing_changesets(start_date, end_date)
+    total = sum(last - first + 1 for first, last in gaps)
+    print("{} changesets missing in {} ranges".format(total, len(gaps)))
+    changeset_ids = (
+        changeset_id for first, last in gaps for changeset_id in range(first, last + 1)
+    )
+    writer = ChangesetWriter()
+    with analysis_executor(workers) as executor:
+        asyncio.run(
+            analyse_changesets(changeset_ids, writer, executor, concurrency, total)
+        )
+    writer.flush()
+    report_metrics(
+        "backfill_changesets", since,
+        imported=writer.written, elapsed=time.monotonic() - started
+    )
+    return writer.written
+
+
+def retry_failed_imports(batch_size=100, workers=1, concurrency=1):
+    """Import again the failed changesets whose retry time has come, in
+    batches of batch_size, until there is none left. The ones that fail again
+    are rescheduled with a longer delay. It uses its own connections to the
+    OSM API, so with the default concurrency it makes one request at a time
+    and doesn't compete with the import of the replication files. Return the
+    number of changesets imported.
+    """
+    started = time.monotonic()
+    since = metrics.snapshot()
+    writer = ChangesetWriter()
+    with analysis_executor(workers) as executor:
+        while True:
+            changeset_ids = claim_failures(batch_size)
+            if not changeset_ids:
+                break
+            asyncio.run(analyse_changesets(
+                changeset_ids, writer, executor, concurrency, len(changeset_ids)
+            ))
+            writer.flush()
+    report_metrics(
+        "retry_failed_imports", since,
+        imported=writer.written, elapsed=time.monotonic() - started
+    )
+    return writer.written
+
+
+async def reanalyse_changesets(changeset_ids, writer, executor, concurrency):
+    """Request the metadata of the changesets that were open and analyse
+    again the ones selected by select_changesets, making up to concurrency
+    requests to the OSM API at the same time. The analysed changesets are
+    added to the writer.
+    """
+    fetcher = get_fetcher(concurrency)
+    try:
+        metadata = await fetcher.get_many([metadata_url(i) for i in changeset_ids])
+        changesets = []
+        for content in metadata.values():
+            element = ET.fromstring(content)[0]
+            changesets.append((changeset_info(element), changeset_state(element)))
+        selected = select_changesets(changesets)
+        results = await asyncio.gather(
+            *[analyse_changeset_concurrently(c, fetcher, executor) for c in selected],
+            return_exceptions=True
+        )
+        for changeset, result in zip(selected, results):
+            if isinstance(result, Exception):
+                print("Failed to import changeset {}: {}".format(changeset["id"], result))
+                metrics.inc("changesets", label="failed")
+                record_failure(int(changeset["id"]), result)
+            else:
+                metrics.inc("changesets", label="analysed")
+                writer.add(*result)
+    finally:
+        fetcher.close()
+
+
+def reanalyse_open_changesets(batch_size=100, workers=1, concurrency=1):
+    """Check the changesets that were open when they were imported, in
+    batches of batch_size, and analyse again the ones that changed. The ones
+    that are still open are checked again later. With the default
+    concurrency, it makes one request at a time, so it doesn't compete with
+    the import of the replication files. Return the number of changesets
+    analysed again.
+    """
+    started = time.monotonic()
+    since = metrics.snapshot()
+    writer = ChangesetWriter()
+    with analysis_executor(workers) as executor:
+        while True:
+            changeset_ids = claim_open_changesets(batch_size)
+            if not changeset_ids:
+                break
+            asyncio.run(reanalyse_changesets(changeset_ids, writer, executor, concurrency))
+            writer.flush()
+    report_metrics(
+        "reanalyse_open_changesets", since,
+        imported=writer.written, elapsed=time.monotonic() - started
+    )
+    return writer.written
 
 
 class ChangesetCommentAPI(object):
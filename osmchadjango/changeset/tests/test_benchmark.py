@@ -0,0 +1,61 @@
+import os
+import tempfile
+import xml.etree.ElementTree as ET
+
+from django.test import SimpleTestCase
+
+import requests
+
+from ..analysis import metadata_url
+from ..benchmark import ReplayServer, api_path, generate_workload, load_workload
+from ..replication import iter_changesets
+from ..tasks import analyse_changeset, format_url
+
+
+class TestReplayServer(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super(TestReplayServer, cls).setUpClass()
+        cls.directory = tempfile.TemporaryDirectory()
+        generate_workload(cls.directory.name, files=2, changesets=5)
+        cls.server = ReplayServer(cls.directory.name)
+        cls.server.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        cls.directory.cleanup()
+        super(TestReplayServer, cls).tearDownClass()
+
+    def test_workload(self):
+        workload = load_workload(self.directory.name)
+        self.assertEqual(workload['start'], 1)
+        self.assertEqual(workload['end'], 2)
+        self.assertEqual(len(workload['changesets']), 10)
+
+    def test_replay_replication_file(self):
+        workload = load_workload(self.directory.name)
+        with self.server.replay():
+            changesets = list(iter_changesets(format_url(2)))
+        self.assertEqual(
+            [int(c['id']) for c in changesets], workload['changesets'][5:]
+            )
+
+    def test_replay_api(self):
+        changeset_id = load_workload(self.directory.name)['changesets'][0]
+        with self.server.replay():
+            ch_dict, reasons = analyse_changeset(changeset_id)
+        metadata = ET.parse(
+            os.path.join(self.directory.name, api_path(metadata_url(changeset_id)))
+            ).getroot()[0]
+        self.assertEqual(ch_dict['id'], changeset_id)
+        self.assertEqual(ch_dict['user'], metadata.get('user'))
+        self.assertEqual(
+            ch_dict['create'] + ch_dict['modify'] + ch_dict['delete'],
+            int(metadata.get('num_changes'))
+            )
+
+    def test_not_found(self):
+        response = requests.get('{}/api/0.6/changeset/1'.format(self.server.url))
+        self.assertEqual(response.status_code, 404)
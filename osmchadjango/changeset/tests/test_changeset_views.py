@@ -49,6 +49,22 @@ class TestChangesetListView(APITestCase):
             response.data['features'][0]['properties'].keys()
             )
 
+    def test_user_stats_field(self):
+        self.client.login(username=self.user.username, password='password')
+        response = self.client.get(self.url)
+        self.assertNotIn(
+            'user_stats', response.data['features'][0]['properties'].keys()
+            )
+        response = self.client.get(self.url, {'user_stats': 'true'})
+        self.assertEqual(
+            response.data['features'][0]['properties']['user_stats'],
+            {
+                'changesets_in_osmcha': 52,
+                'checked_changesets': 0,
+                'harmful_changesets': 0
+            }
+            )
+
     def test_pagination(self):
         self.client.login(username=self.user.username, password='password')
         response = self.client.get(self.url, {'page': 2})
@@ -0,0 +1,142 @@
+from unittest import mock
+from uuid import uuid4
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import resolve, reverse
+
+from ...contrib.postgis_pool.base import ConnectionPool, pool
+from ...users.models import User
+
+
+@override_settings(DB_POOL_SIZE=2, DB_POOL_MAX_AGE=60)
+class TestConnectionPool(TestCase):
+    def setUp(self):
+        pool.close_all()
+        # a connection that is not used by the test transaction
+        self.wrapper = connection.copy()
+
+    def tearDown(self):
+        with override_settings(DB_POOL_SIZE=0):
+            self.wrapper.close()
+        pool.close_all()
+
+    def get_backend_pid(self):
+        with self.wrapper.cursor() as cursor:
+            cursor.execute('SELECT pg_backend_pid()')
+            return cursor.fetchone()[0]
+
+    def test_reuse_connection(self):
+        pid = self.get_backend_pid()
+        raw_connection = self.wrapper.connection
+        opened = pool.opened
+        self.wrapper.close()
+        self.assertIsNone(self.wrapper.connection)
+        self.assertFalse(raw_connection.closed)
+
+        self.assertEqual(self.get_backend_pid(), pid)
+        self.assertIs(self.wrapper.connection, raw_connection)
+        self.assertEqual(pool.opened, opened)
+
+    @override_settings(DB_POOL_SIZE=0)
+    def test_pool_disabled(self):
+        pid = self.get_backend_pid()
+        raw_connection = self.wrapper.connection
+        self.wrapper.close()
+        self.assertTrue(raw_connection.closed)
+        self.assertNotEqual(self.get_backend_pid(), pid)
+
+    def test_broken_connection(self):
+        pid = self.get_backend_pid()
+        raw_connection = self.wrapper.connection
+        self.wrapper.close()
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_terminate_backend(%s)', [pid])
+        self.assertNotEqual(self.get_backend_pid(), pid)
+        self.assertTrue(raw_connection.closed)
+
+    def test_obsolete_connection(self):
+        pid = self.get_backend_pid()
+        self.wrapper.close()
+        with override_settings(DB_POOL_MAX_AGE=0):
+            self.assertNotEqual(self.get_backend_pid(), pid)
+
+    def test_connection_in_transaction(self):
+        pid = self.get_backend_pid()
+        raw_connection = self.wrapper.connection
+        self.wrapper.set_autocommit(False)
+        self.get_backend_pid()
+        self.wrapper.close()
+        self.assertTrue(raw_connection.closed)
+        self.assertNotEqual(self.get_backend_pid(), pid)
+
+    def test_pool_size(self):
+        wrappers = [connection.copy() for i in range(3)]
+        for wrapper in wrappers:
+            wrapper.ensure_connection()
+        raw_connections = [wrapper.connection for wrapper in wrappers]
+        for wrapper in wrappers:
+            wrapper.close()
+        self.assertEqual([c.closed for c in raw_connections], [0, 0, 1])
+
+    def test_forked_process(self):
+        self.get_backend_pid()
+        raw_connection = self.wrapper.connection
+        self.wrapper.close()
+        forked_pool = ConnectionPool()
+        forked_pool.idle = pool.idle
+        with mock.patch('os.getpid', return_value=forked_pool.pid + 1):
+            self.assertEqual(forked_pool.take(self.wrapper.pool_key), (None, None))
+            forked_pool.close_all()
+        self.assertFalse(raw_connection.closed)
+
+    def test_advisory_lock_connection(self):
+        self.get_backend_pid()
+        raw_connection = self.wrapper.connection
+        self.wrapper.close()
+        new_connection = self.wrapper.get_new_connection(
+            self.wrapper.get_connection_params()
+            )
+        self.assertIsNot(new_connection, raw_connection)
+        new_connection.close()
+
+
+class TestNonAtomicRequests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='test_user', email='b@a.com', password='password'
+            )
+        self.aoi_id = uuid4()
+
+    def is_non_atomic(self, url):
+        return 'default' in getattr(resolve(url).func, '_non_atomic_requests', set())
+
+    def test_read_only_views(self):
+        urls = [
+            reverse('changeset:list'),
+            reverse('changeset:detail', args=[1]),
+            reverse('changeset:stats'),
+            reverse('changeset:suspicion-reasons-list'),
+            reverse('changeset:tags-list'),
+            reverse('changeset:user-stats', args=[1]),
+            reverse('changeset:user-stats-batch'),
+            reverse('supervise:aoi-list-changesets', args=[self.aoi_id]),
+            reverse('supervise:aoi-stats', args=[self.aoi_id]),
+            reverse('supervise:aoi-changesets-feed', args=[self.aoi_id]),
+            ]
+        for url in urls:
+            self.assertTrue(self.is_non_atomic(url), url)
+
+    def test_write_views(self):
+        urls = [
+            reverse('changeset:set-harmful', args=[1]),
+            reverse('changeset:whitelist-user'),
+            reverse('supervise:aoi-list-create'),
+            ]
+        for url in urls:
+            self.assertFalse(self.is_non_atomic(url), url)
+
+    def test_changeset_list(self):
+        self.client.login(username=self.user.username, password='password')
+        response = self.client.get(reverse('changeset:list'))
+        self.assertEqual(response.status_code, 200)
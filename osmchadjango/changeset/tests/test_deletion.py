@@ -0,0 +1,57 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.utils import timezone
+
+from ..deletion import delete_unchecked_changesets
+from ..models import Changeset
+from .modelfactories import (
+    ChangesetFactory, GoodChangesetFactory, SuspicionReasonsFactory, TagFactory
+    )
+
+
+class TestDeleteUncheckedChangesets(TestCase):
+    def setUp(self):
+        self.before = timezone.now() - timedelta(days=180)
+        date = self.before - timedelta(days=1)
+        self.reason = SuspicionReasonsFactory(name='possible import')
+        self.tag = TagFactory(name='Vandalism')
+        self.old_changesets = ChangesetFactory.create_batch(7, date=date)
+        for changeset in self.old_changesets:
+            changeset.reasons.add(self.reason)
+            changeset.tags.add(self.tag)
+        self.old_checked_changeset = GoodChangesetFactory(date=date)
+        self.old_checked_changeset.reasons.add(self.reason)
+        self.changeset = ChangesetFactory()
+        self.changeset.tags.add(self.tag)
+
+    @patch('osmchadjango.changeset.deletion.time.sleep')
+    def test_delete_in_batches(self, mock_sleep):
+        self.assertEqual(
+            delete_unchecked_changesets(self.before, batch_size=3, pause=0.5), 7
+            )
+        self.assertEqual(mock_sleep.call_count, 2)
+        mock_sleep.assert_called_with(0.5)
+        self.assertEqual(
+            set(Changeset.objects.values_list('id', flat=True)),
+            {self.old_checked_changeset.id, self.changeset.id}
+            )
+        self.assertEqual(
+            list(self.reason.changesets.values_list('id', flat=True)),
+            [self.old_checked_changeset.id]
+            )
+        self.assertEqual(
+            list(self.tag.changesets.values_list('id', flat=True)),
+            [self.changeset.id]
+            )
+        self.assertEqual(Changeset.reasons.through.objects.count(), 1)
+        self.assertEqual(Changeset.tags.through.objects.count(), 1)
+
+    @patch('osmchadjango.changeset.deletion.time.sleep')
+    def test_nothing_to_delete(self, mock_sleep):
+        self.assertEqual(
+            delete_unchecked_changesets(self.before - timedelta(days=2)), 0
+            )
+        self.assertEqual(mock_sleep.call_count, 0)
+        self.assertEqual(Changeset.objects.count(), 9)
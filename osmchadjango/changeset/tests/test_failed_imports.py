@@ -0,0 +1,58 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from ..failed_imports import (
+    MAX_ATTEMPTS, RUNNING_TIMEOUT, claim_failures, clear_failures,
+    get_retry_delay, record_failure
+    )
+from ..models import FailedImport
+
+
+class TestFailedImports(TestCase):
+
+    def test_retry_delay(self):
+        self.assertEqual(get_retry_delay(1), timedelta(minutes=5))
+        self.assertEqual(get_retry_delay(3), timedelta(minutes=20))
+        self.assertEqual(get_retry_delay(20), timedelta(days=1))
+
+    def test_record_failure(self):
+        record_failure(10, ValueError('Not found'))
+        failed = record_failure(10, ConnectionError('Timeout'))
+        self.assertEqual(FailedImport.objects.count(), 1)
+        failed.refresh_from_db()
+        self.assertEqual(failed.attempts, 2)
+        self.assertEqual(failed.error_class, 'ConnectionError')
+        self.assertEqual(failed.error, 'Timeout')
+        self.assertEqual(failed.retry_at - failed.failed_at, timedelta(minutes=10))
+
+    def test_claim_failures(self):
+        now = timezone.now()
+        FailedImport.objects.create(
+            changeset_id=10, error_class='ValueError', failed_at=now,
+            retry_at=now - timedelta(minutes=1)
+            )
+        FailedImport.objects.create(
+            changeset_id=11, error_class='ValueError', failed_at=now,
+            retry_at=now - timedelta(minutes=2)
+            )
+        FailedImport.objects.create(
+            changeset_id=12, error_class='ValueError', failed_at=now,
+            retry_at=now + timedelta(minutes=1)
+            )
+        FailedImport.objects.create(
+            changeset_id=13, error_class='ValueError', failed_at=now,
+            retry_at=now - timedelta(minutes=1), attempts=MAX_ATTEMPTS
+            )
+        self.assertEqual(claim_failures(), [11, 10])
+        self.assertGreater(
+            FailedImport.objects.get(changeset_id=10).retry_at,
+            now + RUNNING_TIMEOUT - timedelta(minutes=1)
+            )
+        self.assertEqual(claim_failures(), [])
+
+        clear_failures([10, 11])
+        self.assertEqual(
+            list(FailedImport.objects.values_list('changeset_id', flat=True)), [12, 13]
+            )
@@ -0,0 +1,64 @@
+import asyncio
+import threading
+import time
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from ..fetcher import AsyncFetcher
+
+
+class ConcurrencyCounter(object):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = {}
+        self.max_running = {}
+        self.started = []
+
+    def fetch(self, url):
+        host = url.split('/')[2]
+        with self.lock:
+            self.started.append((host, time.monotonic()))
+            self.running[host] = self.running.get(host, 0) + 1
+            self.max_running[host] = max(
+                self.max_running.get(host, 0), self.running[host]
+                )
+        time.sleep(0.02)
+        with self.lock:
+            self.running[host] -= 1
+        if url.endswith('error'):
+            raise ValueError
+        return url.encode()
+
+
+class TestAsyncFetcher(SimpleTestCase):
+    def get_many(self, urls, **kwargs):
+        async def get_many():
+            fetcher = AsyncFetcher(**kwargs)
+            try:
+                return await fetcher.get_many(urls)
+            finally:
+                fetcher.close()
+        return asyncio.run(get_many())
+
+    def test_limits(self):
+        counter = ConcurrencyCounter()
+        urls = ['https://a.org/{}'.format(i) for i in range(12)]
+        urls += ['https://b.org/{}'.format(i) for i in range(4)]
+        urls.append('https://b.org/error')
+        with patch('osmchadjango.changeset.fetcher.fetch', side_effect=counter.fetch):
+            result = self.get_many(urls, max_in_flight=6, per_host=3)
+        self.assertEqual(len(result), 16)
+        self.assertEqual(result['https://a.org/1'], b'https://a.org/1')
+        self.assertNotIn('https://b.org/error', result)
+        self.assertEqual(counter.max_running, {'a.org': 3, 'b.org': 3})
+
+    def test_host_interval(self):
+        counter = ConcurrencyCounter()
+        urls = ['https://a.org/{}'.format(i) for i in range(4)]
+        with patch('osmchadjango.changeset.fetcher.fetch', side_effect=counter.fetch):
+            self.get_many(urls, max_in_flight=4, per_host=4, host_interval=0.05)
+        started = sorted(t for host, t in counter.started)
+        self.assertTrue(
+            all(b - a >= 0.045 for a, b in zip(started, started[1:]))
+            )
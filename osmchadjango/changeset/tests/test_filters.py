@@ -213,6 +213,10 @@ class TestChangesetFilter(TestCase):
             )
         self.assertEqual(ChangesetFilter({'comment': 'edit'}).qs.count(), 1)
         self.assertEqual(ChangesetFilter({'comment': 'import'}).qs.count(), 0)
+        self.assertEqual(ChangesetFilter({'comment': 'MY FIRST'}).qs.count(), 1)
+        # the wildcards are escaped
+        self.assertEqual(ChangesetFilter({'comment': 'My%edit'}).qs.count(), 0)
+        self.assertEqual(ChangesetFilter({'comment': 'My_first'}).qs.count(), 0)
         # source field
         self.assertEqual(ChangesetFilter({'source': 'Mapbox'}).qs.count(), 1)
         self.assertEqual(ChangesetFilter({'source': 'Bing'}).qs.count(), 1)
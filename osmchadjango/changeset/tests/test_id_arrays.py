@@ -0,0 +1,106 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.forms import modelform_factory
+from django.test import TestCase
+
+from ..id_arrays import update_id_arrays
+from ..models import Changeset
+from .modelfactories import ChangesetFactory, SuspicionReasonsFactory, TagFactory
+
+
+class TestIdArrays(TestCase):
+    def setUp(self):
+        self.reason_1 = SuspicionReasonsFactory(name='possible import')
+        self.reason_2 = SuspicionReasonsFactory(name='New mapper')
+        self.tag_1 = TagFactory(name='Vandalism')
+        self.tag_2 = TagFactory(name='Illegal import')
+        self.changeset = ChangesetFactory()
+        self.changeset_2 = ChangesetFactory(id=31450444)
+
+    def get_arrays(self, changeset):
+        return Changeset.objects.values_list('reason_ids', 'tag_ids').get(
+            id=changeset.id
+            )
+
+    def get_reasons_count(self, changeset):
+        return Changeset.objects.values_list('reasons_count', flat=True).get(
+            id=changeset.id
+            )
+
+    def test_add_remove_clear(self):
+        self.changeset.reasons.add(self.reason_2, self.reason_1)
+        self.changeset.tags.add(self.tag_1)
+        self.assertEqual(
+            self.get_arrays(self.changeset),
+            (sorted([self.reason_1.id, self.reason_2.id]), [self.tag_1.id])
+            )
+        self.assertEqual(self.changeset.tag_ids, [self.tag_1.id])
+        self.assertEqual(self.changeset.reasons_count, 2)
+        self.assertEqual(self.get_reasons_count(self.changeset), 2)
+
+        self.changeset.reasons.remove(self.reason_1)
+        self.changeset.tags.set([self.tag_2])
+        self.assertEqual(
+            self.get_arrays(self.changeset), ([self.reason_2.id], [self.tag_2.id])
+            )
+
+        self.changeset.reasons.clear()
+        self.assertEqual(self.get_arrays(self.changeset), ([], [self.tag_2.id]))
+        self.assertEqual(self.get_reasons_count(self.changeset), 0)
+        # saving the instance doesn't restore the old ids
+        self.changeset.save()
+        self.assertEqual(self.get_arrays(self.changeset), ([], [self.tag_2.id]))
+
+    def test_reverse_relation(self):
+        self.reason_1.changesets.add(self.changeset, self.changeset_2)
+        self.tag_1.changesets.add(self.changeset)
+        self.assertEqual(self.get_arrays(self.changeset_2), ([self.reason_1.id], []))
+        self.assertEqual(self.get_reasons_count(self.changeset_2), 1)
+
+        self.reason_1.changesets.remove(self.changeset_2)
+        self.assertEqual(self.get_arrays(self.changeset_2), ([], []))
+        self.assertEqual(self.get_reasons_count(self.changeset_2), 0)
+
+        self.tag_1.changesets.clear()
+        self.assertEqual(self.get_arrays(self.changeset), ([self.reason_1.id], []))
+
+    def test_delete_reason_and_tag(self):
+        self.changeset.reasons.add(self.reason_1, self.reason_2)
+        self.changeset.tags.add(self.tag_1)
+        self.reason_1.delete()
+        self.tag_1.delete()
+        self.assertEqual(self.get_arrays(self.changeset), ([self.reason_2.id], []))
+        self.assertEqual(self.get_reasons_count(self.changeset), 1)
+
+    def test_update_id_arrays(self):
+        Through = Changeset.reasons.through
+        Through.objects.bulk_create([
+            Through(changeset_id=self.changeset.id, suspicionreasons_id=self.reason_1.id),
+            Through(changeset_id=self.changeset_2.id, suspicionreasons_id=self.reason_2.id),
+            ])
+        self.assertEqual(self.get_arrays(self.changeset), ([], []))
+        update_id_arrays([self.changeset.id, self.changeset_2.id], ['reasons'])
+        self.assertEqual(self.get_arrays(self.changeset), ([self.reason_1.id], []))
+        self.assertEqual(self.get_arrays(self.changeset_2), ([self.reason_2.id], []))
+        self.assertEqual(self.get_reasons_count(self.changeset_2), 1)
+
+    def test_rebuild_id_arrays(self):
+        self.changeset.reasons.add(self.reason_1, self.reason_2)
+        self.changeset_2.tags.add(self.tag_1)
+        Changeset.objects.update(reason_ids=[self.tag_2.id], tag_ids=[], reasons_count=5)
+        out = StringIO()
+        call_command('rebuild_id_arrays', batch_size=1, stdout=out)
+        self.assertIn('Reasons and tags of 2 changesets updated.', out.getvalue())
+        self.assertEqual(
+            self.get_arrays(self.changeset),
+            (sorted([self.reason_1.id, self.reason_2.id]), [])
+            )
+        self.assertEqual(self.get_reasons_count(self.changeset), 2)
+        self.assertEqual(self.get_arrays(self.changeset_2), ([], [self.tag_1.id]))
+        self.assertEqual(self.get_reasons_count(self.changeset_2), 0)
+
+    def test_fields_not_editable(self):
+        form = modelform_factory(Changeset, fields='__all__')
+        for field in ['reason_ids', 'tag_ids', 'reasons_count']:
+            self.assertNotIn(field, form.base_fields)
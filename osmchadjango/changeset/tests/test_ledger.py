@@ -0,0 +1,108 @@
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from django.utils.six import StringIO
+
+from ..ledger import (
+    MAX_ATTEMPTS, claim_sequences, enqueue_sequences, fail_sequence,
+    finish_sequence, get_gaps, get_last_sequence, iter_claimed_sequences
+    )
+from ..models import ReplicationSequence
+
+
+class TestLedger(TestCase):
+    def setUp(self):
+        enqueue_sequences(10, 14)
+
+    def test_enqueue(self):
+        finish_sequence(10, 3)
+        enqueue_sequences(8, 12)
+        self.assertEqual(ReplicationSequence.objects.count(), 7)
+        self.assertEqual(
+            ReplicationSequence.objects.get(sequence=10).status,
+            ReplicationSequence.DONE
+            )
+        self.assertEqual(get_last_sequence(), 14)
+
+    def test_claim_finish_and_fail(self):
+        self.assertEqual(claim_sequences(2, worker='test'), [10, 11])
+        sequence = ReplicationSequence.objects.get(sequence=10)
+        self.assertEqual(sequence.status, ReplicationSequence.RUNNING)
+        self.assertEqual(sequence.attempts, 1)
+        self.assertEqual(sequence.worker, 'test')
+        self.assertIsNotNone(sequence.started_at)
+        self.assertEqual(claim_sequences(), [12])
+
+        finish_sequence(10, 25)
+        fail_sequence(11, ValueError('Bad file'))
+        sequence = ReplicationSequence.objects.get(sequence=10)
+        self.assertEqual(sequence.status, ReplicationSequence.DONE)
+        self.assertEqual(sequence.changesets, 25)
+        self.assertIsNotNone(sequence.finished_at)
+        sequence = ReplicationSequence.objects.get(sequence=11)
+        self.assertEqual(sequence.status, ReplicationSequence.FAILED)
+        self.assertEqual(sequence.error, 'Bad file')
+
+        # a failed sequence is not retried immediately
+        self.assertEqual(list(iter_claimed_sequences()), [13, 14])
+
+    def test_retry_failed_and_abandoned(self):
+        an_hour_ago = timezone.now() - timedelta(hours=1, minutes=1)
+        ReplicationSequence.objects.filter(sequence=10).update(
+            status=ReplicationSequence.FAILED, attempts=1, finished_at=an_hour_ago
+            )
+        ReplicationSequence.objects.filter(sequence=11).update(
+            status=ReplicationSequence.FAILED, attempts=MAX_ATTEMPTS,
+            finished_at=an_hour_ago
+            )
+        ReplicationSequence.objects.filter(sequence=12).update(
+            status=ReplicationSequence.RUNNING, attempts=1, started_at=an_hour_ago
+            )
+        ReplicationSequence.objects.filter(sequence=13).update(
+            status=ReplicationSequence.RUNNING, attempts=1, started_at=timezone.now()
+            )
+        self.assertEqual(claim_sequences(10), [10, 12, 14])
+        self.assertEqual(ReplicationSequence.objects.get(sequence=10).attempts, 2)
+
+    def test_gaps(self):
+        enqueue_sequences(20, 20)
+        enqueue_sequences(23, 30)
+        self.assertEqual(get_gaps(), [(15, 19), (21, 22)])
+
+    def test_status_command(self):
+        enqueue_sequences(20, 21)
+        fail_sequence(10, 'Timeout')
+        ReplicationSequence.objects.filter(sequence=10).update(attempts=MAX_ATTEMPTS)
+        out = StringIO()
+        call_command('replication_status', '--retry-failed', '--enqueue-gaps', stdout=out)
+        self.assertIn('pending: 6', out.getvalue())
+        self.assertIn('Replication file 10 failed 5 times: Timeout', out.getvalue())
+        self.assertIn('Missing replication files: 15 to 19', out.getvalue())
+        self.assertEqual(
+            ReplicationSequence.objects.filter(status=ReplicationSequence.PENDING).count(),
+            12
+            )
+        self.assertEqual(ReplicationSequence.objects.get(sequence=10).attempts, 0)
+
+
+class TestClaimSkipLocked(TransactionTestCase):
+    def test_locked_rows_are_skipped(self):
+        enqueue_sequences(1, 3)
+        other_connection = connection.get_new_connection(
+            connection.get_connection_params()
+            )
+        try:
+            with other_connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT sequence FROM {} WHERE sequence = 1 FOR UPDATE'.format(
+                        ReplicationSequence._meta.db_table
+                        )
+                    )
+                self.assertEqual(claim_sequences(2), [2, 3])
+        finally:
+            other_connection.rollback()
+            other_connection.close()
+        self.assertEqual(claim_sequences(2), [1])
@@ -0,0 +1,28 @@
+from django.test import TestCase
+
+from ..locks import AdvisoryLock
+
+
+class TestAdvisoryLock(TestCase):
+    def test_acquire_and_release(self):
+        lock = AdvisoryLock('test_lock')
+        other_lock = AdvisoryLock('test_lock')
+        self.assertTrue(lock.acquire())
+        # acquiring again doesn't take the lock twice
+        self.assertTrue(lock.acquire())
+        self.assertFalse(other_lock.acquire())
+        self.assertTrue(AdvisoryLock('another_lock').acquire())
+
+        lock.release()
+        self.assertFalse(lock.held)
+        self.assertTrue(other_lock.acquire())
+        other_lock.release()
+
+    def test_lock_is_released_when_connection_is_closed(self):
+        lock = AdvisoryLock('test_lock')
+        other_lock = AdvisoryLock('test_lock')
+        self.assertTrue(lock.acquire())
+        lock.connection.close()
+        self.assertTrue(other_lock.acquire())
+        self.assertFalse(lock.acquire())
+        other_lock.release()
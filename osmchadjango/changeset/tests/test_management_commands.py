@@ -1,5 +1,10 @@
 from datetime import timedelta, datetime, date
+from unittest.mock import patch
+import gzip
 import json
+import os
+import shutil
+import tempfile
 
 from django.conf import settings
 from django.core.management import call_command
@@ -29,6 +34,64 @@ class TestImportReplicationFile(TestCase):
             )
 
 
+class TestImportManyReplicationFiles(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.fixture = str(settings.APPS_DIR.path('changeset/tests/test_fixtures/011.osm.gz'))
+        shutil.copy(self.fixture, os.path.join(self.directory, '011.osm.gz'))
+        # the same changesets with other ids
+        with gzip.open(self.fixture) as f:
+            content = f.read().replace(b'id="464550', b'id="564550')
+        with gzip.open(os.path.join(self.directory, '012.osm.gz'), 'wb') as f:
+            f.write(content)
+        with open(os.path.join(self.directory, '013.osm.gz'), 'w') as f:
+            f.write('invalid')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    @patch('osmchadjango.changeset.tasks.analyse_changeset_concurrently')
+    def test_import_glob(self, mock_analyse):
+        async def analyse(changeset, fetcher, executor):
+            if changeset['id'].endswith('55030'):
+                raise ValueError('Not found')
+            return {'id': int(changeset['id']), 'user': 'test', 'is_suspect': False}, []
+        mock_analyse.side_effect = analyse
+
+        out = StringIO()
+        call_command(
+            'import_file', os.path.join(self.directory, '*.osm.gz'),
+            os.path.join(self.directory, 'missing*'), '--concurrency=4', stdout=out
+            )
+        self.assertEqual(Changeset.objects.count(), 12)
+        self.assertEqual(mock_analyse.call_count, 14)
+        self.assertIn(
+            '6 changesets created from {}. 1 failed.'.format(
+                os.path.join(self.directory, '012.osm.gz')
+                ),
+            out.getvalue()
+            )
+        self.assertIn(
+            'Failed to read {}'.format(os.path.join(self.directory, '013.osm.gz')),
+            out.getvalue()
+            )
+        self.assertIn('No files found in', out.getvalue())
+        self.assertIn('from 3 files', out.getvalue())
+        self.assertIn('1 files failed.', out.getvalue())
+
+    @patch('osmchadjango.changeset.tasks.analyse_changeset_concurrently')
+    def test_skip_unchanged_changesets(self, mock_analyse):
+        async def analyse(changeset, fetcher, executor):
+            return {'id': int(changeset['id']), 'user': 'test', 'is_suspect': False}, []
+        mock_analyse.side_effect = analyse
+
+        call_command('import_file', self.fixture, stdout=StringIO())
+        out = StringIO()
+        call_command('import_file', self.fixture, stdout=out)
+        self.assertEqual(mock_analyse.call_count, 7)
+        self.assertIn('0 changesets created from', out.getvalue())
+
+
 class TestDeleteOldData(TestCase):
     def setUp(self):
         self.six_months_ago = timezone.now() - timedelta(days=180)
@@ -92,6 +155,9 @@ class TestMergeReasons(TestCase):
                 ).count(),
             0
             )
+        self.assertEqual(
+            Changeset.objects.filter(reason_ids=[self.reason_1.id]).count(), 10
+            )
 
     def test_error(self):
         self.out = StringIO()
@@ -119,3 +185,26 @@ class TestBackfillChangesets(TestCase):
         self.assertIn(1235, cl)
         self.assertIn(1236, cl)
         self.assertIn(1237, cl)
+
+    @patch('osmchadjango.changeset.tasks.analyse_changeset_concurrently')
+    def test_backfill_only_missing_changesets(self, mock_analyse):
+        ChangesetFactory(id=1236, date=datetime(2020, 1, 2))
+        ChangesetFactory(id=1240, date=datetime(2021, 1, 5))
+
+        async def analyse(changeset_id, fetcher, executor):
+            if changeset_id == 1237:
+                raise ValueError('Not found')
+            return {'id': changeset_id, 'user': 'test', 'is_suspect': False}, []
+        mock_analyse.side_effect = analyse
+
+        out = StringIO()
+        call_command(
+            "backfill_changesets", "--start_date=2021-01-01",
+            "--end_date=2021-01-04", "--concurrency=2", stdout=out
+        )
+        self.assertEqual(
+            sorted(call[0][0] for call in mock_analyse.call_args_list),
+            [1235, 1237]
+            )
+        self.assertIn('1 changesets imported.', out.getvalue())
+        self.assertTrue(Changeset.objects.filter(id=1235).exists())
@@ -0,0 +1,100 @@
+import io
+import json
+import os
+import tempfile
+from unittest.mock import patch
+
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+
+from ..metrics import MeasuredReader, Metrics, metrics, report_metrics
+from ..replication import iter_changesets
+
+
+class TestMetrics(SimpleTestCase):
+
+    @patch('osmchadjango.changeset.metrics.time.perf_counter')
+    def test_nested_timers(self, mock_perf_counter):
+        mock_perf_counter.side_effect = [0, 1, 3, 10, 20, 25]
+        registry = Metrics()
+        with registry.timer('parse'):
+            with registry.timer('decompress'):
+                pass
+        with registry.timer('decompress'):
+            pass
+        summary = registry.summary()
+        self.assertEqual(summary['stage_seconds'], {'parse': 8, 'decompress': 7})
+        self.assertEqual(summary['stage_calls'], {'parse': 1, 'decompress': 2})
+
+    def test_stop_twice(self):
+        registry = Metrics()
+        timer = registry.start('parse')
+        registry.stop(timer)
+        registry.stop(timer)
+        self.assertEqual(registry.summary()['stage_calls'], {'parse': 1})
+
+    def test_summary_since(self):
+        registry = Metrics()
+        registry.inc('changesets', 3, 'saved')
+        registry.inc('reasons', 2)
+        since = registry.snapshot()
+        registry.inc('changesets', 4, 'saved')
+        registry.inc('changesets', label='failed')
+        self.assertEqual(
+            registry.summary(since),
+            {'changesets': {'saved': 4, 'failed': 1}, 'reasons': 0}
+            )
+
+    def test_render(self):
+        registry = Metrics()
+        registry.inc('reasons', 2)
+        registry.inc('bytes', 1024, 'download')
+        registry.observe('analysis', 1.5)
+        text = registry.render()
+        self.assertIn(
+            '# TYPE osmcha_ingestion_stage_seconds_total counter\n'
+            'osmcha_ingestion_stage_seconds_total{stage="analysis"} 1.5\n',
+            text
+            )
+        self.assertIn('osmcha_ingestion_bytes_total{stage="download"} 1024.0\n', text)
+        self.assertIn('osmcha_ingestion_reasons_total 2.0\n', text)
+        self.assertIn('# HELP osmcha_ingestion_files_total', text)
+
+    def test_measured_reader(self):
+        since = metrics.snapshot()
+        reader = MeasuredReader(io.BytesIO(b'x' * 100), 'download')
+        self.assertEqual(reader.read(60), b'x' * 60)
+        self.assertEqual(reader.read(), b'x' * 40)
+        summary = metrics.summary(since)
+        self.assertEqual(summary['bytes']['download'], 100)
+        self.assertEqual(summary['stage_calls']['download'], 2)
+
+    def test_iter_changesets(self):
+        filename = str(settings.APPS_DIR.path(
+            'changeset/tests/test_fixtures/011.osm.gz'
+            ))
+        geojson = str(settings.APPS_DIR.path('changeset/fixtures/brazil.geojson'))
+        since = metrics.snapshot()
+        self.assertEqual(len(list(iter_changesets(filename, geojson))), 1)
+        summary = metrics.summary(since)
+        self.assertEqual(summary['bytes']['download'], os.path.getsize(filename))
+        self.assertGreater(summary['bytes']['decompress'], summary['bytes']['download'])
+        self.assertEqual(summary['changesets'], {'filtered_out': 6})
+        self.assertEqual(summary['stage_calls']['filter'], 7)
+        self.assertEqual(summary['stage_calls']['parse'], 2)
+
+    def test_report_metrics(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'osmcha.prom')
+            since = metrics.snapshot()
+            metrics.inc('files', label='done')
+            with override_settings(INGESTION_METRICS_FILE=path):
+                with self.assertLogs('osmchadjango.changeset.metrics') as logs:
+                    report_metrics('import_file', since, imported=7)
+            summary = json.loads(logs.records[0].getMessage())
+            self.assertEqual(summary['event'], 'import_file')
+            self.assertEqual(summary['imported'], 7)
+            self.assertEqual(summary['files'], {'done': 1})
+            with open(path) as f:
+                self.assertIn('osmcha_ingestion_files_total{result="done"}', f.read())
+            self.assertEqual(os.listdir(directory), ['osmcha.prom'])
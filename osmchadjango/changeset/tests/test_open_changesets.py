@@ -0,0 +1,67 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from ..models import Changeset, OpenChangeset
+from ..open_changesets import CHECK_DELAY, MAX_AGE, claim_open_changesets, select_changesets
+from .modelfactories import ChangesetFactory
+
+
+def get_changeset(changeset_id, is_open=False, num_changes=5, comments_count=0):
+    return (
+        {'id': str(changeset_id), 'user': 'test'},
+        {'open': is_open, 'num_changes': num_changes, 'comments_count': comments_count}
+        )
+
+
+class TestSelectChangesets(TestCase):
+    def setUp(self):
+        ChangesetFactory(id=10, comments_count=0)
+        ChangesetFactory(id=11, comments_count=0)
+        now = timezone.now()
+        OpenChangeset.objects.create(changeset_id=11, num_changes=5, check_at=now)
+
+    def test_new_changesets(self):
+        selected = select_changesets([get_changeset(1), get_changeset(2, is_open=True)])
+        self.assertEqual([c['id'] for c in selected], ['1', '2'])
+        open_changeset = OpenChangeset.objects.get(changeset_id=2)
+        self.assertEqual(open_changeset.num_changes, 5)
+        self.assertGreater(open_changeset.check_at, timezone.now() + CHECK_DELAY / 2)
+        self.assertFalse(OpenChangeset.objects.filter(changeset_id=1).exists())
+
+    def test_skip_closed_changesets(self):
+        self.assertEqual(select_changesets([get_changeset(10, comments_count=2)]), [])
+        self.assertEqual(Changeset.objects.get(id=10).comments_count, 2)
+
+    def test_open_changeset_closed(self):
+        self.assertEqual(select_changesets([get_changeset(11)]), [])
+        self.assertFalse(OpenChangeset.objects.exists())
+
+        OpenChangeset.objects.create(
+            changeset_id=11, num_changes=5, check_at=timezone.now()
+            )
+        selected = select_changesets([get_changeset(11, num_changes=8)])
+        self.assertEqual([c['id'] for c in selected], ['11'])
+        self.assertFalse(OpenChangeset.objects.exists())
+
+    def test_open_changeset_still_open(self):
+        selected = select_changesets([get_changeset(11, is_open=True, num_changes=8)])
+        self.assertEqual([c['id'] for c in selected], ['11'])
+        self.assertEqual(OpenChangeset.objects.get(changeset_id=11).num_changes, 8)
+
+
+class TestClaimOpenChangesets(TestCase):
+    def test_claim(self):
+        now = timezone.now()
+        OpenChangeset.objects.create(changeset_id=1, check_at=now - timedelta(minutes=1))
+        OpenChangeset.objects.create(changeset_id=2, check_at=now + timedelta(minutes=1))
+        OpenChangeset.objects.create(changeset_id=3, check_at=now - timedelta(minutes=1))
+        OpenChangeset.objects.filter(changeset_id=3).update(
+            created_at=now - MAX_AGE - timedelta(minutes=1)
+            )
+        self.assertEqual(claim_open_changesets(), [1])
+        self.assertEqual(claim_open_changesets(), [])
+        self.assertEqual(
+            list(OpenChangeset.objects.values_list('changeset_id', flat=True)), [2, 1]
+            )
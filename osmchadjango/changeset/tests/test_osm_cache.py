@@ -0,0 +1,103 @@
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+from unittest.mock import MagicMock, patch
+
+from django.test import SimpleTestCase
+
+from ..osm_cache import CacheMissError, DiskCache
+
+
+def get_response(content=b'', status_code=200, headers={}):
+    response = MagicMock()
+    response.status_code = status_code
+    response.headers = headers
+    response.content = content
+    response.raw = io.BytesIO(content)
+    response.__enter__.return_value = response
+    return response
+
+
+class TestDiskCache(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.url = 'https://www.openstreetmap.org/api/0.6/changeset/1'
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    @patch('osmchadjango.changeset.osm_cache.requests.get')
+    def test_get_and_revalidate(self, mock_get):
+        cache = DiskCache(self.directory)
+        mock_get.return_value = get_response(b'<osm/>', headers={'ETag': '"a1"'})
+        self.assertEqual(cache.get(self.url), b'<osm/>')
+        self.assertNotIn('If-None-Match', mock_get.call_args[1]['headers'])
+
+        mock_get.return_value = get_response(status_code=304)
+        self.assertEqual(cache.get(self.url), b'<osm/>')
+        self.assertEqual(mock_get.call_args[1]['headers']['If-None-Match'], '"a1"')
+        self.assertEqual(cache.stats(), {'hits': 1, 'misses': 1, 'size': 6})
+
+        mock_get.return_value = get_response(b'<osm></osm>', headers={'ETag': '"a2"'})
+        self.assertEqual(cache.get(self.url), b'<osm></osm>')
+        self.assertEqual(cache.lookup(self.url)['etag'], '"a2"')
+
+    @patch('osmchadjango.changeset.osm_cache.requests.get')
+    def test_immutable_and_offline(self, mock_get):
+        cache = DiskCache(self.directory)
+        mock_get.return_value = get_response(b'<osm/>')
+        cache.get(self.url, immutable=True)
+        cache.get(self.url, immutable=True)
+        self.assertEqual(mock_get.call_count, 1)
+
+        offline_cache = DiskCache(self.directory, offline=True)
+        self.assertEqual(offline_cache.get(self.url), b'<osm/>')
+        with self.assertRaises(CacheMissError):
+            offline_cache.get('https://www.openstreetmap.org/api/0.6/changeset/2')
+        self.assertEqual(mock_get.call_count, 1)
+
+    @patch('osmchadjango.changeset.osm_cache.requests.get')
+    def test_open_saves_streamed_content(self, mock_get):
+        cache = DiskCache(self.directory)
+        mock_get.return_value = get_response(b'0123456789')
+        with cache.open(self.url, immutable=True) as f:
+            self.assertEqual(f.read(4), b'0123')
+        # the content not consumed is also saved
+        with cache.open(self.url, immutable=True) as f:
+            self.assertEqual(f.read(), b'0123456789')
+        self.assertEqual(mock_get.call_count, 1)
+
+        # content is not saved if there is an error while reading it
+        url = 'https://www.openstreetmap.org/api/0.6/changeset/2'
+        with self.assertRaises(ValueError):
+            with cache.open(url) as f:
+                f.read(4)
+                raise ValueError
+        self.assertIsNone(cache.lookup(url))
+        self.assertEqual(
+            [i for i in os.listdir(self.directory) if i.startswith('.tmp')], []
+            )
+
+    @patch('osmchadjango.changeset.osm_cache.requests.get')
+    def test_lru_eviction(self, mock_get):
+        cache = DiskCache(self.directory, max_size=25)
+        urls = ['{}{}'.format(self.url, i) for i in range(4)]
+        for i, url in enumerate(urls[:3]):
+            content = '{}'.format(i).encode() * 10
+            mock_get.return_value = get_response(content)
+            cache.get(url, immutable=True)
+            # set the last access time of the objects in the order they were saved
+            path = cache.object_path(hashlib.sha256(content).hexdigest())
+            if os.path.exists(path):
+                os.utime(path, (1000 + i, 1000 + i))
+        self.assertIsNone(cache.lookup(urls[0]))
+        cache.get(urls[1], immutable=True)
+
+        mock_get.return_value = get_response(b'3' * 10)
+        cache.get(urls[3], immutable=True)
+        self.assertIsNone(cache.lookup(urls[2]))
+        self.assertIsNotNone(cache.lookup(urls[1]))
+        self.assertIsNotNone(cache.lookup(urls[3]))
+        self.assertEqual(cache.stats()['size'], 20)
@@ -0,0 +1,78 @@
+from unittest.mock import patch
+
+from django.test import TestCase
+
+from ..models import SuspicionReasons
+from ..reasons import SuspicionReasonsRegistry
+from .modelfactories import SuspicionReasonsFactory
+
+
+# The registry only keeps the reasons after the transaction is committed, what
+# never happens inside a TestCase, so we execute the on_commit functions
+# immediately.
+@patch('osmchadjango.changeset.reasons.transaction.on_commit', side_effect=lambda func: func())
+class TestSuspicionReasonsRegistry(TestCase):
+    def setUp(self):
+        self.reason = SuspicionReasonsFactory(name='possible import')
+        self.registry = SuspicionReasonsRegistry()
+
+    def test_get_many(self, mock_on_commit):
+        reasons = self.registry.get_many(['possible import', 'New mapper'])
+        self.assertEqual(SuspicionReasons.objects.count(), 2)
+        self.assertEqual(reasons['possible import'], self.reason)
+        self.assertEqual(
+            reasons['New mapper'], SuspicionReasons.objects.get(name='New mapper')
+            )
+        self.assertTrue(self.registry.loaded)
+        self.assertEqual(self.registry.misses, 1)
+
+        with self.assertNumQueries(0):
+            self.registry.get_many(['possible import', 'New mapper'])
+        self.assertEqual(self.registry.stats(), {'hits': 2, 'misses': 1, 'size': 2})
+
+    def test_get(self, mock_on_commit):
+        self.assertEqual(self.registry.get('possible import'), self.reason)
+        self.assertEqual(self.registry.get('New mapper').name, 'New mapper')
+        self.assertEqual(SuspicionReasons.objects.count(), 2)
+
+    def test_get_by_id(self, mock_on_commit):
+        self.assertEqual(self.registry.get_by_id(self.reason.id), self.reason)
+        self.assertEqual(self.registry.get_by_id(str(self.reason.id)), self.reason)
+        self.assertIsNone(self.registry.get_by_id('possible import'))
+        self.assertIsNone(self.registry.get_by_id(self.reason.id + 1))
+        self.assertEqual(self.registry.misses, 2)
+        with self.assertNumQueries(0):
+            self.registry.get_by_id(self.reason.id)
+            # the loaded registry is not read again for unknown ids
+            self.assertIsNone(self.registry.get_by_id(self.reason.id + 2))
+        self.assertEqual(self.registry.hits, 2)
+
+    def test_invalidation(self, mock_on_commit):
+        self.registry.get('possible import')
+        self.assertTrue(self.registry.loaded)
+        # changing a reason resets the registries in the next version check
+        self.reason.is_visible = False
+        self.reason.save()
+        self.registry.checked_at = None
+        self.assertFalse(
+            self.registry.get('possible import').is_visible
+            )
+
+    def test_invalidation_on_commit(self, mock_on_commit):
+        other_registry = SuspicionReasonsRegistry()
+        other_registry.get('possible import')
+        callbacks = []
+        mock_on_commit.side_effect = callbacks.append
+        self.reason.delete()
+        # another process checks the new version before the commit and loads
+        # the old rows
+        other_registry.checked_at = None
+        other_registry.check_version()
+        other_registry.by_name['possible import'] = self.reason
+        other_registry.loaded = True
+        for callback in callbacks:
+            callback()
+        other_registry.checked_at = None
+        other_registry.check_version()
+        self.assertFalse(other_registry.loaded)
+        self.assertNotIn('possible import', other_registry.by_name)
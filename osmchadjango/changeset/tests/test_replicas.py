@@ -0,0 +1,132 @@
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APITestCase
+
+from ...users.models import User
+from ..models import Changeset
+from ..replicas import (
+    ReplicaRouter, ReplicaStickinessMiddleware, has_recent_write,
+    mark_recent_write, read_from_replicas, replica_pool
+    )
+from .modelfactories import ChangesetFactory
+
+
+@override_settings(DATABASE_REPLICAS=['default'], REPLICA_MAX_LAG=30)
+class TestReplicaRouter(TestCase):
+    def setUp(self):
+        cache.clear()
+        replica_pool.lags = {}
+        self.router = ReplicaRouter()
+        self.user = User.objects.create_user(
+            username='test_user', email='b@a.com', password='password'
+            )
+        self.request = RequestFactory().get('/')
+        self.request.user = self.user
+
+    def tearDown(self):
+        replica_pool.lags = {}
+
+    def test_read_outside_context(self):
+        self.assertIsNone(self.router.db_for_read(Changeset))
+        self.assertEqual(self.router.db_for_write(Changeset), 'default')
+
+    def test_read_from_replicas(self):
+        with read_from_replicas(self.request):
+            self.assertEqual(self.router.db_for_read(Changeset), 'default')
+        self.assertIsNone(self.router.db_for_read(Changeset))
+
+    def test_unsafe_method(self):
+        request = RequestFactory().post('/')
+        request.user = self.user
+        with read_from_replicas(request):
+            self.assertIsNone(self.router.db_for_read(Changeset))
+
+    def test_replica_lag(self):
+        with mock.patch.object(replica_pool, 'get_lag', return_value=60):
+            with read_from_replicas(self.request):
+                self.assertIsNone(self.router.db_for_read(Changeset))
+        # the lag is checked again only after the check_interval
+        with mock.patch.object(replica_pool, 'get_lag', return_value=1) as get_lag:
+            with read_from_replicas(self.request):
+                self.assertIsNone(self.router.db_for_read(Changeset))
+            get_lag.assert_not_called()
+        replica_pool.lags = {}
+        with mock.patch.object(replica_pool, 'get_lag', return_value=1):
+            with read_from_replicas(self.request):
+                self.assertEqual(self.router.db_for_read(Changeset), 'default')
+
+    def test_recent_write(self):
+        self.assertFalse(has_recent_write(self.user))
+        mark_recent_write(self.user)
+        self.assertTrue(has_recent_write(self.user))
+        with read_from_replicas(self.request):
+            self.assertIsNone(self.router.db_for_read(Changeset))
+
+    def test_anonymous_user(self):
+        self.request.user = AnonymousUser()
+        mark_recent_write(self.request.user)
+        self.assertFalse(has_recent_write(self.request.user))
+        with read_from_replicas(self.request):
+            self.assertEqual(self.router.db_for_read(Changeset), 'default')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas(self):
+        mark_recent_write(self.user)
+        self.assertFalse(has_recent_write(self.user))
+        with read_from_replicas(self.request):
+            self.assertIsNone(self.router.db_for_read(Changeset))
+
+    def test_allow_migrate(self):
+        self.assertFalse(self.router.allow_migrate('default', 'changeset'))
+        with override_settings(DATABASE_REPLICAS=['replica_0']):
+            self.assertTrue(self.router.allow_migrate('default', 'changeset'))
+
+    def test_stickiness_middleware(self):
+        middleware = ReplicaStickinessMiddleware(lambda request: HttpResponse())
+        middleware(self.request)
+        self.assertFalse(has_recent_write(self.user))
+
+        request = RequestFactory().put('/')
+        request.user = self.user
+        failed = ReplicaStickinessMiddleware(lambda request: HttpResponse(status=403))
+        failed(request)
+        self.assertFalse(has_recent_write(self.user))
+
+        middleware(request)
+        self.assertTrue(has_recent_write(self.user))
+
+
+@override_settings(DATABASE_REPLICAS=['default'])
+class TestReplicaViews(APITestCase):
+    def setUp(self):
+        cache.clear()
+        replica_pool.lags = {}
+        self.user = User.objects.create_user(
+            username='test_user', email='b@a.com', password='password'
+            )
+        self.changeset = ChangesetFactory()
+
+    def tearDown(self):
+        replica_pool.lags = {}
+
+    def test_changeset_list(self):
+        self.client.login(username=self.user.username, password='password')
+        with mock.patch.object(replica_pool, 'choose', return_value='default') as choose:
+            response = self.client.get(reverse('changeset:list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 1)
+        choose.assert_called()
+
+    def test_changeset_list_after_write(self):
+        self.client.login(username=self.user.username, password='password')
+        mark_recent_write(self.user)
+        with mock.patch.object(replica_pool, 'choose') as choose:
+            response = self.client.get(reverse('changeset:list'))
+        self.assertEqual(response.status_code, 200)
+        choose.assert_not_called()
@@ -0,0 +1,85 @@
+import json
+import tempfile
+
+from django.conf import settings
+from django.test import TestCase
+
+from shapely.geometry import Polygon, box
+
+from ..replication import ChangesetsFilter, get_changesets_filter, iter_changesets
+
+
+class TestIterChangesets(TestCase):
+    def setUp(self):
+        self.filename = str(settings.APPS_DIR.path(
+            'changeset/tests/test_fixtures/011.osm.gz'
+            ))
+        self.geojson = str(settings.APPS_DIR.path(
+            'changeset/fixtures/brazil.geojson'
+            ))
+
+    def test_iter_changesets(self):
+        changesets = list(iter_changesets(self.filename))
+        self.assertEqual(len(changesets), 7)
+        self.assertEqual(
+            [c['id'] for c in changesets],
+            ['46455028', '46455029', '46455030', '46455031', '46455032',
+             '46455033', '46455034']
+            )
+        self.assertIn('created_at', changesets[0].keys())
+        self.assertIn('bbox', changesets[0].keys())
+
+    def test_iter_changesets_with_filter(self):
+        changesets = list(iter_changesets(self.filename, self.geojson))
+        self.assertEqual(len(changesets), 1)
+
+
+class TestChangesetsFilter(TestCase):
+    def setUp(self):
+        self.geojson = tempfile.NamedTemporaryFile('w', suffix='.geojson')
+        json.dump({
+            'type': 'FeatureCollection',
+            'features': [
+                {
+                    'type': 'Feature',
+                    'properties': {},
+                    'geometry': {
+                        'type': 'MultiPolygon',
+                        'coordinates': [
+                            [[[0, 0], [10, 0], [10, 10], [0, 10], [0, 0]],
+                             [[2, 2], [8, 2], [8, 8], [2, 8], [2, 2]]],
+                            [[[20, 0], [30, 0], [30, 10], [20, 10], [20, 0]]]
+                            ]
+                        }
+                    },
+                {
+                    'type': 'Feature',
+                    'properties': {},
+                    'geometry': {
+                        'type': 'Polygon',
+                        'coordinates': [[[40, 0], [50, 0], [50, 10], [40, 10], [40, 0]]]
+                        }
+                    }
+                ]
+            }, self.geojson)
+        self.geojson.flush()
+
+    def tearDown(self):
+        self.geojson.close()
+
+    def test_intersects(self):
+        area = ChangesetsFilter(self.geojson.name)
+        self.assertEqual(len(area.parts), 3)
+        self.assertTrue(area.intersects(box(-1, -1, 1, 1)))
+        self.assertTrue(area.intersects(box(25, 5, 26, 6)))
+        self.assertTrue(area.intersects(box(45, 5, 46, 6)))
+        # inside the hole of the first polygon
+        self.assertFalse(area.intersects(box(4, 4, 6, 6)))
+        self.assertFalse(area.intersects(box(12, 2, 18, 8)))
+        self.assertFalse(area.intersects(Polygon()))
+
+    def test_filter_is_loaded_once(self):
+        self.assertIs(
+            get_changesets_filter(self.geojson.name),
+            get_changesets_filter(self.geojson.name)
+            )
@@ -194,3 +194,30 @@ class TestUserStatsViews(APITestCase):
         self.assertEqual(response.data.get('changesets_in_osmcha'), 0)
         self.assertEqual(response.data.get('checked_changesets'), 0)
         self.assertEqual(response.data.get('harmful_changesets'), 0)
+
+    def test_batch_user_stats(self):
+        ChangesetFactory(user='user_two', uid='1234')
+        url = reverse('changeset:user-stats-batch')
+        response = self.client.get(url, {'uids': '4321,1234,1611'})
+        self.assertEqual(response.status_code, 401)
+
+        self.client.login(username=self.user.username, password='password')
+        response = self.client.get(url, {'uids': '4321,1234,1611'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.data['4321'],
+            {
+                'changesets_in_osmcha': 3,
+                'checked_changesets': 2,
+                'harmful_changesets': 1
+            }
+            )
+        self.assertEqual(response.data['1234']['changesets_in_osmcha'], 1)
+        self.assertEqual(response.data['1611']['changesets_in_osmcha'], 0)
+
+        response = self.client.get(url, {'uids': '4321,user'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(
+            url, {'uids': ','.join(str(uid) for uid in range(501))}
+            )
+        self.assertEqual(response.status_code, 400)
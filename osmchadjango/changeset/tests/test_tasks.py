@@ -1,18 +1,30 @@
 # -*- coding: utf-8 -*-
+from datetime import timedelta
 from unittest.mock import patch
 from urllib.parse import quote
 
 from django.test import TestCase
 from django.conf import settings
+from django.utils import timezone
 
 from social_django.models import UserSocialAuth
 from requests_oauthlib import OAuth2Session
 
 from ...users.models import User
-from ..models import Changeset, SuspicionReasons
+from ..locks import IMPORT_LOCK, AdvisoryLock
+from ..ledger import enqueue_sequences, iter_claimed_sequences
+from ..failed_imports import record_failure
+from ..models import (
+    Changeset, FailedImport, OpenChangeset, SuspicionReasons, Import,
+    ReplicationSequence
+    )
 from ..tasks import (
-    create_changeset, format_url, get_last_replication_id, ChangesetCommentAPI
+    create_changeset, format_url, get_last_replication_id, ChangesetCommentAPI,
+    get_filter_changeset_file, import_replications, fetch_latest,
+    follow_replications, import_replications_concurrently, retry_failed_imports,
+    reanalyse_open_changesets
     )
+from .modelfactories import ChangesetFactory
 
 
 class TestFormatURL(TestCase):
@@ -24,6 +36,228 @@ class TestFormatURL(TestCase):
             )
 
 
+class TestGetFilterChangesetFile(TestCase):
+
+    def setUp(self):
+        self.filename = str(settings.APPS_DIR.path(
+            'changeset/tests/test_fixtures/011.osm.gz'
+            ))
+
+    @patch('osmchadjango.changeset.tasks.analyse_changeset')
+    def test_get_filter_changeset_file(self, mock_analyse):
+        mock_analyse.side_effect = lambda changeset: (
+            {'id': int(changeset['id']), 'user': 'test', 'is_suspect': False}, []
+            )
+        self.assertEqual(get_filter_changeset_file(self.filename), 7)
+        self.assertEqual(mock_analyse.call_count, 7)
+        self.assertEqual(Changeset.objects.count(), 7)
+        self.assertTrue(Changeset.objects.filter(id=46455028).exists())
+
+    @patch('osmchadjango.changeset.tasks.analyse_changeset')
+    def test_failed_changeset(self, mock_analyse):
+        def analyse(changeset):
+            if changeset['id'] == '46455030':
+                raise ConnectionError('Timeout')
+            return {'id': int(changeset['id']), 'user': 'test', 'is_suspect': False}, []
+        mock_analyse.side_effect = analyse
+        self.assertEqual(get_filter_changeset_file(self.filename), 6)
+        failed = FailedImport.objects.get()
+        self.assertEqual(failed.changeset_id, 46455030)
+        self.assertEqual(failed.error_class, 'ConnectionError')
+        self.assertEqual(failed.attempts, 1)
+
+
+class TestImportReplicationsConcurrently(TestCase):
+
+    def setUp(self):
+        self.filename = str(settings.APPS_DIR.path(
+            'changeset/tests/test_fixtures/011.osm.gz'
+            ))
+
+    @patch('osmchadjango.changeset.tasks.format_url')
+    @patch('osmchadjango.changeset.fetcher.fetch')
+    def test_import(self, mock_fetch, mock_format_url):
+        mock_format_url.return_value = self.filename
+        def fetch(url):
+            if url.endswith('/download'):
+                return b'<osmChange>' + b'<create/>' * 300 + b'</osmChange>'
+            return b'''<osm><user><changesets count="10"/>
+                <blocks><received count="0"/></blocks></user></osm>'''
+        mock_fetch.side_effect = fetch
+        enqueue_sequences(1, 1)
+        self.assertEqual(
+            import_replications_concurrently(iter_claimed_sequences(), concurrency=4), 7
+            )
+        self.assertEqual(mock_fetch.call_count, 14)
+        sequence = ReplicationSequence.objects.get(sequence=1)
+        self.assertEqual(sequence.status, ReplicationSequence.DONE)
+        self.assertEqual(sequence.changesets, 7)
+        self.assertEqual(Changeset.objects.count(), 7)
+        changeset = Changeset.objects.get(id=46455028)
+        self.assertEqual(changeset.create, 300)
+        self.assertIn(
+            'New mapper', changeset.reasons.values_list('name', flat=True)
+            )
+
+
+class TestImportReplications(TestCase):
+
+    @patch('osmchadjango.changeset.tasks.get_filter_changeset_file')
+    def test_import_replications(self, mock_get_file):
+        mock_get_file.return_value = 2
+        self.assertEqual(import_replications(10, 12), 6)
+        self.assertEqual(mock_get_file.call_count, 3)
+        self.assertEqual(Import.objects.count(), 1)
+        self.assertEqual(Import.objects.get().start, 10)
+        self.assertEqual(Import.objects.get().end, 12)
+        self.assertEqual(
+            list(ReplicationSequence.objects.values_list('sequence', 'status', 'changesets')),
+            [(10, 'done', 2), (11, 'done', 2), (12, 'done', 2)]
+            )
+
+    @patch('osmchadjango.changeset.tasks.get_filter_changeset_file')
+    def test_failed_replication_file(self, mock_get_file):
+        mock_get_file.side_effect = [2, Exception('Connection error'), 3]
+        self.assertEqual(import_replications(10, 12), 5)
+        self.assertEqual(
+            list(ReplicationSequence.objects.values_list('sequence', 'status', 'changesets')),
+            [(10, 'done', 2), (11, 'failed', None), (12, 'done', 3)]
+            )
+        self.assertEqual(
+            ReplicationSequence.objects.get(sequence=11).error, 'Connection error'
+            )
+
+
+class TestFetchLatest(TestCase):
+
+    @patch('osmchadjango.changeset.tasks.import_replications')
+    @patch('osmchadjango.changeset.tasks.get_last_replication_id')
+    def test_fetch_latest(self, mock_sequence, mock_import):
+        Import.objects.create(start=10, end=20)
+        mock_sequence.return_value = 100
+        self.assertEqual(fetch_latest(max_files=30), 30)
+        mock_import.assert_called_with(21, 50, workers=1, concurrency=1)
+        self.assertEqual(fetch_latest(workers=4), 80)
+        mock_import.assert_called_with(21, 100, workers=4, concurrency=1)
+
+    @patch('osmchadjango.changeset.tasks.import_replications')
+    @patch('osmchadjango.changeset.tasks.get_last_replication_id')
+    def test_without_new_files(self, mock_sequence, mock_import):
+        Import.objects.create(start=10, end=20)
+        mock_sequence.return_value = 20
+        self.assertEqual(fetch_latest(), 0)
+        self.assertEqual(mock_import.call_count, 0)
+
+    @patch('osmchadjango.changeset.tasks.import_replications')
+    @patch('osmchadjango.changeset.tasks.get_last_replication_id')
+    def test_start_from_ledger(self, mock_sequence, mock_import):
+        Import.objects.create(start=10, end=20)
+        enqueue_sequences(10, 30)
+        mock_sequence.return_value = 100
+        self.assertEqual(fetch_latest(), 70)
+        mock_import.assert_called_with(31, 100, workers=1, concurrency=1)
+
+
+class TestRetryFailedImports(TestCase):
+
+    @patch('osmchadjango.changeset.tasks.analyse_changeset_concurrently')
+    def test_retry(self, mock_analyse):
+        async def analyse(changeset_id, fetcher, executor):
+            if changeset_id == 11:
+                raise ValueError('Not found')
+            return {'id': changeset_id, 'user': 'test', 'is_suspect': False}, []
+        mock_analyse.side_effect = analyse
+        for changeset_id in [10, 11, 12]:
+            record_failure(changeset_id, ConnectionError('Timeout'))
+        FailedImport.objects.filter(changeset_id__in=[10, 11]).update(
+            retry_at=timezone.now() - timedelta(minutes=1)
+            )
+
+        self.assertEqual(retry_failed_imports(batch_size=1), 1)
+        self.assertEqual(mock_analyse.call_count, 2)
+        self.assertTrue(Changeset.objects.filter(id=10).exists())
+        self.assertEqual(
+            list(FailedImport.objects.values_list('changeset_id', flat=True)), [12, 11]
+            )
+        failed = FailedImport.objects.get(changeset_id=11)
+        self.assertEqual(failed.attempts, 2)
+        self.assertEqual(failed.error_class, 'ValueError')
+
+
+class TestReanalyseOpenChangesets(TestCase):
+
+    @patch('osmchadjango.changeset.tasks.analyse_changeset_concurrently')
+    @patch('osmchadjango.changeset.fetcher.fetch')
+    def test_reanalyse(self, mock_fetch, mock_analyse):
+        changesets = {'1': ('true', 8), '2': ('false', 8), '3': ('false', 5)}
+        def fetch(url):
+            changeset_id = url.split('/')[-1]
+            is_open, num_changes = changesets[changeset_id]
+            return '''<osm><changeset id="{}" created_at="2023-01-01T10:00:00Z"
+                open="{}" num_changes="{}" user="test" uid="1" min_lat="1" max_lat="2"
+                min_lon="1" max_lon="2" comments_count="0"/></osm>'''.format(
+                changeset_id, is_open, num_changes
+                ).encode()
+        mock_fetch.side_effect = fetch
+
+        async def analyse(changeset, fetcher, executor):
+            return {'id': int(changeset['id']), 'user': 'test', 'is_suspect': False}, []
+        mock_analyse.side_effect = analyse
+
+        now = timezone.now()
+        for changeset_id in [1, 2, 3]:
+            ChangesetFactory(id=changeset_id, comments_count=0)
+            OpenChangeset.objects.create(changeset_id=changeset_id, num_changes=5, check_at=now)
+        OpenChangeset.objects.create(
+            changeset_id=4, num_changes=5, check_at=now + timedelta(minutes=10)
+            )
+
+        self.assertEqual(reanalyse_open_changesets(), 2)
+        self.assertEqual(
+            sorted(call[0][0]['id'] for call in mock_analyse.call_args_list), ['1', '2']
+            )
+        self.assertEqual(
+            list(OpenChangeset.objects.values_list('changeset_id', 'num_changes')),
+            [(4, 5), (1, 8)]
+            )
+        self.assertEqual(Changeset.objects.get(id=2).user, 'test')
+
+
+class StopFollowing(Exception):
+    pass
+
+
+class TestFollowReplications(TestCase):
+
+    @patch('osmchadjango.changeset.tasks.time.sleep')
+    @patch('osmchadjango.changeset.tasks.fetch_latest')
+    def test_adaptive_interval(self, mock_fetch, mock_sleep):
+        mock_fetch.side_effect = [10, 3, 0, Exception('Timeout'), 1]
+        mock_sleep.side_effect = [None, None, None, StopFollowing]
+        with self.assertRaises(StopFollowing):
+            follow_replications(min_interval=30, max_interval=100, max_files=10)
+        self.assertEqual(mock_fetch.call_count, 5)
+        # the import of 10 files doesn't wait for the next one
+        self.assertEqual(
+            [call[0][0] for call in mock_sleep.call_args_list],
+            [30, 60, 100, 30]
+            )
+
+    @patch('osmchadjango.changeset.tasks.time.sleep')
+    @patch('osmchadjango.changeset.tasks.fetch_latest')
+    def test_wait_while_lock_is_held(self, mock_fetch, mock_sleep):
+        lock = AdvisoryLock(IMPORT_LOCK)
+        lock.acquire()
+        mock_sleep.side_effect = [None, StopFollowing]
+        try:
+            with self.assertRaises(StopFollowing):
+                follow_replications(min_interval=30)
+        finally:
+            lock.release()
+        self.assertEqual(mock_fetch.call_count, 0)
+        self.assertEqual(mock_sleep.call_count, 2)
+
+
 class TestCreateChangeset(TestCase):
 
     def test_creation(self):
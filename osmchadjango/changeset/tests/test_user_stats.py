@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from ..deletion import delete_changesets_batch
+from ..models import Changeset, UserStats
+from ..writer import ChangesetWriter
+from .modelfactories import ChangesetFactory, HarmfulChangesetFactory
+from .test_writer import get_ch_dict
+
+
+class TestUserStats(TestCase):
+    def setUp(self):
+        self.date = timezone.now() - timedelta(days=1)
+        self.changeset = ChangesetFactory(uid='4321', date=self.date)
+        self.harmful_changeset = HarmfulChangesetFactory(
+            uid='4321', date=self.date - timedelta(days=1)
+            )
+        ChangesetFactory(uid='1234')
+
+    def get_stats(self, uid):
+        return UserStats.objects.values_list(
+            'changesets', 'checked_changesets', 'harmful_changesets'
+            ).get(uid=uid)
+
+    def test_create_changesets(self):
+        self.assertEqual(self.get_stats('4321'), (2, 1, 1))
+        self.assertEqual(self.get_stats('1234'), (1, 0, 0))
+        self.assertEqual(UserStats.objects.get(uid='4321').last_seen, self.date)
+
+    def test_check_and_uncheck(self):
+        self.changeset.checked = True
+        self.changeset.harmful = True
+        self.changeset.save(update_fields=['checked', 'harmful'])
+        self.assertEqual(self.get_stats('4321'), (2, 2, 2))
+
+        self.harmful_changeset.checked = False
+        self.harmful_changeset.harmful = None
+        self.harmful_changeset.save(update_fields=['checked', 'harmful'])
+        self.assertEqual(self.get_stats('4321'), (2, 1, 1))
+
+        # fields that are not in the statistics
+        self.changeset.comment = 'Update roads'
+        self.changeset.save(update_fields=['comment'])
+        self.assertEqual(self.get_stats('4321'), (2, 1, 1))
+
+    def test_delete_changesets(self):
+        self.changeset.delete()
+        self.assertEqual(self.get_stats('4321'), (1, 1, 1))
+        delete_changesets_batch([self.harmful_changeset.id])
+        self.assertEqual(self.get_stats('4321'), (0, 0, 0))
+
+    def test_writer(self):
+        writer = ChangesetWriter()
+        writer.add(get_ch_dict(1000, uid='4321', date=datetime(2030, 1, 2)), [])
+        # the harmful changeset is analysed again, so it is not counted twice
+        writer.add(get_ch_dict(self.harmful_changeset.id, uid='4321'), [])
+        writer.flush()
+        self.assertEqual(self.get_stats('4321'), (3, 1, 1))
+        self.assertEqual(
+            UserStats.objects.get(uid='4321').last_seen.year, 2030
+            )
+
+    def test_rebuild_user_stats(self):
+        Changeset.objects.filter(id=self.changeset.id).update(checked=True)
+        UserStats.objects.filter(uid='1234').delete()
+        out = StringIO()
+        call_command('rebuild_user_stats', stdout=out)
+        self.assertIn('Statistics of 2 users calculated.', out.getvalue())
+        self.assertEqual(self.get_stats('4321'), (2, 2, 1))
+        self.assertEqual(self.get_stats('1234'), (1, 0, 0))
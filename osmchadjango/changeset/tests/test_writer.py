@@ -0,0 +1,115 @@
+from datetime import datetime
+
+from django.test import TestCase
+
+from ..failed_imports import record_failure
+from ..models import Changeset, FailedImport
+from ..writer import ChangesetWriter
+from .modelfactories import (
+    GoodChangesetFactory, SuspicionReasonsFactory, UserFactory
+    )
+
+
+def get_ch_dict(changeset_id, **kwargs):
+    ch_dict = {
+        'id': changeset_id,
+        'user': 'test',
+        'uid': '123123',
+        'editor': 'JOSM/1.5 (7470 en)',
+        'powerfull_editor': True,
+        'comment': 'Update buildings',
+        'comments_count': 0,
+        'source': 'Bing',
+        'imagery_used': 'Bing',
+        'date': datetime(2021, 1, 2, 10, 30),
+        'create': 2000,
+        'modify': 10,
+        'delete': 1,
+        'bbox': 'POLYGON ((-34.9 -8.2, -34.8 -8.2, -34.8 -8.1, -34.9 -8.1, -34.9 -8.2))',
+        'is_suspect': True,
+        'metadata': {'host': 'https://www.openstreetmap.org/edit'},
+        }
+    ch_dict.update(kwargs)
+    return ch_dict
+
+
+class TestChangesetWriter(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.reviewed_changeset = GoodChangesetFactory(
+            id=2000, check_user=self.user, comments_count=1
+            )
+        self.reason = SuspicionReasonsFactory(name='possible import')
+        self.reason.changesets.add(self.reviewed_changeset)
+
+    def test_write_batch(self):
+        writer = ChangesetWriter()
+        writer.add(get_ch_dict(1000), ['possible import', 'New mapper'])
+        writer.add(get_ch_dict(1001, is_suspect=False), [])
+        self.assertEqual(Changeset.objects.count(), 1)
+        self.assertEqual(writer.flush(), 2)
+        self.assertEqual(writer.written, 2)
+        self.assertEqual(Changeset.objects.count(), 3)
+
+        changeset = Changeset.objects.get(id=1000)
+        self.assertEqual(changeset.user, 'test')
+        self.assertEqual(changeset.create, 2000)
+        self.assertIsInstance(changeset.area, float)
+        self.assertFalse(changeset.checked)
+        self.assertEqual(changeset.new_features, [])
+        self.assertEqual(
+            set(changeset.reasons.values_list('name', flat=True)),
+            {'possible import', 'New mapper'}
+            )
+        self.assertEqual(Changeset.objects.get(id=1001).reasons.count(), 0)
+        self.assertEqual(
+            sorted(changeset.reason_ids),
+            sorted(changeset.reasons.values_list('id', flat=True))
+            )
+        self.assertEqual(Changeset.objects.get(id=1001).reason_ids, [])
+        self.assertEqual(changeset.reasons_count, 2)
+
+    def test_flush_when_batch_is_full(self):
+        writer = ChangesetWriter(batch_size=2)
+        writer.add(get_ch_dict(1000), [])
+        writer.add(get_ch_dict(1001), [])
+        self.assertEqual(Changeset.objects.count(), 3)
+        self.assertEqual(writer.flush(), 0)
+
+    def test_update_keeps_review_fields(self):
+        writer = ChangesetWriter()
+        writer.add(get_ch_dict(2000, comments_count=3), ['possible import'])
+        writer.flush()
+        changeset = Changeset.objects.get(id=2000)
+        self.assertEqual(changeset.comments_count, 3)
+        self.assertEqual(changeset.editor, 'JOSM/1.5 (7470 en)')
+        self.assertTrue(changeset.checked)
+        self.assertFalse(changeset.harmful)
+        self.assertEqual(changeset.check_user, self.user)
+        self.assertIsNotNone(changeset.check_date)
+        self.assertEqual(changeset.reasons.count(), 1)
+
+    def test_update_without_bbox_keeps_bbox(self):
+        writer = ChangesetWriter()
+        writer.add(get_ch_dict(1000), [])
+        writer.flush()
+        changeset = Changeset.objects.get(id=1000)
+        ch_dict = get_ch_dict(1000, comments_count=2)
+        # the bbox is removed when it's an empty geometry
+        ch_dict.pop('bbox')
+        writer.add(ch_dict, [])
+        writer.flush()
+        updated = Changeset.objects.get(id=1000)
+        self.assertEqual(updated.comments_count, 2)
+        self.assertEqual(updated.bbox, changeset.bbox)
+        self.assertEqual(updated.area, changeset.area)
+
+    def test_clear_failed_imports(self):
+        record_failure(1000, ValueError('Not found'))
+        record_failure(1001, ValueError('Not found'))
+        writer = ChangesetWriter()
+        writer.add(get_ch_dict(1000), [])
+        writer.flush()
+        self.assertEqual(
+            list(FailedImport.objects.values_list('changeset_id', flat=True)), [1001]
+            )
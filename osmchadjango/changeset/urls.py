@@ -130,6 +130,11 @@ urlpatterns = [
         view=views.ChangesetStatsAPIView.as_view(),
         name='stats'
     ),
+    path(
+        'user-stats/',
+        view=views.user_stats_batch,
+        name='user-stats-batch'
+    ),
     path(
         'user-stats/<int:uid>/',
         view=views.user_stats,
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import Changeset, UserStats
+
+
+# The UserStats are updated with the difference between the values of these
+# fields before and after a changeset is saved or deleted. The ORM paths are
+# handled by the receivers below and the code that writes the changesets with
+# raw SQL (the ChangesetWriter and the deletion module) uses UserStatsDelta.
+STATS_FIELDS = ['uid', 'checked', 'harmful', 'date']
+
+
+class UserStatsDelta(object):
+    """Collect the changes of the statistics of the users and save them with
+    one INSERT ... ON CONFLICT DO UPDATE statement. The last_seen date is only
+    moved forward; it is calculated again by rebuild_user_stats.
+    """
+    def __init__(self):
+        self.stats = {}
+
+    def add(self, uid, checked, harmful, date, sign=1):
+        if not uid:
+            return
+        stats = self.stats.setdefault(str(uid), [0, 0, 0, None])
+        stats[0] += sign
+        stats[1] += sign if checked else 0
+        stats[2] += sign if harmful else 0
+        if sign > 0 and date is not None and (stats[3] is None or date > stats[3]):
+            stats[3] = date
+
+    def change(self, before, after):
+        """Receive the values of STATS_FIELDS of a changeset before and after
+        it was changed, or None if it didn't exist or was deleted.
+        """
+        if before is not None:
+            self.add(*before, sign=-1)
+        if after is not None:
+            self.add(*after)
+
+    def save(self):
+        # sorted to always lock the rows in the same order
+        rows = [
+            [uid] + stats for uid, stats in sorted(self.stats.items())
+            if any(stats[:3]) or stats[3] is not None
+            ]
+        self.stats = {}
+        if not rows:
+            return
+        qn = connection.ops.quote_name
+        table = qn(UserStats._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """INSERT INTO {table}
+                    (uid, changesets, checked_changesets, harmful_changesets, last_seen)
+                VALUES {values}
+                ON CONFLICT (uid) DO UPDATE SET
+                    changesets = {table}.changesets + EXCLUDED.changesets,
+                    checked_changesets = {table}.checked_changesets + EXCLUDED.checked_changesets,
+                    harmful_changesets = {table}.harmful_changesets + EXCLUDED.harmful_changesets,
+                    last_seen = GREATEST({table}.last_seen, EXCLUDED.last_seen)
+                """.format(
+                    table=table,
+                    values=', '.join(['(%s, %s, %s, %s, %s)'] * len(rows))
+                    ),
+                [value for row in rows for value in row]
+                )
+
+
+def rebuild_user_stats():
+    """Calculate the UserStats of all the users from the changesets. The
+    table is locked until the transaction is committed, so the changes made by
+    concurrent imports or reviews are applied after it. Return the number of
+    users.
+    """
+    qn = connection.ops.quote_name
+    table = qn(UserStats._meta.db_table)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('LOCK TABLE {} IN EXCLUSIVE MODE'.format(table))
+        cursor.execute('DELETE FROM {}'.format(table))
+        cursor.execute(
+            """INSERT INTO {}
+                (uid, changesets, checked_changesets, harmful_changesets, last_seen)
+            SELECT uid, count(*), count(*) FILTER (WHERE checked),
+                count(*) FILTER (WHERE harmful), max(date)
+            FROM {} WHERE uid IS NOT NULL AND uid <> '' GROUP BY uid
+            """.format(table, qn(Changeset._meta.db_table))
+            )
+        return cursor.rowcount
+
+
+def get_user_stats(uids):
+    """Return a dict with the statistics of each uid, as returned by the
+    user_stats endpoint, with one query. The users without changesets have
+    zero values.
+    """
+    stats = {str(uid): UserStats(uid=str(uid)) for uid in uids}
+    for user_stats in UserStats.objects.filter(uid__in=stats.keys()):
+        stats[user_stats.uid] = user_stats
+    return {
+        uid: {
+            "changesets_in_osmcha": user_stats.changesets,
+            "checked_changesets": user_stats.checked_changesets,
+            "harmful_changesets": user_stats.harmful_changesets
+            }
+        for uid, user_stats in stats.items()
+        }
+
+
+def get_stats_values(instance):
+    return tuple(getattr(instance, field) for field in STATS_FIELDS)
+
+
+@receiver(pre_save, sender=Changeset)
+def store_stats_values(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not set(STATS_FIELDS).intersection(update_fields):
+        return
+    before = None
+    if instance.pk is not None:
+        queryset = Changeset.objects.filter(pk=instance.pk)
+        if connection.in_atomic_block:
+            # wait for the concurrent reviews of the changeset
+            queryset = queryset.select_for_update()
+        before = queryset.values_list(*STATS_FIELDS).first()
+    instance._stats_before = (before,)
+
+
+@receiver(post_save, sender=Changeset)
+def update_user_stats(sender, instance, update_fields=None, **kwargs):
+    stored = instance.__dict__.pop('_stats_before', None)
+    if stored is None:
+        return
+    before = stored[0]
+    after = get_stats_values(instance)
+    if update_fields is not None and before is not None:
+        after = tuple(
+            value if field in update_fields else old_value
+            for field, value, old_value in zip(STATS_FIELDS, after, before)
+            )
+    delta = UserStatsDelta()
+    delta.change(before, after)
+    delta.save()
+
+
+@receiver(post_delete, sender=Changeset)
+def remove_user_stats(sender, instance, **kwargs):
+    delta = UserStatsDelta()
+    delta.change(get_stats_values(instance), None)
+    delta.save()
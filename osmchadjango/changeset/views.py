@@ -3,8 +3,8 @@ from __future__ import unicode_literals
 
 from django.utils import timezone
 from django.utils.translation import ugettext, ugettext_lazy as _
+from django.db import transaction
 from django.db.utils import IntegrityError
-from django.db import connection
 from django.conf import settings
 
 import django_filters.rest_framework
@@ -29,6 +29,9 @@ from rest_framework.exceptions import APIException
 
 from .models import Changeset, UserWhitelist, SuspicionReasons, Tag
 from .filters import ChangesetFilter
+from .reasons import reasons_registry
+from .replicas import ReplicaReadMixin
+from .user_stats import get_user_stats
 from .serializers import (
     ChangesetSerializer, ChangesetSerializerToStaff, ChangesetStatsSerializer,
     ChangesetTagsSerializer, SuspicionReasonsChangesetSerializer,
@@ -41,6 +44,9 @@ from ..roulette_integration.utils import push_feature_to_maproulette
 from ..roulette_integration.models import ChallengeIntegration
 
 
+MAX_USER_STATS_UIDS = 500
+
+
 class StandardResultsSetPagination(GeoJsonPagination):
     page_size = 50
     page_size_query_param = 'page_size'
@@ -62,14 +68,53 @@ class PaginatedCSVRenderer (CSVRenderer):
         return super(PaginatedCSVRenderer, self).render(data, *args, **kwargs)
 
 
-class ChangesetListAPIView(ListAPIView):
+class NonAtomicRequestsMixin(object):
+    """Run the requests of the view outside of a transaction, even with
+    ATOMIC_REQUESTS, like the views decorated with non_atomic_requests. Use it
+    only in views that don't write to the database.
+    """
+    @classmethod
+    def as_view(cls, **initkwargs):
+        return transaction.non_atomic_requests(
+            super(NonAtomicRequestsMixin, cls).as_view(**initkwargs)
+            )
+
+
+class UserStatsMixin(object):
+    """Add the stats of the users of the changesets to the serializer context
+    if the 'user_stats' parameter is 'true', so the serializers include them
+    in the 'user_stats' field. The stats of all the users are read with one
+    query.
+    """
+    user_stats = None
+
+    def get_serializer(self, *args, **kwargs):
+        if args and self.request.query_params.get('user_stats') in ['true', 'True', '1']:
+            changesets = list(args[0]) if kwargs.get('many') else [args[0]]
+            self.user_stats = get_user_stats(
+                set(changeset.uid for changeset in changesets if changeset.uid)
+                )
+            if kwargs.get('many'):
+                args = (changesets,) + args[1:]
+        return super(UserStatsMixin, self).get_serializer(*args, **kwargs)
+
+    def get_serializer_context(self):
+        context = super(UserStatsMixin, self).get_serializer_context()
+        if self.user_stats is not None:
+            context['user_stats'] = self.user_stats
+        return context
+
+
+class ChangesetListAPIView(NonAtomicRequestsMixin, ReplicaReadMixin, UserStatsMixin,
+                           ListAPIView):
     """List changesets. There are two ways of filtering changesets by
     geolocation. The first option is to use the 'geometry' filter field, which
     can receive any type of geometry as a GeoJson geometry string. The other is
     the 'in_bbox' parameter, which needs to receive the min Lat, min Lon, max
     Lat, max Lon values. Furthermore, we can filter the data by any other
     changeset property. The accepted response formats are JSON and CSV. The
-    default pagination returns 50 objects by page.
+    default pagination returns 50 objects by page. Use 'user_stats=true' to
+    include the stats of the user of each changeset.
     """
 
     queryset = Changeset.objects.all().select_related(
@@ -93,8 +138,10 @@ class ChangesetListAPIView(ListAPIView):
             return ChangesetSerializer
 
 
-class ChangesetDetailAPIView(RetrieveAPIView):
-    """Return details of a Changeset."""
+class ChangesetDetailAPIView(NonAtomicRequestsMixin, UserStatsMixin, RetrieveAPIView):
+    """Return details of a Changeset. Use 'user_stats=true' to include the
+    stats of its user.
+    """
     permission_classes = (IsAuthenticated,)
     queryset = Changeset.objects.all().select_related(
         'check_user'
@@ -161,7 +208,7 @@ class UncheckedChangesetListAPIView(ChangesetListAPIView):
         return self.queryset.filter(checked=False)
 
 
-class SuspicionReasonsListAPIView(ListAPIView):
+class SuspicionReasonsListAPIView(NonAtomicRequestsMixin, ListAPIView):
     """List SuspicionReasons."""
     serializer_class = SuspicionReasonsSerializer
     pagination_class = DefaultPagination
@@ -219,7 +266,7 @@ class AddRemoveChangesetReasonsAPIView(ModelViewSet):
                 )
 
 
-class TagListAPIView(ListAPIView):
+class TagListAPIView(NonAtomicRequestsMixin, ListAPIView):
     """List Tags."""
     serializer_class = TagSerializer
     pagination_class = DefaultPagination
@@ -524,7 +571,7 @@ class UserWhitelistDestroyAPIView(DestroyAPIView):
         return UserWhitelist.objects.filter(user=self.request.user)
 
 
-class ChangesetStatsAPIView(ListAPIView):
+class ChangesetStatsAPIView(NonAtomicRequestsMixin, ReplicaReadMixin, ListAPIView):
     """Get stats about Changesets. It will return the total number of checked
     and harmful changesets, the number of users with harmful changesets and the
     number of checked and harmful changesets by Suspicion Reason and by Tag.
@@ -545,29 +592,40 @@ class ChangesetStatsAPIView(ListAPIView):
     filter_class = ChangesetFilter
 
 
+@transaction.non_atomic_requests
 @api_view(['GET'])
 @permission_classes((IsAuthenticated,))
 def user_stats(request, uid):
     """Get stats about an OSM user in the OSMCHA history.
     It needs to receive the uid of the user in OSM.
     """
-    query = """
-        SELECT
-            count(*),
-            count(*) filter (where checked),
-            count(*) filter (where harmful)
-        FROM changeset_changeset
-        WHERE uid = %s
-        """
-    with connection.cursor() as cursor:
-        cursor.execute(query, [str(uid)])
-        total, checked, harmful = cursor.fetchone()
-        instance = {
-            "changesets_in_osmcha": total,
-            "checked_changesets": checked,
-            "harmful_changesets": harmful
-            }
-    return Response(instance)
+    return Response(get_user_stats([uid])[str(uid)])
+
+
+@transaction.non_atomic_requests
+@api_view(['GET'])
+@permission_classes((IsAuthenticated,))
+def user_stats_batch(request):
+    """Get the stats of many OSM users in the OSMCHA history. It needs to
+    receive the uids of the users in OSM, separated by commas, in the 'uids'
+    parameter, up to 500 uids. Return the stats of each uid.
+    """
+    try:
+        uids = [
+            str(int(uid)) for uid in request.query_params.get('uids', '').split(',')
+            if uid.strip()
+            ]
+    except ValueError:
+        return Response(
+            {'detail': 'The uids must be integers separated by commas.'},
+            status=status.HTTP_400_BAD_REQUEST
+            )
+    if len(uids) > MAX_USER_STATS_UIDS:
+        return Response(
+            {'detail': 'Request the stats of up to {} uids.'.format(MAX_USER_STATS_UIDS)},
+            status=status.HTTP_400_BAD_REQUEST
+            )
+    return Response(get_user_stats(uids))
 
 
 class ChangesetCommentAPIView(ModelViewSet):
@@ -759,19 +817,12 @@ def add_feature(request):
     if suspicions:
         reasons = set()
         for suspicion in suspicions:
-            try:
-                reason_id = int(suspicion)
-                reason = SuspicionReasons.objects.get(id=reason_id)
-                reasons.add(reason)
-                if reason.is_visible:
-                    has_visible_features = True
-            except (ValueError, SuspicionReasons.DoesNotExist):
-                reason, created = SuspicionReasons.objects.get_or_create(
-                    name=suspicion
-                    )
-                reasons.add(reason)
-                if reason.is_visible:
-                    has_visible_features = True
+            reason = reasons_registry.get_by_id(suspicion)
+            if reason is None:
+                reason = reasons_registry.get(suspicion)
+            reasons.add(reason)
+            if reason.is_visible:
+                has_visible_features = True
 
     changeset_defaults = {
         'is_suspect': has_visible_features
@@ -862,20 +913,12 @@ def add_feature_v1(request):
     if suspicions:
         reasons = set()
         for suspicion in suspicions:
-            try:
-                reason_id = int(suspicion)
-                reason = SuspicionReasons.objects.get(id=reason_id)
-                reasons.add(reason)
-                if reason.is_visible:
-                    has_visible_features = True
-
-            except (ValueError, SuspicionReasons.DoesNotExist):
-                reason, created = SuspicionReasons.objects.get_or_create(
-                    name=suspicion
-                    )
-                reasons.add(reason)
-                if reason.is_visible:
-                    has_visible_features = True
+            reason = reasons_registry.get_by_id(suspicion)
+            if reason is None:
+                reason = reasons_registry.get(suspicion)
+            reasons.add(reason)
+            if reason.is_visible:
+                has_visible_features = True
 
         challenges = ChallengeIntegration.objects.filter(
             active=True
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, unicode_literals
+import time
+
+from django.db import connection, transaction
+from django.db.models.sql import InsertQuery
+from django.db.utils import IntegrityError
+
+from .failed_imports import clear_failures, record_failure
+from .id_arrays import update_id_arrays
+from .metrics import metrics
+from .models import Changeset
+from .reasons import reasons_registry
+from .user_stats import STATS_FIELDS, UserStatsDelta, get_stats_values
+
+
+# Fields that are filled by the changeset analysis. The other fields, like the
+# review fields (checked, harmful, check_user, check_date, tags), the features
+# and the tag_changes are not modified when an existing changeset is updated.
+ANALYSIS_FIELDS = [
+    'user', 'uid', 'editor', 'powerfull_editor', 'comment', 'comments_count',
+    'source', 'imagery_used', 'date', 'create', 'modify', 'delete', 'bbox',
+    'area', 'is_suspect', 'metadata'
+    ]
+# fields that keep their stored value when the new one is NULL
+KEPT_IF_NULL = ['bbox', 'area']
+
+
+class ChangesetWriter(object):
+    """Collect analysed changesets and save them in batches. Each batch is
+    saved with one INSERT ... ON CONFLICT DO UPDATE statement, that keeps the
+    review fields of the changesets that already exist in the database, and
+    one multi-row INSERT of the relations between changesets and
+    SuspicionReasons. The SuspicionReasons are read from the reasons_registry.
+    A batch is saved when it reaches the batch_size or when flush_interval
+    seconds have passed since the last save. The changesets that can't be
+    saved are registered as failed imports and the saved ones are removed from
+    them.
+    """
+
+    def __init__(self, batch_size=500, flush_interval=10):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.changesets = {}
+        self.written = 0
+        self.flushed_at = time.monotonic()
+
+    def add(self, ch_dict, reasons):
+        """Add a changeset to the batch. The ch_dict is a dict with the fields
+        of the changeset and reasons is a list of SuspicionReasons names.
+        """
+        self.changesets[ch_dict['id']] = (ch_dict, reasons)
+        if (len(self.changesets) >= self.batch_size or
+                time.monotonic() - self.flushed_at >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """Save the changesets of the batch and return the number of
+        changesets saved.
+        """
+        self.flushed_at = time.monotonic()
+        if not self.changesets:
+            return 0
+        changesets = list(self.changesets.values())
+        self.changesets = {}
+        with metrics.timer('db_write'):
+            try:
+                with transaction.atomic():
+                    self.save(changesets)
+                saved = len(changesets)
+                metrics.inc('reasons', sum(len(set(reasons)) for ch_dict, reasons in changesets))
+            except IntegrityError as e:
+                print("IntegrityError when saving a batch of changesets.")
+                print(e)
+                saved = self.save_one_by_one(changesets)
+        self.written += saved
+        metrics.inc('changesets', saved, 'saved')
+        if saved < len(changesets):
+            metrics.inc('failures', len(changesets) - saved, 'db_write')
+        print("{} changesets saved".format(saved))
+        return saved
+
+    def save_one_by_one(self, changesets):
+        saved = 0
+        for ch_dict, reasons in changesets:
+            try:
+                with transaction.atomic():
+                    self.save([(ch_dict, reasons)])
+                saved += 1
+                metrics.inc('reasons', len(set(reasons)))
+            except IntegrityError as e:
+                print("IntegrityError when importing {}.".format(ch_dict['id']))
+                print(e)
+                record_failure(ch_dict['id'], e)
+        return saved
+
+    def save(self, changesets):
+        self.upsert_changesets([ch_dict for ch_dict, reasons in changesets])
+        self.add_reasons(
+            [(ch_dict['id'], reasons) for ch_dict, reasons in changesets]
+            )
+        clear_failures([ch_dict['id'] for ch_dict, reasons in changesets])
+
+    def upsert_changesets(self, changesets):
+        objs = []
+        for ch_dict in changesets:
+            obj = Changeset(**ch_dict)
+            # the same as it is done in Changeset.save()
+            if obj.bbox is not None:
+                obj.area = obj.bbox.area
+            objs.append(obj)
+
+        fields = Changeset._meta.concrete_fields
+        query = InsertQuery(Changeset)
+        query.insert_values(fields, objs, raw=False)
+        [(sql, params)] = query.get_compiler(connection=connection).as_sql()
+
+        qn = connection.ops.quote_name
+        table = qn(Changeset._meta.db_table)
+        update = []
+        for field in ANALYSIS_FIELDS:
+            column = qn(Changeset._meta.get_field(field).column)
+            if field in KEPT_IF_NULL:
+                # the bbox is not sent when it's not a valid geometry, so the
+                # stored one is kept
+                update.append('{0} = COALESCE(EXCLUDED.{0}, {1}.{0})'.format(column, table))
+            else:
+                update.append('{0} = EXCLUDED.{0}'.format(column))
+        sql = '{} ON CONFLICT ({}) DO UPDATE SET {} RETURNING {}, (xmax = 0)'.format(
+            sql, qn(Changeset._meta.pk.column), ', '.join(update), qn(Changeset._meta.pk.column)
+            )
+        # values of the statistics of the users before the changesets are updated
+        rows = Changeset.objects.select_for_update().filter(
+            id__in=[obj.id for obj in objs]
+            ).values_list('id', *STATS_FIELDS)
+        existing = {values[0]: values[1:] for values in rows}
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            inserted = dict(cursor.fetchall())
+
+        delta = UserStatsDelta()
+        for obj in objs:
+            before = existing.get(int(obj.id))
+            if inserted[int(obj.id)]:
+                delta.change(None, get_stats_values(obj))
+            elif before is not None:
+                # the review fields are not updated
+                delta.change(before, (obj.uid, before[1], before[2], obj.date))
+        delta.save()
+
+    def add_reasons(self, changesets_reasons):
+        reasons = reasons_registry.get_many(
+            [name for changeset_id, names in changesets_reasons for name in names]
+            )
+        Through = Changeset.reasons.through
+        Through.objects.bulk_create(
+            [
+                Through(changeset_id=changeset_id, suspicionreasons_id=reasons[str(name)].id)
+                for changeset_id, names in changesets_reasons
+                for name in set(names)
+            ],
+            ignore_conflicts=True
+            )
+        # bulk_create doesn't send m2m_changed
+        update_id_arrays(
+            [changeset_id for changeset_id, names in changesets_reasons if names],
+            ['reasons']
+            )
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import os
+import time
+
+from django.conf import settings
+from django.contrib.gis.db.backends.postgis.base import (
+    DatabaseWrapper as PostGISDatabaseWrapper
+    )
+
+from psycopg2 import Error
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+
+# PostGIS backend that keeps the connections of each process open between the
+# requests. Django stores the connections in a thread local, that is a
+# greenlet local with the gevent workers, so each request uses a new
+# connection even with CONN_MAX_AGE. When Django closes a connection that is
+# idle and works, it's kept in a pool of the process, up to DB_POOL_SIZE
+# connections by database, and the next connection to the same database takes
+# it after checking that it still works. The connections are closed after
+# DB_POOL_MAX_AGE seconds. With DB_POOL_SIZE = 0 it works like the PostGIS
+# backend.
+
+
+class ConnectionPool(object):
+    """Idle connections of a process, by connection parameters. The
+    connections inherited by a forked process are never used or closed by it,
+    because they belong to the parent process.
+    """
+    def __init__(self):
+        self.pid = os.getpid()
+        self.idle = {}
+        self.inherited = []
+        self.opened = 0
+        self.reused = 0
+
+    def check_pid(self):
+        if self.pid != os.getpid():
+            # closing them would also close the connections of the parent
+            self.inherited.extend(self.idle.values())
+            self.idle = {}
+            self.pid = os.getpid()
+
+    def is_obsolete(self, connected_at):
+        return time.monotonic() - connected_at >= settings.DB_POOL_MAX_AGE
+
+    def is_healthy(self, connection):
+        if connection.closed:
+            return False
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            return True
+        except Error:
+            return False
+
+    def take(self, key):
+        """Return an idle connection that works and the time it was opened,
+        or (None, None).
+        """
+        self.check_pid()
+        idle = self.idle.get(key, [])
+        while idle:
+            # the most recently used, so the others become obsolete
+            connection, connected_at = idle.pop()
+            if self.is_obsolete(connected_at) or not self.is_healthy(connection):
+                close(connection)
+                continue
+            self.reused += 1
+            return connection, connected_at
+        return None, None
+
+    def put(self, key, connection, connected_at):
+        """Keep a connection in the pool. Return False if it can't be kept."""
+        self.check_pid()
+        idle = self.idle.setdefault(key, [])
+        if (len(idle) >= settings.DB_POOL_SIZE or self.is_obsolete(connected_at) or
+                connection.closed or
+                connection.get_transaction_status() != TRANSACTION_STATUS_IDLE):
+            return False
+        idle.append((connection, connected_at))
+        return True
+
+    def close_all(self):
+        """Close the idle connections, for example before dropping a database."""
+        self.check_pid()
+        for idle in self.idle.values():
+            for connection, connected_at in idle:
+                close(connection)
+        self.idle = {}
+
+
+def close(connection):
+    try:
+        connection.close()
+    except Error:
+        pass
+
+
+pool = ConnectionPool()
+
+
+class DatabaseWrapper(PostGISDatabaseWrapper):
+    def __init__(self, *args, **kwargs):
+        super(DatabaseWrapper, self).__init__(*args, **kwargs)
+        self.connecting = False
+        self.pool_key = None
+        self.connected_at = None
+
+    def connect(self):
+        self.connecting = True
+        try:
+            super(DatabaseWrapper, self).connect()
+        finally:
+            self.connecting = False
+
+    def get_new_connection(self, conn_params):
+        # get_new_connection is also used for connections that are not
+        # managed by this wrapper, like the AdvisoryLock ones, which don't
+        # use the pool.
+        if not self.connecting:
+            return super(DatabaseWrapper, self).get_new_connection(conn_params)
+        self.pool_key = tuple(sorted(conn_params.items()))
+        connection, self.connected_at = pool.take(self.pool_key)
+        if connection is None:
+            connection = super(DatabaseWrapper, self).get_new_connection(conn_params)
+            self.connected_at = time.monotonic()
+            pool.opened += 1
+        return connection
+
+    def _close(self):
+        if (settings.DB_POOL_SIZE and self.connection is not None and
+                self.pool_key is not None and not self.in_atomic_block and
+                not self.errors_occurred and
+                self.connection.autocommit == self.settings_dict['AUTOCOMMIT'] and
+                pool.put(self.pool_key, self.connection, self.connected_at)):
+            return
+        return super(DatabaseWrapper, self)._close()
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, unicode_literals
 
+from django.db import transaction
 from django.urls import re_path
 from django.views.decorators.cache import cache_page
 
@@ -26,7 +27,9 @@ urlpatterns = [
         ),
     re_path(
         r'^aoi/(?P<pk>[0-9a-f-]+)/changesets/feed/$',
-        view=cache_page(60 * 30)(views.AOIListChangesetsFeedView()),
+        view=transaction.non_atomic_requests(
+            cache_page(60 * 30)(views.AOIListChangesetsFeedView())
+            ),
         name='aoi-changesets-feed'
         ),
     re_path(
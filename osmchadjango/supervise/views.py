@@ -18,7 +18,8 @@ from rest_framework.permissions import (
 from ..changeset.serializers import (
     ChangesetSerializer, ChangesetSerializerToStaff, ChangesetStatsSerializer
     )
-from ..changeset.views import StandardResultsSetPagination
+from ..changeset.replicas import ReplicaReadMixin, read_from_replicas
+from ..changeset.views import NonAtomicRequestsMixin, StandardResultsSetPagination
 from .models import AreaOfInterest, BlacklistedUser
 from .serializers import (
     AreaOfInterestSerializer, BlacklistSerializer,
@@ -118,6 +119,12 @@ class AOIListChangesetsFeedView(Feed):
     """Feed view with the last 50 changesets that matches an Area of Interest.
     """
 
+    def __call__(self, request, *args, **kwargs):
+        with read_from_replicas(request):
+            return super(AOIListChangesetsFeedView, self).__call__(
+                request, *args, **kwargs
+                )
+
     def get_object(self, request, pk):
         return AreaOfInterest.objects.get(pk=pk)
 
@@ -179,7 +186,7 @@ class AOIListChangesetsFeedView(Feed):
         return '<br>'.join(description_items)
 
 
-class AOIListChangesetsAPIView(ListAPIView):
+class AOIListChangesetsAPIView(NonAtomicRequestsMixin, ReplicaReadMixin, ListAPIView):
     """List the changesets that matches the filters and intersects with the
     geometry of an Area Of Interest. It supports pagination and return the data
     in the same way as the changeset list endpoint.
@@ -208,7 +215,7 @@ class AOIListChangesetsAPIView(ListAPIView):
         return Response(serializer.data)
 
 
-class AOIStatsAPIView(ListAPIView):
+class AOIStatsAPIView(NonAtomicRequestsMixin, ReplicaReadMixin, ListAPIView):
     """Return the statistics of the changesets that matches an Area of Interest.
     The data will be in the same format as the Changeset Stats view.
     """
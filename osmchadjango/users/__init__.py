@@ -1 +1,2 @@
 # -*- coding: utf-8 -*-
+default_app_config = 'osmchadjango.users.apps.UsersConfig'
@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class UsersConfig(AppConfig):
+    name = 'osmchadjango.users'
+
+    def ready(self):
+        # connect the signal receivers
+        from . import teams  # noqa
@@ -0,0 +1,49 @@
+# Generated by Django 2.2.28 on 2026-10-18 19:00
+
+import json
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_members(apps, schema_editor):
+    MappingTeam = apps.get_model('users', 'MappingTeam')
+    MappingTeamMember = apps.get_model('users', 'MappingTeamMember')
+    for team in MappingTeam.objects.all():
+        users = team.users
+        if type(users) in [str, bytes, bytearray]:
+            users = json.loads(users)
+        members = {}
+        for user in users or []:
+            if user.get('username'):
+                uid = user.get('uid')
+                members[user['username']] = str(uid) if uid is not None else None
+        MappingTeamMember.objects.bulk_create([
+            MappingTeamMember(team=team, username=username, uid=uid)
+            for username, uid in members.items()
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0012_auto_20240523_0227'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MappingTeamMember',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('username', models.CharField(db_index=True, max_length=1000)),
+                ('uid', models.CharField(blank=True, max_length=255, null=True)),
+                ('team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='members', to='users.MappingTeam')),
+            ],
+            options={
+                'verbose_name': 'Mapping Team member',
+                'verbose_name_plural': 'Mapping Team members',
+                'unique_together': {('team', 'username')},
+            },
+        ),
+        migrations.RunPython(populate_members, reverse_code=migrations.RunPython.noop),
+    ]
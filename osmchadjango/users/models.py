@@ -42,3 +42,23 @@ class MappingTeam(models.Model):
         ordering = ['date']
         verbose_name = 'Mapping Team'
         verbose_name_plural = 'Mapping Teams'
+
+
+class MappingTeamMember(models.Model):
+    """Users of the Mapping Teams, copied from the users field of MappingTeam
+    when the team is saved, so the changesets can be filtered by team with a
+    subquery.
+    """
+    team = models.ForeignKey(
+        MappingTeam, on_delete=models.CASCADE, related_name='members'
+        )
+    username = models.CharField(max_length=1000, db_index=True)
+    uid = models.CharField(max_length=255, blank=True, null=True)
+
+    def __str__(self):
+        return '{} ({})'.format(self.username, self.team.name)
+
+    class Meta:
+        unique_together = ('team', 'username')
+        verbose_name = 'Mapping Team member'
+        verbose_name_plural = 'Mapping Team members'
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import json
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import MappingTeam, MappingTeamMember
+
+
+# The usernames of the members of the trusted teams are stored in the Django
+# cache (Redis in production) with the version of the teams when they were
+# read. Any change of the teams stores a new version, so the cached set of all
+# the processes is discarded.
+TRUSTED_USERS_KEY = 'trusted_team_users'
+TRUSTED_USERS_VERSION_KEY = 'trusted_team_users_version'
+
+
+def get_team_users(users):
+    """Return a dict of the usernames and uids of the users field of a
+    MappingTeam, that can be a list or a JSON string.
+    """
+    if type(users) in [str, bytes, bytearray]:
+        users = json.loads(users)
+    team_users = {}
+    for user in users or []:
+        if user.get('username'):
+            uid = user.get('uid')
+            team_users[user['username']] = str(uid) if uid is not None else None
+    return team_users
+
+
+def update_members(team):
+    """Replace the MappingTeamMember objects of a team by its users."""
+    with transaction.atomic():
+        MappingTeamMember.objects.filter(team=team).delete()
+        MappingTeamMember.objects.bulk_create([
+            MappingTeamMember(team=team, username=username, uid=uid)
+            for username, uid in get_team_users(team.users).items()
+            ])
+
+
+def get_trusted_version():
+    version = cache.get(TRUSTED_USERS_VERSION_KEY)
+    if version is None:
+        cache.add(TRUSTED_USERS_VERSION_KEY, uuid4().hex, None)
+        version = cache.get(TRUSTED_USERS_VERSION_KEY)
+    return version
+
+
+def get_trusted_users():
+    """Return a frozenset with the usernames of the members of the trusted
+    teams. The set is cached only after the transaction that read it is
+    committed, so a set read from uncommitted teams is never cached.
+    """
+    version = get_trusted_version()
+    cached = cache.get(TRUSTED_USERS_KEY)
+    if cached is not None and version is not None and cached[0] == version:
+        return cached[1]
+    users = frozenset(
+        MappingTeamMember.objects.filter(team__trusted=True).values_list(
+            'username', flat=True
+            )
+        )
+    transaction.on_commit(
+        lambda: cache.set(TRUSTED_USERS_KEY, (version, users), None)
+        )
+    return users
+
+
+def invalidate_trusted_users():
+    """Discard the cached trusted users of all the processes. A new version is
+    stored again when the transaction is committed, so the sets read before the
+    commit are discarded too.
+    """
+    def new_version():
+        cache.set(TRUSTED_USERS_VERSION_KEY, uuid4().hex, None)
+    new_version()
+    transaction.on_commit(new_version)
+
+
+@receiver(post_save, sender=MappingTeam)
+def mapping_team_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'users' in update_fields:
+        update_members(instance)
+    invalidate_trusted_users()
+
+
+@receiver(post_delete, sender=MappingTeam)
+def mapping_team_deleted(sender, instance, **kwargs):
+    invalidate_trusted_users()
@@ -0,0 +1,82 @@
+import json
+
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase
+
+from ..models import MappingTeam, MappingTeamMember, User
+from ..teams import TRUSTED_USERS_KEY, get_team_users, get_trusted_users
+
+
+class TestMappingTeamMembers(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='test', password='password', email='a@a.com'
+            )
+        self.team = MappingTeam.objects.create(
+            name='Map Company',
+            created_by=self.user,
+            users=json.dumps([
+                {"username": "mapper", "uid": "3476"},
+                {"username": "other mapper", "uid": 3477},
+                {"username": "mapper", "uid": "3476"},
+                {"uid": "3478"},
+                ])
+            )
+
+    def test_get_team_users(self):
+        self.assertEqual(
+            get_team_users(self.team.users),
+            {'mapper': '3476', 'other mapper': '3477'}
+            )
+        self.assertEqual(get_team_users([]), {})
+
+    def test_members_are_updated(self):
+        self.assertEqual(
+            set(self.team.members.values_list('username', 'uid')),
+            {('mapper', '3476'), ('other mapper', '3477')}
+            )
+        self.team.users = [{"username": "new mapper", "uid": "3479"}]
+        self.team.save()
+        self.assertEqual(
+            list(self.team.members.values_list('username', flat=True)),
+            ['new mapper']
+            )
+        self.team.delete()
+        self.assertEqual(MappingTeamMember.objects.count(), 0)
+
+
+class TestTrustedUsers(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='test', password='password', email='a@a.com'
+            )
+        self.team = MappingTeam.objects.create(
+            name='Map Company',
+            created_by=self.user,
+            users=[{"username": "mapper", "uid": "3476"}]
+            )
+        MappingTeam.objects.create(
+            name='Trusted Company',
+            created_by=self.user,
+            trusted=True,
+            users=[{"username": "trusted mapper", "uid": "3477"}]
+            )
+
+    def test_trusted_users(self):
+        self.assertEqual(get_trusted_users(), frozenset(['trusted mapper']))
+        self.assertIsNotNone(cache.get(TRUSTED_USERS_KEY))
+        # the cached set is used while the teams don't change
+        MappingTeamMember.objects.filter(username='trusted mapper').delete()
+        self.assertEqual(get_trusted_users(), frozenset(['trusted mapper']))
+
+        self.team.trusted = True
+        self.team.save(update_fields=['trusted'])
+        self.assertEqual(get_trusted_users(), frozenset(['mapper']))
+
+        self.team.users = [{"username": "new mapper", "uid": "3479"}]
+        self.team.save()
+        self.assertEqual(get_trusted_users(), frozenset(['new mapper']))
+
+        self.team.delete()
+        self.assertEqual(get_trusted_users(), frozenset())